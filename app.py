@@ -1,15 +1,39 @@
+import startup_profile  # Paling awal supaya durasi import lain ikut terukur
 import streamlit as st
 import pandas as pd
 import json
-import base64
-import gspread
 import os
-from oauth2client.service_account import ServiceAccountCredentials
-from openai import OpenAI
-from pdf2image import convert_from_bytes
-from io import BytesIO
+import gc
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+# gspread / oauth2client (hanya saat simpan ke Sheets), openai (saat request OCR / bulk) dan
+# pdf2image (hanya untuk PDF) di-import saat dibutuhkan, lalu di-warm-up setelah render pertama
+
+import bulk_batch
+import detail_planner
+import endpoint_pool
+import ocr_cache
+import pipeline_metrics
+import prefetch
+import result_editor
+import result_store
+import scheduler
+import spill_store
+import wire_format
+from nota_pipeline import (
+    CLIENT_ERROR, IMAGE_DETAIL, LOCAL_DB_PATH, OCR_ENDPOINTS, OCR_ENDPOINTS_ERROR, OCR_OUTPUT_FORMAT,
+    OCR_STRUCTURED_OUTPUTS, OPENAI_API_KEY, OPENAI_BASE_URL, CLIENT_READY, build_ocr_request, build_result_rows,
+    correct_result, count_pdf_pages, estimate_ocr_cost, extract_document, get_config, get_item_catalog,
+    get_cpu_pool, get_metrics_exporter, get_ocr_cache, get_ocr_cassette, get_ocr_endpoints, get_ocr_flights,
+    get_ocr_scheduler, get_structured_output_support, merge_page_results, ocr_pdf_pages, ocr_receipt_image,
+    parse_ocr_content, plan_ocr_request, prepare_dataframe_with_confidence,
+    preprocess_receipt_image, prompt_version, rasterize_pdf_page, shared_cache,
+)
+
+startup_profile.PROFILE.mark("import")
 
 # Load environment variables dari .env file (untuk local development)
 load_dotenv()
@@ -24,9 +48,7 @@ load_dotenv()
 # Coba ambil dari Streamlit secrets dulu (untuk deployment), 
 # kalau tidak ada, ambil dari environment variable
 try:
-    # Untuk Streamlit Cloud deployment
-    OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-    OPENAI_BASE_URL = st.secrets.get("OPENAI_BASE_URL", "https://ai.sumopod.com")
+    # Untuk Streamlit Cloud deployment (OPENAI_API_KEY & OPENAI_BASE_URL dibaca di nota_pipeline.py)
     SHEET_NAME = st.secrets.get("SHEET_NAME", "Data Nota")
     WORKSHEET_NAME = st.secrets.get("WORKSHEET_NAME", "Sheet1")
     
@@ -44,44 +66,85 @@ try:
         
 except (FileNotFoundError, KeyError, AttributeError):
     # Fallback ke environment variables untuk local development
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://ai.sumopod.com")
     SHEET_NAME = os.getenv("SHEET_NAME", "Data Nota")
     WORKSHEET_NAME = os.getenv("WORKSHEET_NAME", "Sheet1")
     GOOGLE_CREDENTIALS_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json")
 
+# Penyimpanan hasil: daftar sink dipisah koma (gsheet, sqlite, parquet)
+RESULT_SINKS = result_store.parse_sink_names(get_config("RESULT_SINKS", "gsheet,sqlite"))
+PARQUET_DIR = get_config("PARQUET_DIR", "data/parquet")
+
+# Google Sheets: worksheet per bulan / toko (none = semua ke WORKSHEET_NAME), rollover setelah sekian baris (0 = tidak)
+SHEET_PARTITION = str(get_config("SHEET_PARTITION", "none")).strip().lower()
+SHEET_ROLLOVER_ROWS = int(get_config("SHEET_ROLLOVER_ROWS", 0))
+SHEET_HANDLE_TTL = 30 * 60  # detik; koneksi & handle worksheet dibuat ulang sebelum token service account (1 jam) habis
+
+# Katalog barang lokal untuk normalisasi nama & kategori
+ITEM_CATALOG_ENABLED = str(get_config("ITEM_CATALOG", "true")).lower() in ("1", "true", "yes")
+
+# Batch besar: proses per window & simpan bytes/hasil sementara di disk
+BATCH_WINDOW_SIZE = int(get_config("BATCH_WINDOW_SIZE", 10))
+STREAMING_BATCH_MIN_FILES = int(get_config("STREAMING_BATCH_MIN_FILES", 20))
+SPILL_DIR = get_config("SPILL_DIR") or None  # default: folder temp sistem
+
+# Prefetch: OCR dimulai di latar belakang begitu file di-upload (opt-in, biaya API tetap terpakai)
+PREFETCH_OCR = str(get_config("PREFETCH_OCR", "false")).lower() in ("1", "true", "yes")
+PREFETCH_WORKERS = int(get_config("PREFETCH_WORKERS", 4))
+
+# Mode bulk offline (Batch API): endpoint batch bisa berbeda dari endpoint OCR sinkron
+BULK_BATCH_BASE_URL = get_config("BULK_BATCH_BASE_URL") or None  # default: OPENAI_BASE_URL
+BULK_DIR = get_config("BULK_DIR", "data/bulk")
+BULK_MAX_BATCH_MB = float(get_config("BULK_MAX_BATCH_MB", bulk_batch.DEFAULT_MAX_BATCH_MB))
+
+# Profil cold start (satu baris JSON per proses, kosong = tidak ditulis) & modul yang di-warm-up setelah render pertama
+STARTUP_PROFILE_LOG = get_config("STARTUP_PROFILE_LOG", "data/startup_profile.jsonl") or None
+WARM_UP_MODULES = ["openai", "pdf2image", "gspread", "oauth2client.service_account"]
+
 # Validasi API key
-if not OPENAI_API_KEY:
+if not OPENAI_API_KEY and not any(endpoint['api_key'] for endpoint in OCR_ENDPOINTS):
     st.error("⚠️ OPENAI_API_KEY belum diset! Silakan set di file .env atau Streamlit Secrets.")
     st.stop()
 
-# Inisialisasi OpenAI client
-try:
-    client = OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL
-    )
-except Exception as e:
-    st.error(f"Gagal inisialisasi OpenAI client: {e}")
-    client = None
+if OCR_ENDPOINTS_ERROR:
+    st.error(f"⚠️ Konfigurasi OCR_ENDPOINTS tidak valid: {OCR_ENDPOINTS_ERROR}")
+if not CLIENT_READY:
+    st.error(f"Gagal inisialisasi OpenAI client: {CLIENT_ERROR}")
+if SHEET_PARTITION not in result_store.SHEET_PARTITION_MODES:
+    st.warning(f"⚠️ SHEET_PARTITION tidak dikenal: {SHEET_PARTITION} (pilihan: none, month, store). Dipakai 'none'.")
+    SHEET_PARTITION = 'none'
+
+# Export metrik per tahap (METRICS_FILE / METRICS_PORT), dimulai sekali per proses
+get_metrics_exporter()
+
+startup_profile.PROFILE.mark("config")
 
 # ==========================================
 # 2. FUNGSI HELPER (BACKEND LOGIC)
 # ==========================================
 
+@st.cache_resource(ttl=SHEET_HANDLE_TTL, show_spinner=False)
+def get_sheet_partitions():
+    """Spreadsheet dibuka sekali per proses; handle worksheet per partisi di-cache di dalamnya"""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_CREDENTIALS_FILE, scope)
+    client_gs = gspread.authorize(creds)
+    return result_store.WorksheetPartitions(
+        client_gs.open(SHEET_NAME), WORKSHEET_NAME, SHEET_PARTITION, SHEET_ROLLOVER_ROWS
+    )
+
 def connect_to_gsheet():
-    """Mengoneksikan Python ke Google Sheets"""
+    """Mengoneksikan Python ke Google Sheets (worksheet tujuan per partisi, lihat WorksheetPartitions)"""
+    import gspread
+    
     try:
         if not os.path.exists(GOOGLE_CREDENTIALS_FILE):
             st.error(f"File {GOOGLE_CREDENTIALS_FILE} tidak ditemukan. Silakan upload credentials Google Service Account.")
             return None
-            
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_name(GOOGLE_CREDENTIALS_FILE, scope)
-        client_gs = gspread.authorize(creds)
         
-        sheet = client_gs.open(SHEET_NAME).worksheet(WORKSHEET_NAME)
-        return sheet
+        return get_sheet_partitions()
     except gspread.exceptions.SpreadsheetNotFound:
         st.error(f"Google Sheet '{SHEET_NAME}' tidak ditemukan. Pastikan sheet sudah dibuat dan service account sudah di-invite sebagai editor.")
         return None
@@ -89,258 +152,58 @@ def connect_to_gsheet():
         st.error(f"Gagal konek ke Google Sheet: {e}")
         return None
 
+def get_cost_estimate(uploaded_file, model="gpt-4o"):
+    """Estimasi per file upload, disimpan di session_state supaya tidak dihitung ulang setiap rerun"""
+    estimates = st.session_state.setdefault('cost_estimates', {})
+    key = (uploaded_file.file_id, model, IMAGE_DETAIL)
+    if key not in estimates:
+        try:
+            estimates[key] = estimate_ocr_cost(uploaded_file.getvalue(), uploaded_file.type, model)
+        except Exception:
+            estimates[key] = None  # File yang tidak bisa dianalisis tetap bisa di-scan
+    return estimates[key]
+
+def format_cost_estimate(estimates):
+    """Ringkasan estimasi beberapa file dalam satu baris"""
+    estimates = [estimate for estimate in estimates if estimate]
+    if not estimates:
+        return None
+    requests = sum(estimate['requests'] for estimate in estimates)
+    low = sum(estimate['low'] for estimate in estimates)
+    high = sum(estimate['high'] for estimate in estimates)
+    tokens_in = sum(estimate['tokens_in'] for estimate in estimates)
+    tokens_out = sum(estimate['tokens_out'] for estimate in estimates)
+    latency = sum(estimate['latency'] for estimate in estimates)
+    return (
+        f"🧮 Estimasi: {requests} request ({low} low / {high} high) · "
+        f"~{tokens_in:,} token input · ~{tokens_out:,} token output · ~{latency:.0f} detik"
+    )
+
+def format_preprocess_stats(stats_list):
+    """Ringkasan crop & deskew foto nota (jumlah pixel sebelum → sesudah)"""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    before = sum(stats['before'] for stats in stats_list)
+    after = sum(stats['after'] for stats in stats_list)
+    text = f"✂️ Crop nota: {before:,} → {after:,} piksel (-{1 - after / before:.0%})"
+    angles = [abs(stats['angle']) for stats in stats_list if stats['angle']]
+    if len(stats_list) == 1 and angles:
+        text += f" · kemiringan {angles[0]:.1f}° diluruskan"
+    elif angles:
+        text += f" · {len(angles)} foto diluruskan"
+    return text
+
 def process_image_with_gpt4o(image_bytes, mime_type, model="gpt-4o"):
     """Mengirim gambar ke OpenAI GPT-4o/mini untuk diekstrak datanya"""
     
-    if not client:
+    if not CLIENT_READY:
         st.error("OpenAI client belum diinisialisasi. Periksa API key Anda.")
         return None
     
-    # Encode gambar ke base64
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    
-    prompt_text = """
-    Analisa gambar nota/invoice ini dengan SANGAT TELITI. Ekstrak SEMUA informasi yang ada.
-    
-    ⚠️ PERHATIAN KHUSUS UNTUK TULISAN TANGAN:
-    - Nota ini kemungkinan TULISAN TANGAN yang sulit dibaca
-    - Baca SETIAP karakter dengan EKSTRA HATI-HATI
-    - Perhatikan konteks untuk memvalidasi pembacaan
-    - Jika ada coretan atau angka yang ambigu, lihat pola keseluruhan
-    - JANGAN tebak - jika tidak yakin, beri confidence rendah (<70)
-    
-    Output WAJIB format JSON Object dengan struktur berikut:
-    
-    {
-      "metadata": {
-        "tanggal": "YYYY-MM-DD atau DD/MM/YYYY (tanggal transaksi di nota)",
-        "nama_toko": "Nama toko/merchant",
-        "nomor_rekening": "Nomor rekening toko (jika ada)",
-        "nama_bank": "Nama bank (jika ada, misal: BCA, Mandiri, BRI)",
-        "pemilik_rekening": "Nama pemilik rekening (jika ada)",
-        "jenis_pembayaran": "Cash atau Transfer",
-        "confidence": {
-          "tanggal": 0-100,
-          "nama_toko": 0-100,
-          "nomor_rekening": 0-100,
-          "nama_bank": 0-100,
-          "pemilik_rekening": 0-100,
-          "jenis_pembayaran": 0-100
-        }
-      },
-      "items": [
-        {
-          "nama_barang": "Nama produk/item",
-          "qty": 1.0,
-          "unit": "kg/pcs/liter/dll",
-          "harga_satuan": 10000,
-          "total_harga": 10000,
-          "kategori_transaksi": "Bama atau Non Bama",
-          "confidence": {
-            "nama_barang": 0-100,
-            "qty": 0-100,
-            "unit": 0-100,
-            "harga_satuan": 0-100,
-            "total_harga": 0-100,
-            "kategori_transaksi": 0-100
-          }
-        }
-      ]
-    }
-    
-    INSTRUKSI DETAIL:
-    
-    A. METADATA (Informasi Nota):
-    1. 'tanggal': Tanggal transaksi di nota (format: YYYY-MM-DD atau DD/MM/YYYY)
-       - PENTING: Cari di POJOK KIRI ATAS atau header nota
-       - Format bisa: DD-MM-YYYY, DD/MM/YYYY, YYYY-MM-DD
-       - Contoh: "09-11-2025" atau "09/11/2025" → "2025-11-09"
-       - JANGAN buat tanggal sendiri - HARUS dari nota
-       - Jika tidak ada, isi dengan null
-    
-    2. 'nama_toko': Nama toko/merchant
-       - Biasanya di header paling atas
-       - Jika tidak ada, isi dengan "Unknown"
-    
-    3. 'nomor_rekening': Nomor rekening toko (jika ada)
-       - Cari di footer atau header
-       - Jika tidak ada, isi dengan null
-    
-    4. 'nama_bank': Nama bank (BCA, Mandiri, BRI, BNI, dll)
-       - Jika tidak ada, isi dengan null
-    
-    5. 'pemilik_rekening': Nama pemilik rekening
-       - Jika tidak ada, isi dengan null
-    
-    6. 'jenis_pembayaran': "Cash" atau "Transfer"
-       - Jika ada tulisan "Transfer", "QRIS", "Debit", "Credit", "Bank" = "Transfer"
-       - Jika ada tulisan "Cash", "Tunai" = "Cash"
-       - Jika tidak jelas, coba tebak dari konteks (ada nomor rekening = Transfer)
-       - Default: "Cash"
-    
-    B. ITEMS (Daftar Barang):
-    Untuk setiap item barang:
-    
-    1. 'nama_barang': Nama produk/item (string)
-       - Baca SETIAP huruf dengan teliti
-       - Perhatikan spasi dan kapitalisasi
-       - Jangan singkat atau ubah nama
-    
-    2. 'qty': Jumlah/kuantitas barang (float)
-       - Integer (1, 2, 3, dst) atau desimal (0.5, 1.5, dst)
-       - Jika tertulis "1/2" = 0.5, "1/4" = 0.25
-       - Default: 1
-    
-    3. 'unit': Satuan barang (string)
-       - Contoh: "kg", "pcs", "liter", "gram", "box", "pack", "meter", dll
-       - Jika qty dalam bentuk pecahan (0.5), kemungkinan unit adalah "kg" atau "liter"
-       - Jika tidak ada, coba tebak dari nama barang atau isi "pcs"
-    
-    4. 'harga_satuan': Harga per unit (integer)
-       - PERHATIAN: "20" atau "20k" kemungkinan = 20.000
-       - Gunakan konteks total_harga untuk validasi
-    
-    5. 'total_harga': Total harga (qty × harga_satuan) (integer)
-       - PERHATIAN: "20" atau "20k" kemungkinan = 20.000
-    
-    6. 'kategori_transaksi': "Bama" atau "Non Bama"
-       - "Bama" = Bahan Makanan (beras, minyak, gula, sayur, buah, daging, ikan, telur, susu, dll)
-       - "Non Bama" = Bukan Bahan Makanan (sabun, shampo, tissue, alat tulis, elektronik, dll)
-       - Kategorikan berdasarkan nama barang
-    
-    7. 'confidence': Tingkat kepercayaan untuk setiap field (0-100)
-       - Berikan confidence rendah (<70) jika:
-         * Teks blur atau tidak jelas
-         * Tulisan tangan yang sulit dibaca
-         * Angka yang ambigu atau terpotong
-         * Harus melakukan asumsi/tebakan
-         * Format tidak standar
-    
-    TIPS OCR - PENTING UNTUK AKURASI:
-    
-    1. ANGKA yang sering tertukar:
-       - "0" (nol) vs "O" (huruf O) → Lihat konteks (di angka = 0, di kata = O)
-       - "1" (satu) vs "l" (huruf L kecil) vs "I" (huruf i besar) → Lihat konteks
-       - "5" (lima) vs "S" (huruf S) → Di angka = 5, di kata = S
-       - "8" (delapan) vs "B" (huruf B) → Di angka = 8, di kata = B
-       - "6" (enam) vs "G" (huruf G) → Di angka = 6, di kata = G
-    
-    2. NAMA BARANG - Baca dengan teliti:
-       - "Beras Premium" BUKAN "Beras Premum" atau "Beras Premlum"
-       - "Minyak Goreng" BUKAN "Mlnyak Goreng" atau "Minyak Goreng"
-       - Perhatikan ejaan yang benar
-    
-    3. QUANTITY - Validasi dengan total:
-       - Jika qty=5, harga_satuan=10000, maka total_harga HARUS 50000
-       - Jika tidak match, kemungkinan qty atau harga salah baca
-    
-    4. HARGA - Perhatikan pemisah ribuan:
-       - "15.000" atau "15,000" atau "15000" = 15000
-       - "20k" atau "20rb" = 20000
-       - Jangan lupa hapus pemisah ribuan
-    
-    ATURAN KHUSUS HARGA:
-    - Jika harga tertulis "20", "25", "30" dll (angka kecil), cek apakah masuk akal
-    - Jika total_harga jauh lebih besar, kemungkinan harga dalam ribuan (20 = 20.000)
-    - Jika ada notasi "k" atau "rb", kalikan dengan 1000 (20k = 20000)
-    - Pastikan qty × harga_satuan = total_harga
-    - Format dengan titik/koma (15.000 atau 15,000) → 15000
-    
-    YANG DIABAIKAN:
-    - Subtotal, pajak (tax/PPN), diskon, total pembayaran akhir
-    - Informasi kasir, tanda tangan
-    
-    Contoh output:
-    {
-      "metadata": {
-        "tanggal": "2024-01-15",
-        "nama_toko": "Toko Sumber Rezeki",
-        "nomor_rekening": "1234567890",
-        "nama_bank": "BCA",
-        "pemilik_rekening": "Budi Santoso",
-        "jenis_pembayaran": "Transfer",
-        "confidence": {
-          "tanggal": 95,
-          "nama_toko": 100,
-          "nomor_rekening": 90,
-          "nama_bank": 95,
-          "pemilik_rekening": 85,
-          "jenis_pembayaran": 80
-        }
-      },
-      "items": [
-        {
-          "nama_barang": "Beras Premium",
-          "qty": 5,
-          "unit": "kg",
-          "harga_satuan": 15000,
-          "total_harga": 75000,
-          "kategori_transaksi": "Bama",
-          "confidence": {
-            "nama_barang": 95,
-            "qty": 100,
-            "unit": 90,
-            "harga_satuan": 90,
-            "total_harga": 90,
-            "kategori_transaksi": 100
-          }
-        },
-        {
-          "nama_barang": "Minyak Goreng",
-          "qty": 2,
-          "unit": "liter",
-          "harga_satuan": 25000,
-          "total_harga": 50000,
-          "kategori_transaksi": "Bama",
-          "confidence": {
-            "nama_barang": 100,
-            "qty": 100,
-            "unit": 95,
-            "harga_satuan": 95,
-            "total_harga": 95,
-            "kategori_transaksi": 100
-          }
-        }
-      ]
-    }
-    
-    Jika tidak ada item: {"metadata": {...}, "items": []}
-    """
-
     try:
-        response = client.chat.completions.create(
-            model=model,  # Gunakan model yang dipilih user
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Anda adalah AI expert untuk OCR nota belanja Indonesia. 
-                    Tugas Anda: Ekstrak data dengan SANGAT TELITI dan AKURAT.
-                    
-                    PENTING:
-                    - Baca SETIAP karakter dengan hati-hati
-                    - Jangan skip atau asumsikan data
-                    - Jika ragu, beri confidence rendah
-                    - Perhatikan konteks untuk validasi (misal: harga harus masuk akal)
-                    """
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt_text},
-                        {"type": "image_url", "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}",
-                            "detail": "high"  # PENTING: Gunakan detail tinggi untuk akurasi maksimal
-                        }}
-                    ],
-                }
-            ],
-            response_format={"type": "json_object"},
-            temperature=0,  # 0 untuk konsistensi maksimal
-            max_tokens=4096  # Cukup untuk nota panjang
-        )
-        
-        result_content = response.choices[0].message.content
-        parsed_result = json.loads(result_content)
+        with pipeline_metrics.span("ocr", model=model):
+            parsed_result = ocr_receipt_image(image_bytes, mime_type, model)
         
         # Validasi struktur response
         if 'items' not in parsed_result:
@@ -357,273 +220,530 @@ def process_image_with_gpt4o(image_bytes, mime_type, model="gpt-4o"):
         return None
 
 def convert_pdf_to_image(pdf_bytes):
-    """Mengubah halaman pertama PDF menjadi gambar (bytes)"""
+    """Mengubah halaman pertama PDF menjadi gambar (bytes), dipakai untuk preview"""
     try:
-        images = convert_from_bytes(pdf_bytes, dpi=300)  # DPI tinggi untuk kualitas OCR lebih baik
-        if images:
-            # Ambil halaman pertama saja
-            first_page = images[0]
-            img_byte_arr = BytesIO()
-            first_page.save(img_byte_arr, format='JPEG', quality=95)
-            return img_byte_arr.getvalue(), "image/jpeg"
+        # Render halaman pertama saja, tidak perlu merender seluruh dokumen
+        with pipeline_metrics.span("pdf_preview"):
+            first_page = rasterize_pdf_page(pdf_bytes, 1, pdf_hash=ocr_cache.content_hash(pdf_bytes))
+        if first_page:
+            return first_page, "image/jpeg"
         return None, None
     except Exception as e:
         st.error(f"Error konversi PDF: {e}")
         st.info("Pastikan Poppler sudah terinstall. Di macOS: brew install poppler")
         return None, None
 
-def validate_and_correct_items(items):
+def process_pdf_with_gpt4o(pdf_bytes, model="gpt-4o", on_page_done=None, spill_dir=None):
     """
-    Validasi dan koreksi otomatis data hasil ekstraksi AI.
-    
-    Menangani:
-    1. Hyper-efficiency: Harga "20" yang sebenarnya "20.000" 
-    2. Kuantitas abstrak: "1/2" atau "0.5" untuk setengah
-    3. Balance check: qty × harga_satuan = total_harga
-    4. Confidence score: Mempertahankan skor kepercayaan dari AI
-    5. Field baru: unit, kategori_transaksi
+    Ekstrak SEMUA halaman PDF secara paralel (lihat `ocr_pdf_pages`).
     
+    Args:
+        on_page_done: callback(selesai, total_halaman), dipanggil di script thread
+        spill_dir: Folder sementara untuk render halaman langsung ke disk (batch besar)
+        
     Returns:
-        list: Items yang sudah dikoreksi
-        list: Log koreksi yang dilakukan
+        dict hasil gabungan (lihat `merge_page_results`) atau None jika semua halaman gagal
     """
-    corrected_items = []
-    correction_logs = []
+    if not CLIENT_READY:
+        st.error("OpenAI client belum diinisialisasi. Periksa API key Anda.")
+        return None
     
-    for idx, item in enumerate(items):
-        original_item = item.copy()
-        
-        # Pastikan semua field ada
-        nama = item.get('nama_barang', f'Item {idx+1}')
-        qty = item.get('qty', 1)
-        unit = item.get('unit', 'pcs')
-        harga_satuan = item.get('harga_satuan', 0)
-        total_harga = item.get('total_harga', 0)
-        kategori = item.get('kategori_transaksi', 'Non Bama')
-        
-        # Ambil confidence score jika ada, atau buat default
-        confidence = item.get('confidence', {
-            'nama_barang': 100,
-            'qty': 100,
-            'unit': 100,
-            'harga_satuan': 100,
-            'total_harga': 100,
-            'kategori_transaksi': 100
-        })
-        
-        # Pastikan confidence adalah dict
-        if not isinstance(confidence, dict):
-            confidence = {
-                'nama_barang': 100,
-                'qty': 100,
-                'unit': 100,
-                'harga_satuan': 100,
-                'total_harga': 100,
-                'kategori_transaksi': 100
-            }
-        
-        # Convert ke numeric jika masih string
+    try:
+        total_pages = count_pdf_pages(pdf_bytes)
+    except Exception as e:
+        st.error(f"Error konversi PDF: {e}")
+        st.info("Pastikan Poppler sudah terinstall. Di macOS: brew install poppler")
+        return None
+    
+    page_results, page_errors = ocr_pdf_pages(pdf_bytes, model, on_page_done, spill_dir, total_pages)
+    
+    for page, error in sorted(page_errors.items()):
+        st.warning(f"⚠️ Halaman {page} gagal diproses: {error}")
+    
+    if not page_results:
+        st.error("Error saat memanggil OpenAI API: semua halaman PDF gagal diproses")
+        return None
+    
+    return merge_page_results(page_results)
+
+def extract_nota(file_bytes, file_type, model="gpt-4o", on_page_done=None, spill_dir=None):
+    """Ekstrak data nota dari gambar, atau dari semua halaman PDF"""
+    if file_type == "application/pdf":
+        return process_pdf_with_gpt4o(file_bytes, model, on_page_done, spill_dir)
+    return process_image_with_gpt4o(file_bytes, file_type, model)
+
+def scheduler_ticket(priority):
+    """Ticket scheduler untuk pekerjaan session ini (fair sharing antar session, lihat scheduler.py)"""
+    if 'scheduler_session' not in st.session_state:
+        st.session_state.scheduler_session = uuid.uuid4().hex
+    return scheduler.Ticket(priority, st.session_state.scheduler_session)
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Thread pool prefetch dipakai bersama semua session (membatasi request latar belakang)"""
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+def get_prefetcher():
+    """Prefetcher milik session ini"""
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = prefetch.Prefetcher(get_prefetch_executor())
+    return st.session_state.prefetcher
+
+def sync_prefetch(files, model, enabled):
+    """Mulai prefetch untuk file baru, batalkan file yang sudah dihapus dari uploader"""
+    prefetcher = get_prefetcher()
+    # Batch besar diproses mode hemat memori (tanpa prefetch) supaya hasilnya tidak menumpuk di memory
+    if not enabled or not files or len(files) >= STREAMING_BATCH_MIN_FILES:
+        prefetcher.cancel_all()
+        return None
+    # Prefetch spekulatif berjalan sebagai backfill; kelasnya dinaikkan saat hasilnya ditunggu (prefetched_document)
+    tickets = st.session_state.setdefault('prefetch_tickets', {})
+    jobs = {}
+    for file in files:
+        key = (file.file_id, model)
+        ticket = tickets.get(key) or scheduler_ticket(scheduler.BACKFILL)
+        tickets[key] = ticket
+        jobs[key] = (scheduler.bind(ticket, extract_document), (file.getvalue(), file.type, model))
+    for key in list(tickets):
+        if key not in jobs:
+            del tickets[key]
+    prefetcher.sync(jobs)
+    return prefetcher.summary()
+
+def prefetched_document(uploaded_file, model="gpt-4o"):
+    """Hasil prefetch (hasil, peringatan) untuk file upload; yang masih berjalan ditunggu. None jika tidak ada / gagal"""
+    future = get_prefetcher().get((uploaded_file.file_id, model))
+    if future is None or future.cancelled():
+        return None
+    ticket = st.session_state.get('prefetch_tickets', {}).get((uploaded_file.file_id, model))
+    if ticket is not None:
+        # User sekarang menunggu hasil ini: ikut kelas pemanggil (scan satu file / batch)
+        ticket.promote(scheduler.current().priority)
+    try:
+        return future.result()
+    except Exception:
+        return None  # Diulang lewat jalur biasa supaya error ditampilkan seperti biasa
+
+def extract_nota_prefetched(uploaded_file, model="gpt-4o", on_page_done=None):
+    """
+    `extract_nota` untuk file upload: hasil prefetch dipakai jika ada (yang masih
+    berjalan ditunggu), selain itu / jika prefetch gagal diekstrak seperti biasa.
+    """
+    prefetched = prefetched_document(uploaded_file, model)
+    if prefetched is not None:
+        json_data, warnings = prefetched
+        for warning in warnings:
+            st.warning(f"⚠️ {warning}")
+        return json_data
+    return extract_nota(uploaded_file.getvalue(), uploaded_file.type, model, on_page_done)
+
+BATCH_STATUS_LABELS = {
+    'pending': "🕓 Menunggu",
+    'running': "⏳ Diproses",
+    'ok': "✅ OK",
+    'low_conf': "⚠️ Confidence rendah",
+    'empty': "➖ Tanpa item",
+    'failed': "❌ Gagal",
+}
+
+def scan_batch_file(uploaded_file, model="gpt-4o", use_catalog=True):
+    """
+    Scan satu file batch sampai menjadi baris tabel hasil.
+
+    Returns:
+        tuple: (DataFrame baris hasil, log koreksi, jumlah field confidence rendah, stats preprocess)
+    """
+    # extract_document melempar error (bukan st.error) supaya pesannya bisa dicatat di status file
+    json_data, warnings = (
+        prefetched_document(uploaded_file, model)
+        or extract_document(uploaded_file.getvalue(), uploaded_file.type, model)
+    )
+    for warning in warnings:
+        st.warning(f"⚠️ [{uploaded_file.name}] {warning}")
+    if 'items' not in json_data:
+        return pd.DataFrame(), [], 0, json_data.get('preprocess')
+
+    metadata, items, correction_logs = correct_result(json_data, use_catalog)
+    low_conf_count = 0
+    for item in items:
+        item['source_file'] = uploaded_file.name
+        low_conf_count += sum(1 for score in item.get('confidence', {}).values() if score < 80)
+
+    df = prepare_dataframe_with_confidence(items, metadata)
+    logs = [f"[{uploaded_file.name}] {log}" for log in correction_logs]
+    return df, logs, low_conf_count, json_data.get('preprocess')
+
+def load_pending_batch():
+    """Muat hasil sementara batch (session_state.pending_batch) ke editor, jika ada"""
+    pending = st.session_state.pop('pending_batch', None)
+    if pending and pending['frames']:
+        set_scan_result(pd.concat(pending['frames']), pending['totals'], pending['warnings'])
+
+def new_batch_status(files):
+    """Status awal semua file batch (session_state.batch_files)"""
+    return {
+        file.file_id: {'name': file.name, 'status': 'pending', 'items': 0, 'low_conf': 0, 'error': None}
+        for file in files
+    }
+
+def update_batch_status(file_id, item_count=0, low_conf_count=0, error=None):
+    """Catat hasil satu file di status batch (session_state.batch_files)"""
+    entry = st.session_state.batch_files[file_id]
+    if error is not None:
+        entry.update(status='failed', items=0, low_conf=0, error=str(error))
+    elif not item_count:
+        entry.update(status='empty', items=0, low_conf=0, error=None)
+    else:
+        entry.update(status='low_conf' if low_conf_count else 'ok', items=item_count, low_conf=low_conf_count, error=None)
+
+def batch_status_frame(batch_files):
+    return pd.DataFrame([
+        {
+            'File': entry['name'],
+            'Status': BATCH_STATUS_LABELS[entry['status']],
+            'Item': entry['items'],
+            'Field perlu review': entry['low_conf'],
+            'Keterangan': entry['error'] or '',
+        }
+        for entry in batch_files.values()
+    ])
+
+def on_batch_retry(files, model, use_catalog):
+    """Callback: scan ulang file batch yang gagal, barisnya ditambahkan ke hasil yang sudah ada"""
+    frames, logs, failed = [], [], []
+    ticket = scheduler_ticket(scheduler.BATCH)
+    for file in files:
         try:
-            qty = float(qty) if not isinstance(qty, (int, float)) else qty
-            harga_satuan = int(harga_satuan) if not isinstance(harga_satuan, (int, float)) else harga_satuan
-            total_harga = int(total_harga) if not isinstance(total_harga, (int, float)) else total_harga
-        except:
-            correction_logs.append(f"⚠️ Item '{nama}': Gagal convert ke numeric, skip")
+            with scheduler.use(ticket):
+                df, file_logs, low_conf_count, _ = scan_batch_file(file, model, use_catalog)
+        except Exception as e:
+            update_batch_status(file.file_id, error=e)
+            failed.append(file.name)
             continue
-        
-        # KOREKSI 1: Deteksi hyper-efficiency pada harga_satuan
-        # Jika harga_satuan < 1000 tapi total_harga > 10000, kemungkinan harga dalam ribuan
-        if harga_satuan < 1000 and total_harga > 10000:
-            # Cek apakah total_harga adalah kelipatan ribuan dari harga_satuan
-            multiplier = total_harga / (harga_satuan * qty) if qty > 0 else 0
-            
-            # Jika multiplier mendekati 1000, berarti harga_satuan seharusnya dikali 1000
-            if 900 <= multiplier <= 1100:
-                old_harga = harga_satuan
-                harga_satuan = harga_satuan * 1000
-                correction_logs.append(
-                    f"✅ '{nama}': Harga satuan dikoreksi {old_harga} → {harga_satuan:,} (hyper-efficiency)"
-                )
-                # Turunkan confidence karena ada koreksi
-                confidence['harga_satuan'] = min(confidence.get('harga_satuan', 100), 80)
-        
-        # KOREKSI 2: Deteksi hyper-efficiency pada total_harga
-        # Jika total_harga < 1000 tapi harga_satuan > 10000
-        if total_harga < 1000 and harga_satuan > 10000:
-            multiplier = (harga_satuan * qty) / total_harga if total_harga > 0 else 0
-            
-            if 900 <= multiplier <= 1100:
-                old_total = total_harga
-                total_harga = total_harga * 1000
-                correction_logs.append(
-                    f"✅ '{nama}': Total harga dikoreksi {old_total} → {total_harga:,} (hyper-efficiency)"
-                )
-                # Turunkan confidence karena ada koreksi
-                confidence['total_harga'] = min(confidence.get('total_harga', 100), 80)
-        
-        # KOREKSI 3: Balance check - qty × harga_satuan = total_harga
-        expected_total = qty * harga_satuan
-        
-        # Toleransi 5% untuk pembulatan
-        tolerance = 0.05
-        diff_ratio = abs(expected_total - total_harga) / expected_total if expected_total > 0 else 0
-        
-        if diff_ratio > tolerance:
-            # Ada ketidaksesuaian, tentukan mana yang benar
-            
-            # Strategi: Percaya total_harga, koreksi harga_satuan
-            # Karena biasanya total_harga lebih akurat di nota
-            if total_harga > 0 and qty > 0:
-                old_harga_satuan = harga_satuan
-                harga_satuan = int(total_harga / qty)
-                
-                correction_logs.append(
-                    f"⚖️ '{nama}': Balance dikoreksi - Harga satuan {old_harga_satuan:,} → {harga_satuan:,} "
-                    f"(qty={qty}, total={total_harga:,})"
-                )
-                # Turunkan confidence karena ada koreksi
-                confidence['harga_satuan'] = min(confidence.get('harga_satuan', 100), 70)
-            # Jika total_harga = 0, hitung dari qty × harga_satuan
-            elif total_harga == 0 and harga_satuan > 0:
-                total_harga = int(qty * harga_satuan)
-                correction_logs.append(
-                    f"⚖️ '{nama}': Total harga dihitung = {total_harga:,} (dari qty × harga_satuan)"
-                )
-                # Turunkan confidence karena ada koreksi
-                confidence['total_harga'] = min(confidence.get('total_harga', 100), 70)
-        
-        # Simpan item yang sudah dikoreksi dengan confidence score
-        corrected_items.append({
-            'nama_barang': nama,
-            'qty': qty,
-            'unit': unit,
-            'harga_satuan': int(harga_satuan),
-            'total_harga': int(total_harga),
-            'kategori_transaksi': kategori,
-            'confidence': confidence
-        })
-    
-    return corrected_items, correction_logs
-
-def prepare_dataframe_with_confidence(items, metadata=None):
+        update_batch_status(file.file_id, len(df), low_conf_count)
+        logs.extend(file_logs)
+        if not df.empty:
+            frames.append(df)
+
+    added = sum(len(frame) for frame in frames)
+    if frames:
+        # Hasil yang sudah ada (termasuk editan user) dipertahankan, baris baru ditambahkan di akhir
+        if st.session_state.ocr_result_df is not None:
+            frames.insert(0, st.session_state.ocr_result_df)
+        set_scan_result(pd.concat(frames, ignore_index=True))
+
+    if failed:
+        st.session_state.batch_notice = ('error', f"❌ Masih gagal: {', '.join(failed)}")
+    else:
+        st.session_state.batch_notice = (
+            'success', f"🔁 {len(files)} file di-scan ulang: {added} item ditambahkan ({len(logs)} koreksi otomatis)"
+        )
+
+def process_streaming_batch(files, model, store, use_catalog=True, window_size=BATCH_WINDOW_SIZE, on_file_done=None):
     """
-    Menyiapkan DataFrame dengan kolom confidence indicator dan metadata.
+    Batch hemat memory: file diproses per window dan semuanya di-spill ke disk.
     
-    Menambahkan emoji/simbol untuk menandai field dengan confidence rendah:
-    - 🟢 (>= 80): Confidence tinggi
-    - 🟡 (70-79): Confidence sedang
-    - 🔴 (< 70): Confidence rendah - perlu review
+    Untuk setiap window: bytes upload disalin ke disk, lalu setiap file dibaca
+    dari disk, diekstrak (halaman PDF dirender langsung ke disk), dan baris
+    hasilnya ditulis ke `store`. Referensi dilepas setelah setiap window,
+    sehingga memory puncak tidak bertambah seiring jumlah file.
     
     Args:
-        items: List of dict dengan confidence score
-        metadata: Dict dengan informasi nota (tanggal, nama_toko, dll)
+        files: List UploadedFile
+        store: spill_store.SpillStore tujuan spill
+        on_file_done: callback(selesai, total, UploadedFile, error, jumlah item, field confidence rendah),
+            dipanggil di script thread
         
     Returns:
-        DataFrame dengan kolom lengkap sesuai urutan yang dibutuhkan
+        int: jumlah field dengan confidence rendah
     """
-    df_data = []
-    
-    # Default metadata jika tidak ada
-    if metadata is None:
-        metadata = {
-            'tanggal': None,
-            'nama_toko': 'Unknown',
-            'nomor_rekening': None,
-            'nama_bank': None,
-            'pemilik_rekening': None,
-            'jenis_pembayaran': 'Cash'
-        }
+    low_conf_count = 0
+    total_files = len(files)
     
-    for item in items:
-        confidence = item.get('confidence', {})
-        
-        # Buat visual indicator untuk setiap field
-        nama_conf = confidence.get('nama_barang', 100)
-        qty_conf = confidence.get('qty', 100)
-        unit_conf = confidence.get('unit', 100)
-        harga_conf = confidence.get('harga_satuan', 100)
-        total_conf = confidence.get('total_harga', 100)
-        kategori_conf = confidence.get('kategori_transaksi', 100)
-        
-        # Fungsi untuk mendapatkan emoji berdasarkan confidence
-        def get_indicator(conf_score):
-            if conf_score >= 80:
-                return ""  # Tidak perlu indicator jika confidence tinggi
-            elif conf_score >= 70:
-                return "⚠️"  # Warning untuk confidence sedang
-            else:
-                return "❗"  # Alert untuk confidence rendah
-        
-        # Tambahkan indicator ke field yang perlu
-        nama_display = item.get('nama_barang', '')
-        nama_indicator = get_indicator(nama_conf)
+    for window_start in range(0, total_files, window_size):
+        window = files[window_start:window_start + window_size]
+        spilled = [(file, store.put_file(file)) for file in window]
         
-        # Jika ada field numeric dengan confidence rendah, tambahkan indicator di nama juga
-        # Karena NumberColumn tidak bisa menampilkan emoji
-        indicators_to_add = []
-        if nama_indicator:
-            indicators_to_add.append(nama_indicator)
+        for offset, (file, path) in enumerate(spilled):
+            error = None
+            item_count = file_low_conf = 0
+            try:
+                # extract_document melempar error (bukan st.error) supaya file yang gagal OCR tercatat
+                json_data, warnings = extract_document(store.read_bytes(path), file.type, model, spill_dir=store.dir)
+                for warning in warnings:
+                    st.warning(f"⚠️ [{file.name}] {warning}")
+                
+                if 'items' in json_data:
+                    metadata, corrected_items, correction_logs = correct_result(json_data, use_catalog)
+                    
+                    for item in corrected_items:
+                        item['source_file'] = file.name
+                        file_low_conf += sum(1 for score in item.get('confidence', {}).values() if score < 80)
+                    
+                    store.append_rows(build_result_rows(corrected_items, metadata))
+                    store.append_logs([f"[{file.name}] {log}" for log in correction_logs])
+                    item_count = len(corrected_items)
+                    low_conf_count += file_low_conf
+            except Exception as e:
+                error = e
+            finally:
+                store.discard(path)
+            
+            if on_file_done:
+                on_file_done(window_start + offset + 1, total_files, file, error, item_count, file_low_conf)
         
-        # Cek field numeric lainnya
-        if qty_conf < 80 and qty_conf not in [nama_conf]:
-            indicators_to_add.append(get_indicator(qty_conf))
-        if harga_conf < 80 and harga_conf not in [nama_conf, qty_conf]:
-            indicators_to_add.append(get_indicator(harga_conf))
-        if total_conf < 80 and total_conf not in [nama_conf, qty_conf, harga_conf]:
-            indicators_to_add.append(get_indicator(total_conf))
+        # Lepas semua referensi window ini sebelum lanjut ke window berikutnya
+        del spilled, window
+        gc.collect()
+    
+    return low_conf_count
+
+@st.cache_resource
+def get_bulk_store():
+    """Status job bulk offline (SQLite lokal + bytes gambar di BULK_DIR)"""
+    return bulk_batch.BulkStore(LOCAL_DB_PATH, BULK_DIR)
+
+@st.cache_resource
+def get_bulk_backend():
+    """Client Batch API; memakai BULK_BATCH_BASE_URL jika diset (mis. stand-in lokal)"""
+    from openai import OpenAI
+    
+    batch_client = OpenAI(api_key=OPENAI_API_KEY, base_url=BULK_BATCH_BASE_URL or OPENAI_BASE_URL)
+    return bulk_batch.OpenAIBatchBackend(batch_client)
+
+def prepare_bulk_job(files, model, on_file_done=None):
+    """
+    Daftarkan semua file sebagai item job bulk (PDF: satu item per halaman).
+    
+    Gambar yang hasilnya sudah ada di cache OCR langsung berstatus `done`.
+    
+    Returns:
+        str: job_id
+    """
+    store = get_bulk_store()
+    cache = shared_cache()
+    job_id = store.create_job(model, note=f"{len(files)} file")
+    seq = 0
+    
+    for index, file in enumerate(files, start=1):
+        file_bytes = file.getvalue()
+        if file.type == "application/pdf":
+            pdf_hash = ocr_cache.content_hash(file_bytes)
+            pages = [
+                (page, rasterize_pdf_page(file_bytes, page, pdf_hash=pdf_hash), "image/jpeg")
+                for page in range(1, count_pdf_pages(file_bytes) + 1)
+            ]
+        else:
+            image_bytes, mime_type, _ = preprocess_receipt_image(file_bytes, file.type)
+            pages = [(None, image_bytes, mime_type)]
         
-        # Gabungkan semua indicator (unique)
-        unique_indicators = list(dict.fromkeys(indicators_to_add))  # Remove duplicates
-        if unique_indicators:
-            nama_display = f"{' '.join(unique_indicators)} {nama_display}"
+        for page, image_bytes, mime_type in pages:
+            if not image_bytes:
+                continue
+            seq += 1
+            detail, expected_items = plan_ocr_request(image_bytes, model)
+            key = ocr_cache.ocr_key(ocr_cache.content_hash(image_bytes), model, prompt_version(), detail)
+            cached = cache.get_json(key) if cache is not None else None
+            store.add_item(
+                job_id, seq, file.name, image_bytes, mime_type, detail, expected_items,
+                halaman=page, cache_key=key, result=cached
+            )
         
-        unit_display = item.get('unit', 'pcs')
-        unit_indicator = get_indicator(unit_conf)
-        if unit_indicator:
-            unit_display = f"{unit_indicator} {unit_display}"
+        if on_file_done:
+            on_file_done(index, len(files), file.name)
+    
+    return job_id
+
+def bulk_structured_outputs(model):
+    """JSON schema untuk baris batch: batch tidak bisa fallback per request, jadi ikuti dukungan yang tercatat"""
+    return (
+        OCR_OUTPUT_FORMAT == wire_format.COMPACT and OCR_STRUCTURED_OUTPUTS
+        and get_structured_output_support().get((BULK_BATCH_BASE_URL or OPENAI_BASE_URL, model), True)
+    )
+
+def submit_bulk_job(job_id):
+    """Kirim semua item pending sebagai satu atau beberapa batch, return jumlah item yang dikirim"""
+    store = get_bulk_store()
+    backend = get_bulk_backend()
+    model = store.job(job_id)['model']
+    structured = bulk_structured_outputs(model)
+    
+    def build_body(item):
+        return build_ocr_request(
+            store.read_bytes(item), item['mime_type'], model, item['detail'], item['expected_items'], structured
+        )
+    
+    submitted = 0
+    pending = store.items(job_id, bulk_batch.PENDING)
+    for path, custom_ids in bulk_batch.write_batches(pending, build_body, BULK_MAX_BATCH_MB, tmp_dir=SPILL_DIR):
+        batch_id = backend.submit(path, metadata={'job_id': job_id})
+        store.mark_submitted(custom_ids, batch_id)
+        submitted += len(custom_ids)
+    return submitted
+
+def poll_bulk_job(job_id):
+    """
+    Cek status semua batch job ini dan simpan hasil batch yang sudah selesai.
+    
+    - Respons yang valid → `done` (dan masuk cache OCR)
+    - Hasil detail `low` yang ragu (mode auto) → kembali `pending` dengan detail `high`
+    - Respons terpotong (max_tokens) → kembali `pending` dengan batas token penuh
+    - Error per request → `failed` dengan pesan error
+    - Batch expired/cancelled → item yang belum selesai kembali `pending`
+    
+    Returns:
+        dict: jumlah batch per status API
+    """
+    store = get_bulk_store()
+    backend = get_bulk_backend()
+    cache = shared_cache()
+    model = store.job(job_id)['model']
+    batch_status = {}
+    
+    for batch_id in store.active_batches(job_id):
+        info = backend.retrieve(batch_id)
+        batch_status[info['status']] = batch_status.get(info['status'], 0) + 1
+        if info['status'] not in bulk_batch.BATCH_FINISHED + bulk_batch.BATCH_RETRYABLE + bulk_batch.BATCH_FAILED:
+            continue  # validating / in_progress / finalizing
         
-        kategori_display = item.get('kategori_transaksi', 'Non Bama')
-        kategori_indicator = get_indicator(kategori_conf)
-        if kategori_indicator:
-            kategori_display = f"{kategori_indicator} {kategori_display}"
+        items = {item['custom_id']: item for item in store.items(job_id, bulk_batch.SUBMITTED) if item['batch_id'] == batch_id}
+        updates = []
+        for file_id in (info['output_file_id'], info['error_file_id']):
+            if not file_id:
+                continue
+            for line in backend.download(file_id).splitlines():
+                if not line.strip():
+                    continue
+                custom_id, body, error = bulk_batch.parse_output_line(line)
+                item = items.pop(custom_id, None)
+                if item is None:
+                    continue
+                updates.append((custom_id, _bulk_item_update(item, model, body, error, cache)))
         
-        # Urutan kolom sesuai kebutuhan:
-        # Tanggal, Nama Toko, Nomor Rekening, Nama Bank, Pemilik Rekening, 
-        # Jenis Pembayaran, Kategori Transaksi, Quantity, Unit, Nama Barang, 
-        # Harga Satuan, Harga Total
-        row = {
-            'tanggal': None,  # Biarkan kosong sesuai permintaan user
-            'nama_toko': metadata.get('nama_toko', 'Unknown'),
-            'nomor_rekening': metadata.get('nomor_rekening'),
-            'nama_bank': metadata.get('nama_bank'),
-            'pemilik_rekening': metadata.get('pemilik_rekening'),
-            'jenis_pembayaran': metadata.get('jenis_pembayaran', 'Cash'),
-            'kategori_transaksi': kategori_display,
-            'qty': item.get('qty', 1),
-            'unit': unit_display,
-            'nama_barang': nama_display,
-            'harga_satuan': item.get('harga_satuan', 0),
-            'total_harga': item.get('total_harga', 0),
-            # Simpan confidence untuk referensi (hidden)
-            '_conf_nama': nama_conf,
-            '_conf_qty': qty_conf,
-            '_conf_unit': unit_conf,
-            '_conf_harga': harga_conf,
-            '_conf_total': total_conf,
-            '_conf_kategori': kategori_conf,
-            # Simpan nilai asli tanpa indicator
-            '_nama_asli': item.get('nama_barang', ''),
-            '_unit_asli': item.get('unit', 'pcs'),
-            '_kategori_asli': item.get('kategori_transaksi', 'Non Bama')
-        }
+        # Item tanpa baris output: batch kadaluarsa/dibatalkan → kirim ulang, batch gagal → failed
+        for custom_id in items:
+            if info['status'] in bulk_batch.BATCH_FAILED:
+                message = "; ".join(info['errors']) or "Batch gagal diproses"
+                updates.append((custom_id, {'status': bulk_batch.FAILED, 'error': message}))
+            else:
+                updates.append((custom_id, {'status': bulk_batch.PENDING, 'batch_id': None}))
+        store.update_items(updates)
+    
+    return batch_status
+
+def _bulk_item_update(item, model, body, error, cache):
+    if error is not None:
+        if 'json_schema' in error or 'response_format' in error:
+            # Endpoint batch menolak JSON schema: batch berikutnya (termasuk ulangan) memakai JSON mode
+            get_structured_output_support()[(BULK_BATCH_BASE_URL or OPENAI_BASE_URL, model)] = False
+        return {'status': bulk_batch.FAILED, 'error': error}
+    try:
+        choice = body['choices'][0]
+        if choice.get('finish_reason') == "length" and item['expected_items']:
+            return {'status': bulk_batch.PENDING, 'batch_id': None, 'expected_items': None}
+        result = parse_ocr_content(choice['message']['content'])
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return {'status': bulk_batch.FAILED, 'error': f"Respons tidak sesuai format: {e}"}
+    
+    if not isinstance(result, dict) or 'items' not in result:
+        return {'status': bulk_batch.FAILED, 'error': "Respons tidak sesuai format (tidak ada 'items')"}
+    if item['detail'] == 'low' and IMAGE_DETAIL != 'low' and detail_planner.needs_escalation(result):
+        image_hash = ocr_cache.content_hash(get_bulk_store().read_bytes(item))
+        key = ocr_cache.ocr_key(image_hash, model, prompt_version(), 'high')
+        return {'status': bulk_batch.PENDING, 'batch_id': None, 'detail': 'high', 'cache_key': key}
+    
+    if cache is not None and item['cache_key']:
+        cache.set_json(item['cache_key'], result)
+    return {'status': bulk_batch.DONE, 'result': result, 'error': None}
+
+def load_bulk_results(job_id, use_catalog=True):
+    """
+    Bangun DataFrame hasil dari item `done` sebuah job (validasi & katalog sama
+    seperti batch biasa), siap dimuat ke editor lalu disimpan lewat tombol Simpan.
+    
+    Returns:
+        tuple: (DataFrame, log koreksi, jumlah field confidence rendah)
+    """
+    pages_by_file = {}
+    for item in get_bulk_store().items(job_id, bulk_batch.DONE):
+        page = item['halaman'] or 1
+        pages_by_file.setdefault(item['source_file'], {})[page] = (item['halaman'], json.loads(item['result']))
+    
+    rows = []
+    all_logs = []
+    low_conf_count = 0
+    for file_name, pages in pages_by_file.items():
+        if len(pages) == 1 and next(iter(pages.values()))[0] is None:
+            json_data = next(iter(pages.values()))[1]
+        else:
+            json_data = merge_page_results({page: result for page, (_, result) in pages.items()})
         
-        # Tambahkan source_file jika ada (untuk batch mode)
-        if 'source_file' in item:
-            row['source_file'] = item['source_file']
+        metadata, corrected_items, correction_logs = correct_result(json_data, use_catalog)
         
-        df_data.append(row)
+        for item in corrected_items:
+            item['source_file'] = file_name
+            low_conf_count += sum(1 for score in item.get('confidence', {}).values() if score < 80)
+        rows.extend(build_result_rows(corrected_items, metadata))
+        all_logs.extend(f"[{file_name}] {log}" for log in correction_logs)
     
-    return pd.DataFrame(df_data)
+    return pd.DataFrame(rows), all_logs, low_conf_count
+
+def on_bulk_refresh(jobs):
+    """Callback: cek status semua job yang sedang diproses, lalu kirim item yang perlu diulang"""
+    finished = 0
+    try:
+        for job in jobs:
+            if not job['counts'][bulk_batch.SUBMITTED]:
+                continue
+            batch_status = poll_bulk_job(job['job_id'])
+            finished += batch_status.get('completed', 0)
+            # Escalation ke detail high / respons terpotong / batch kadaluarsa → batch berikutnya
+            submit_bulk_job(job['job_id'])
+        st.session_state.bulk_notice = ('info', f"🔄 Status diperbarui, {finished} batch selesai")
+    except Exception as e:
+        st.session_state.bulk_notice = ('error', f"❌ Gagal cek status batch: {e}")
+
+def on_bulk_submit(job_id):
+    try:
+        submitted = submit_bulk_job(job_id)
+        st.session_state.bulk_notice = ('success', f"📤 {submitted} request dikirim")
+    except Exception as e:
+        st.session_state.bulk_notice = ('error', f"❌ Gagal mengirim batch: {e}")
+
+def on_bulk_retry(job_id):
+    try:
+        get_bulk_store().retry_failed(job_id)
+        submitted = submit_bulk_job(job_id)
+        st.session_state.bulk_notice = ('success', f"🔁 {submitted} request dikirim ulang")
+    except Exception as e:
+        st.session_state.bulk_notice = ('error', f"❌ Gagal mengirim ulang: {e}")
+
+def on_bulk_load(job_id, use_catalog):
+    """Callback: hasil job bulk divalidasi lalu dimuat ke editor (disimpan lewat tombol Simpan seperti biasa)"""
+    try:
+        df, correction_logs, low_conf_count = load_bulk_results(job_id, use_catalog)
+    except Exception as e:
+        st.session_state.bulk_notice = ('error', f"❌ Gagal memuat hasil: {e}")
+        return
+    if df.empty:
+        st.session_state.bulk_notice = ('warning', "⚠️ Job ini belum punya item yang berhasil diekstrak")
+        return
+    set_scan_result(df)
+    st.session_state.pop('batch_files', None)
+    message = f"📥 {len(df)} item dimuat ke editor ({len(correction_logs)} koreksi otomatis)"
+    if low_conf_count:
+        message += f", {low_conf_count} field confidence rendah"
+    st.session_state.bulk_notice = ('success', message)
+
+def on_bulk_delete(job_id):
+    # Batch yang masih berjalan dibatalkan dulu (best-effort) supaya tidak ditagih percuma
+    for batch_id in get_bulk_store().active_batches(job_id):
+        try:
+            get_bulk_backend().cancel(batch_id)
+        except Exception:
+            pass
+    get_bulk_store().delete_job(job_id)
+    st.session_state.bulk_notice = ('info', f"🗑️ Job {job_id} dihapus")
 
 def validate_dataframe(df):
     """Validasi data hasil ekstraksi"""
@@ -638,6 +758,236 @@ def validate_dataframe(df):
     
     return True, "Valid"
 
+def set_scan_result(df, totals=None, warnings=None):
+    """
+    Simpan hasil scan sebagai master frame editor (index = row key yang stabil).
+
+    `totals` / `warnings` yang sudah dihitung per file (batch) dipakai apa adanya;
+    tanpa itu total_harga, ringkasan & peringatan dihitung ulang untuk seluruh frame.
+    """
+    df = df.reset_index(drop=True)
+    if totals is None:
+        # Total dihitung ulang sekali di sini, selanjutnya hanya untuk baris yang diedit
+        result_editor.recalculate_totals(df)
+        totals = result_editor.compute_totals(df)
+        warnings = result_editor.compute_warnings(df)
+    st.session_state.ocr_result_df = df
+    st.session_state.result_totals = totals
+    st.session_state.result_warnings = warnings or {}
+    st.session_state.scan_timestamp = datetime.now()
+    st.session_state.editor_version = st.session_state.get('editor_version', 0) + 1
+    st.session_state.result_version = st.session_state.get('result_version', 0) + 1
+
+def on_result_edited(editor_key, row_keys, defaults):
+    """Callback data_editor: tulis perubahan slice ke master frame berdasarkan row key"""
+    changes = st.session_state.get(editor_key)
+    if not changes or st.session_state.ocr_result_df is None:
+        return
+
+    # Hanya baris yang berubah yang dihitung ulang; ringkasan & peringatan diperbarui dengan selisihnya
+    df, changed = result_editor.apply_changes(
+        st.session_state.ocr_result_df, row_keys, changes, defaults,
+        totals=st.session_state.result_totals,
+        warnings=st.session_state.result_warnings
+    )
+    st.session_state.ocr_result_df = df
+    st.session_state.result_version = st.session_state.get('result_version', 0) + 1
+
+    # Baris ditambah/dihapus → posisi slice bergeser, editor dibuat ulang dengan state kosong
+    if changed['added'] or changed['deleted']:
+        st.session_state.editor_version = st.session_state.get('editor_version', 0) + 1
+
+def result_view(name, compute, *key):
+    """
+    Nilai turunan master frame (kolom tampil, daftar file, slice editor),
+    dihitung sekali per versi hasil dan dipakai ulang di rerun berikutnya.
+
+    Versi (`result_version`) naik setiap kali master frame berubah, jadi
+    rerun yang tidak mengubah data (ganti halaman lalu kembali, klik Simpan,
+    widget sidebar) tidak meng-copy / memfilter ulang ribuan baris.
+    """
+    version = st.session_state.get('result_version', 0)
+    cache = st.session_state.get('result_view_cache')
+    if cache is None or cache['version'] != version:
+        cache = st.session_state.result_view_cache = {'version': version, 'values': {}}
+    cache_key = (name,) + key
+    if cache_key not in cache['values']:
+        cache['values'][cache_key] = compute()
+    return cache['values'][cache_key]
+
+RESULT_COLUMN_CONFIG = {
+    "tanggal": st.column_config.TextColumn("Tanggal", width="medium", help="Format: YYYY-MM-DD atau DD/MM/YYYY"),
+    "nama_toko": st.column_config.TextColumn("Nama Toko", width="medium", required=True),
+    "nomor_rekening": st.column_config.TextColumn("Nomor Rekening", width="medium"),
+    "nama_bank": st.column_config.TextColumn("Nama Bank", width="small"),
+    "pemilik_rekening": st.column_config.TextColumn("Pemilik Rekening", width="medium"),
+    "jenis_pembayaran": st.column_config.SelectboxColumn(
+        "Jenis Pembayaran",
+        width="small",
+        options=["Cash", "Transfer"],
+        required=True
+    ),
+    "kategori_transaksi": st.column_config.SelectboxColumn(
+        "Kategori",
+        width="small",
+        options=["Bama", "Non Bama"],
+        required=True
+    ),
+    "qty": st.column_config.NumberColumn("Qty", width="small", min_value=0.01, required=True),
+    "unit": st.column_config.TextColumn("Unit", width="small", required=True),
+    "nama_barang": st.column_config.TextColumn("Nama Barang", width="large", required=True),
+    "harga_satuan": st.column_config.NumberColumn("Harga Satuan (Rp)", width="medium", format="%d", required=True),
+    "total_harga": st.column_config.NumberColumn("Total Harga (Rp)", width="medium", format="%d", required=True),
+    # Kolom halaman (PDF multi-halaman) & file asal (batch mode), hanya dipakai jika ada
+    "halaman": st.column_config.NumberColumn("Hal.", width="small", format="%d"),
+    "source_file": st.column_config.TextColumn("File Asal", width="medium"),
+}
+
+@st.fragment
+def render_result_editor():
+    """Editor hasil + peringatan + ringkasan; edit cell hanya menjalankan ulang fragment ini"""
+    master_df = st.session_state.ocr_result_df
+    if master_df is None:
+        return
+    display_columns = result_view('columns', lambda: result_editor.visible_columns(master_df))
+
+    # Batch besar: editor hanya menampilkan satu halaman / satu file asal
+    col_view1, col_view2, col_view3 = st.columns([2, 1, 1])
+    with col_view1:
+        file_options = result_view('sources', lambda: result_editor.source_files(master_df))
+        if len(file_options) > 1:
+            selected_source = st.selectbox("📁 File Asal", [result_editor.ALL_FILES] + file_options)
+        else:
+            selected_source = result_editor.ALL_FILES
+    with col_view2:
+        page_size = st.selectbox(
+            "Baris per halaman",
+            result_editor.PAGE_SIZES,
+            index=result_editor.PAGE_SIZES.index(result_editor.DEFAULT_PAGE_SIZE)
+        )
+    group_keys = result_view('groups', lambda: result_editor.group_keys(master_df, selected_source), selected_source)
+    page_count = result_editor.page_count(len(group_keys), page_size)
+    with col_view3:
+        editor_page = st.number_input("Halaman", min_value=1, max_value=page_count, value=1, step=1)
+    row_keys = result_editor.page_keys(group_keys, editor_page, page_size)
+
+    # Hanya slice yang tampil yang dikirim ke browser; perubahan ditulis ke master lewat callback
+    editor_key = f"result_editor_{st.session_state.get('editor_version', 0)}_{selected_source}_{page_size}_{editor_page}"
+    editor_defaults = {} if selected_source == result_editor.ALL_FILES else {'source_file': selected_source}
+    st.data_editor(
+        result_view('slice', lambda: master_df.loc[row_keys, display_columns], selected_source, page_size, editor_page),
+        key=editor_key,
+        on_change=on_result_edited,
+        args=(editor_key, row_keys, editor_defaults),
+        num_rows="dynamic",  # User bisa tambah/hapus baris
+        use_container_width=True,
+        column_config={col: RESULT_COLUMN_CONFIG[col] for col in display_columns if col in RESULT_COLUMN_CONFIG},
+        hide_index=False,
+    )
+    if page_count > 1:
+        st.caption(f"Menampilkan {len(row_keys)} baris (halaman {editor_page} dari {page_count}) · total {len(master_df):,} baris")
+
+    # total_harga dihitung ulang (qty × harga_satuan) untuk baris yang diedit
+    if 'qty' in display_columns and 'harga_satuan' in display_columns and 'total_harga' in display_columns:
+        st.info("💡 Total harga otomatis dihitung ulang: Qty × Harga Satuan")
+
+    # Peringatan validasi per baris (diperbarui hanya untuk baris yang diedit)
+    result_warnings = st.session_state.result_warnings
+    if result_warnings:
+        with st.expander(f"⚠️ {len(result_warnings)} baris perlu dicek", expanded=False):
+            for row_key, messages in list(result_warnings.items())[:100]:
+                st.caption(f"• Baris {row_key}: {'; '.join(messages)}")
+            if len(result_warnings) > 100:
+                st.caption(f"... dan {len(result_warnings) - 100} baris lainnya")
+
+    # Summary (running total, diperbarui incremental oleh callback editor)
+    result_totals = st.session_state.result_totals
+    col_sum1, col_sum2, col_sum3 = st.columns(3)
+    with col_sum1:
+        st.metric("Total Items", result_totals['items'])
+    with col_sum2:
+        st.metric("Total Quantity", int(result_totals['qty']))
+    with col_sum3:
+        st.metric("Grand Total", f"Rp {result_totals['grand_total']:,.0f}")
+
+def save_scan_result(selected_sinks, use_catalog):
+    """Simpan master frame ke semua sink yang dipilih (dipanggil dari fragment kontrol simpan)"""
+    # Master frame dibaca saat tombol diklik: selalu berisi edit terakhir dari fragment editor
+    master_df = st.session_state.ocr_result_df
+    if master_df is None or master_df.empty:
+        st.error("❌ Tidak ada data untuk disimpan")
+        return
+
+    # Bersihkan emoji indicator & gabungkan confidence + source_file dari hasil scan
+    display_columns = result_view('columns', lambda: result_editor.visible_columns(master_df))
+    conf_cols = [col for col in master_df.columns if col.startswith('_conf_')]
+    save_df = result_store.prepare_save_frame(master_df[display_columns], master_df[conf_cols])
+
+    sinks = result_store.build_sinks(selected_sinks, connect_to_gsheet, LOCAL_DB_PATH, PARQUET_DIR)
+    saved_to = []
+    for sink in sinks:
+        try:
+            with pipeline_metrics.span("save", sink=sink.name):
+                saved_count = sink.write(save_df)
+            pipeline_metrics.count('saved_rows_total', saved_count, sink=sink.name)
+            saved_to.append(sink.label)
+            if sink.name == result_store.GoogleSheetSink.name:
+                worksheets = ", ".join(f"{title} ({count})" for title, count in sink.written.items())
+                st.success(f"✅ Berhasil menyimpan {saved_count} item ke Google Sheet: **{SHEET_NAME}** · {worksheets}")
+            else:
+                st.success(f"✅ Berhasil menyimpan {saved_count} item ke {sink.label}")
+        except Exception as e:
+            st.error(f"❌ Gagal menyimpan data ke {sink.label}: {e}")
+
+    if saved_to:
+        # Nama barang yang sudah disimpan dianggap terkonfirmasi → masuk katalog
+        if use_catalog:
+            try:
+                get_item_catalog().add_many(
+                    save_df[['nama_barang', 'kategori_transaksi']].itertuples(index=False, name=None)
+                )
+            except Exception as e:
+                st.warning(f"⚠️ Gagal memperbarui katalog barang: {e}")
+
+        st.balloons()
+        st.session_state.saved_result_version = st.session_state.get('result_version', 0)
+
+@st.fragment
+def render_save_controls(selected_sinks, use_catalog):
+    """Kontrol simpan ke semua sink yang dipilih; klik Simpan hanya menjalankan ulang fragment ini"""
+    st.markdown("---")
+    col_save1, col_save2 = st.columns([3, 1])
+
+    with col_save1:
+        st.write("**Simpan data**")
+        if selected_sinks:
+            sink_names = ", ".join(result_store.SINK_LABELS[name] for name in selected_sinks)
+            st.caption(f"Data akan ditambahkan sebagai baris baru (append mode) ke: {sink_names}")
+        else:
+            st.caption("Pilih minimal satu tujuan penyimpanan di sidebar")
+
+    with col_save2:
+        save_button = st.button(
+            "💾 Simpan Data",
+            type="primary",
+            use_container_width=True,
+            disabled=not selected_sinks
+        )
+
+    if save_button:
+        save_scan_result(selected_sinks, use_catalog)
+
+    # Reset ditawarkan selama hasil yang sudah tersimpan belum diubah. Statusnya di session_state:
+    # klik berikutnya menjalankan ulang fragment ini dengan save_button False
+    saved_version = st.session_state.get('saved_result_version')
+    if saved_version is not None and saved_version == st.session_state.get('result_version', 0):
+        if st.button("🧹 Reset data (sudah tersimpan)", use_container_width=True):
+            st.session_state.ocr_result_df = None
+            st.session_state.scan_timestamp = None
+            st.session_state.pop('batch_files', None)
+            st.session_state.pop('saved_result_version', None)
+            st.rerun(scope="app")  # Seluruh halaman, bukan hanya fragment
+
 # ==========================================
 # 3. USER INTERFACE (STREAMLIT)
 # ==========================================
@@ -923,6 +1273,7 @@ st.markdown("""
 st.markdown("<h1>📄 Nota Scanner</h1>", unsafe_allow_html=True)
 st.markdown("<p class='subtitle'>Konversi nota menjadi data digital secara otomatis</p>", unsafe_allow_html=True)
 st.markdown("<hr>", unsafe_allow_html=True)
+startup_profile.PROFILE.mark("page_setup")
 
 # --- SIDEBAR: UPLOAD & INFO ---
 with st.sidebar:
@@ -952,6 +1303,35 @@ with st.sidebar:
         st.caption("� Biaya: ~$0.001-0.002 per nota")
         selected_model = "gpt-4o-mini"
     
+    use_catalog = st.checkbox(
+        "📚 Normalisasi dari katalog barang",
+        value=ITEM_CATALOG_ENABLED,
+        help="Nama barang dicocokkan ke katalog nama yang sudah pernah dikonfirmasi, kategori Bama/Non Bama diambil dari katalog"
+    )
+    
+    prefetch_ocr = st.checkbox(
+        "⚡ Scan di latar belakang saat upload",
+        value=PREFETCH_OCR,
+        help="OCR dimulai begitu file di-upload, sehingga hasil langsung tersedia saat tombol scan ditekan. "
+             "Biaya API tetap terpakai walau file tidak jadi di-scan."
+    )
+    prefetch_status = sync_prefetch(uploaded_files, selected_model, prefetch_ocr)
+    if prefetch_status and prefetch_status['running']:
+        st.caption(f"⚡ Scan latar belakang: {prefetch_status['done']}/{len(uploaded_files)} selesai")
+    elif prefetch_status:
+        st.caption(f"⚡ Scan latar belakang selesai ({prefetch_status['done']}/{len(uploaded_files)} file)")
+    
+    st.markdown("---")
+    st.markdown("### 💾 Penyimpanan")
+    
+    selected_sinks = st.multiselect(
+        "Simpan hasil ke",
+        options=list(result_store.SINK_LABELS.keys()),
+        default=RESULT_SINKS,
+        format_func=lambda name: result_store.SINK_LABELS[name],
+        help="Google Sheets bersifat opsional. SQLite/Parquet menyimpan data secara lokal untuk rekap cepat."
+    )
+    
     # Status
     st.markdown("---")
     st.markdown("### 🔌 Status")
@@ -961,10 +1341,146 @@ with st.sidebar:
     else:
         st.error("✗ API Belum Diset")
     
+    # Kesehatan per endpoint OCR (latency rata-rata, error rate, status circuit breaker)
+    try:
+        for health in get_ocr_endpoints().health():
+            if health['state'] == endpoint_pool.OPEN and health['retry_in'] > 0:
+                icon, status = "🔴", f"gangguan, dicoba lagi {health['retry_in']:.0f} dtk"
+            elif health['state'] == endpoint_pool.OPEN:
+                icon, status = "🟡", "menunggu request probe"
+            elif health['state'] == endpoint_pool.HALF_OPEN:
+                icon, status = "🟡", "memeriksa pemulihan"
+            else:
+                icon, status = "🟢", "sehat"
+            latency = f"{health['latency']:.1f} dtk" if health['latency'] is not None else "-"
+            st.caption(
+                f"{icon} {health['name']} · {status} · {latency} · error {health['error_rate']:.0%} · "
+                f"{health['requests']:,} req",
+                help=health['last_error']
+            )
+    except Exception as e:
+        st.warning(f"! Endpoint OCR tidak tersedia: {e}")
+    
     if os.path.exists(GOOGLE_CREDENTIALS_FILE):
         st.success("✓ Google Sheet Ready")
     else:
         st.warning("! Credentials Belum Ada")
+    
+    if use_catalog:
+        st.caption(f"📚 Katalog barang: {len(get_item_catalog()):,} item")
+    
+    try:
+        ocr_cache_store = get_ocr_cache()
+        if ocr_cache_store is not None:
+            cache_stats = ocr_cache_store.stats()
+            st.caption(
+                f"⚡ Cache OCR ({ocr_cache_store.name}): {cache_stats['entries']:,} entri, "
+                f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB"
+            )
+    except Exception as e:
+        st.warning(f"! Cache OCR tidak tersedia: {e}")
+    
+    ocr_flights = get_ocr_flights()
+    if ocr_flights.coalesced:
+        st.caption(f"🔗 Request OCR digabung: {ocr_flights.coalesced:,} (dari {ocr_flights.calls:,} panggilan API)")
+    
+    # Antrean scheduler OCR: tampil selama ada pekerjaan berjalan / menunggu
+    queue_stats = get_ocr_scheduler().stats()
+    if any(entry['in_flight'] or entry['waiting'] for entry in queue_stats.values()):
+        st.caption(
+            "🚦 Antrean OCR: " + " · ".join(
+                f"{name} {entry['in_flight']}/{entry['limit']}" + (f" (+{entry['waiting']} antre)" if entry['waiting'] else "")
+                for name, entry in queue_stats.items()
+            ),
+            help=" · ".join(f"{name}: rata-rata tunggu {entry['mean_wait']:.1f} dtk" for name, entry in queue_stats.items())
+        )
+    
+    pool_stats = get_cpu_pool().stats()
+    if pool_stats['submitted']:
+        st.caption(
+            f"🧮 Process pool: {pool_stats['workers']} worker, {pool_stats['submitted']:,} tugas"
+            + (f", {pool_stats['waiting']} menunggu" if pool_stats['waiting'] else ""),
+            help=f"Diproses langsung (gambar kecil): {pool_stats['inline']:,} · "
+                 f"worker dibuat ulang: {pool_stats['restarts']} · gagal karena worker mati: {pool_stats['crashed']}"
+        )
+    
+    cassette = get_ocr_cassette()
+    if cassette is not None:
+        cassette_stats = cassette.stats()
+        if cassette.replaying:
+            st.caption(
+                f"📼 Replay OCR: {cassette_stats['replayed']:,} diputar ulang, "
+                f"{cassette_stats['misses']:,} tanpa rekaman",
+                help=f"{cassette_stats['path']} · timing ×{cassette.timing:g}"
+            )
+        else:
+            st.caption(f"📼 Merekam OCR: {cassette_stats['recorded']:,} request", help=cassette_stats['path'])
+    
+    # Durasi rata-rata per tahap pipeline di proses ini (metrik lengkap: METRICS_FILE / METRICS_PORT)
+    stage_timings = pipeline_metrics.METRICS.snapshot()
+    if stage_timings:
+        st.caption(
+            f"📊 Timing pipeline: {len(stage_timings)} tahap terukur (rata-rata di tooltip)",
+            help=" · ".join(
+                f"{stage} {entry['mean'] * 1000:,.0f} ms ×{entry['count']}"
+                for stage, entry in sorted(stage_timings.items(), key=lambda entry: -entry[1]['mean'])
+            )
+        )
+    
+    # Cold start proses ini (tersedia mulai run kedua, profil run pertama ditutup di akhir script)
+    startup = startup_profile.PROFILE.result
+    if startup:
+        stages = " · ".join(f"{name} {ms:,.0f} ms" for name, ms in startup['stages_ms'].items())
+        warm = startup.get('warm_ms')
+        st.caption(
+            f"⏱️ Cold start: render pertama {startup['first_run_ms']:,.0f} ms",
+            help=stages + (f" · warm-up {sum(warm.values()):,.0f} ms" if warm else "")
+        )
+    
+    # Job bulk offline (Batch API)
+    try:
+        bulk_jobs = get_bulk_store().jobs(limit=5)
+    except Exception as e:
+        bulk_jobs = []
+        st.warning(f"! Job bulk tidak bisa dibaca: {e}")
+    
+    if bulk_jobs:
+        st.markdown("---")
+        st.markdown("### 🐢 Job Bulk Offline")
+        
+        if any(job['counts'][bulk_batch.SUBMITTED] for job in bulk_jobs):
+            st.button("🔄 Cek status batch", use_container_width=True, on_click=on_bulk_refresh, args=(bulk_jobs,))
+        
+        bulk_notice = st.session_state.pop('bulk_notice', None)
+        if bulk_notice:
+            level, message = bulk_notice
+            getattr(st, level)(message)
+        
+        for job in bulk_jobs:
+            counts = job['counts']
+            with st.expander(f"{job['job_id']} · {counts[bulk_batch.DONE]}/{job['total']} selesai"):
+                st.caption(
+                    f"Model {job['model']} · {job['note'] or ''} · menunggu {counts[bulk_batch.PENDING]} · "
+                    f"diproses {counts[bulk_batch.SUBMITTED]} · gagal {counts[bulk_batch.FAILED]}"
+                )
+                if counts[bulk_batch.FAILED]:
+                    for item in get_bulk_store().items(job['job_id'], bulk_batch.FAILED)[:5]:
+                        page = f" hal. {item['halaman']}" if item['halaman'] else ""
+                        st.caption(f"❗ {item['source_file']}{page}: {item['error']}")
+                
+                if counts[bulk_batch.PENDING] and not counts[bulk_batch.SUBMITTED]:
+                    st.button("📤 Kirim batch", key=f"bulk_submit_{job['job_id']}", use_container_width=True,
+                              on_click=on_bulk_submit, args=(job['job_id'],))
+                if counts[bulk_batch.FAILED]:
+                    st.button("🔁 Ulangi yang gagal", key=f"bulk_retry_{job['job_id']}", use_container_width=True,
+                              on_click=on_bulk_retry, args=(job['job_id'],))
+                if counts[bulk_batch.DONE]:
+                    st.button("📥 Muat hasil ke editor", key=f"bulk_load_{job['job_id']}", use_container_width=True,
+                              on_click=on_bulk_load, args=(job['job_id'], use_catalog))
+                st.button("🗑️ Hapus job", key=f"bulk_delete_{job['job_id']}", use_container_width=True,
+                          on_click=on_bulk_delete, args=(job['job_id'],))
+
+startup_profile.PROFILE.mark("sidebar")
 
 # --- MAIN AREA ---
 
@@ -975,13 +1491,23 @@ if 'scan_timestamp' not in st.session_state:
     st.session_state.scan_timestamp = None
 if 'all_results' not in st.session_state:
     st.session_state.all_results = []
+if 'result_totals' not in st.session_state:
+    st.session_state.result_totals = {'items': 0, 'qty': 0, 'grand_total': 0}
+if 'result_warnings' not in st.session_state:
+    st.session_state.result_warnings = {}
+# Batch yang terputus di tengah jalan: hasil sementaranya tetap dimuat ke editor
+load_pending_batch()
 
-if uploaded_files:
+if uploaded_files or st.session_state.ocr_result_df is not None:
     # Info jumlah file
-    st.info(f"📁 {len(uploaded_files)} file ter-upload. Klik 'Scan Semua' untuk memproses.")
+    if uploaded_files:
+        st.info(f"📁 {len(uploaded_files)} file ter-upload. Klik 'Scan Semua' untuk memproses.")
     
     # Tab untuk setiap file
-    if len(uploaded_files) == 1:
+    if not uploaded_files:
+        # Hasil dimuat dari job bulk offline: langsung ke editor & simpan
+        pass
+    elif len(uploaded_files) == 1:
         # Single file mode (tampilan seperti sebelumnya)
         uploaded_file = uploaded_files[0]
         
@@ -999,7 +1525,11 @@ if uploaded_files:
                 pdf_bytes = uploaded_file.getvalue()
                 image_bytes, mime_type = convert_pdf_to_image(pdf_bytes)
                 if image_bytes:
-                    st.image(image_bytes, caption="Halaman 1 dari PDF", use_container_width=True)
+                    try:
+                        page_caption = f"Halaman 1 dari {count_pdf_pages(pdf_bytes)} halaman PDF"
+                    except Exception:
+                        page_caption = "Halaman 1 dari PDF"
+                    st.image(image_bytes, caption=page_caption, use_container_width=True)
                 else:
                     st.error("Gagal mengkonversi PDF ke gambar")
             else:
@@ -1023,20 +1553,32 @@ if uploaded_files:
                 use_container_width=True,
                 disabled=(image_bytes is None)
             )
+            estimate_text = format_cost_estimate([get_cost_estimate(uploaded_file, selected_model)])
+            if estimate_text:
+                st.caption(estimate_text)
             
             if scan_button and image_bytes:
                 with st.spinner("🔄 Sedang menganalisa nota dengan AI... Mohon tunggu..."):
-                    json_data = process_image_with_gpt4o(image_bytes, mime_type, selected_model)
+                    page_status = st.empty()
+                    # Scan satu file: kelas interaktif, didahulukan dari batch yang sedang berjalan
+                    with scheduler.use(scheduler_ticket(scheduler.INTERACTIVE)):
+                        json_data = extract_nota_prefetched(
+                            uploaded_file,
+                            selected_model,
+                            on_page_done=lambda done, total: page_status.caption(f"📄 Halaman {done}/{total} selesai")
+                        )
+                    page_status.empty()
+                    
+                    preprocess_text = format_preprocess_stats([(json_data or {}).get('preprocess')])
+                    if preprocess_text:
+                        st.caption(preprocess_text)
                     
                     if json_data and 'items' in json_data:
-                        items = json_data['items']
-                        metadata = json_data.get('metadata', {})
-                        
-                        if len(items) == 0:
+                        if len(json_data['items']) == 0:
                             st.warning("⚠️ Tidak ada item yang berhasil diekstrak. Coba foto/PDF yang lebih jelas.")
                         else:
-                            # Validasi dan koreksi otomatis
-                            corrected_items, correction_logs = validate_and_correct_items(items)
+                            # Validasi & koreksi otomatis, lalu normalisasi nama & kategori dari katalog lokal
+                            metadata, corrected_items, correction_logs = correct_result(json_data, use_catalog)
                             
                             # Convert ke Pandas DataFrame dengan confidence indicator dan metadata
                             df = prepare_dataframe_with_confidence(corrected_items, metadata)
@@ -1044,8 +1586,8 @@ if uploaded_files:
                             # Validasi
                             is_valid, msg = validate_dataframe(df)
                             if is_valid:
-                                st.session_state.ocr_result_df = df
-                                st.session_state.scan_timestamp = datetime.now()
+                                set_scan_result(df)
+                                st.session_state.pop('batch_files', None)
                                 st.success(f"✅ Berhasil! Ditemukan {len(df)} item.")
                                 
                                 # Tampilkan info metadata
@@ -1130,6 +1672,40 @@ if uploaded_files:
         with col_batch1:
             st.write("**Scan semua nota sekaligus dengan AI**")
             st.caption(f"Total: {len(uploaded_files)} file akan diproses")
+            
+            # Estimasi token & waktu sebelum batch dikirim
+            file_estimates = [get_cost_estimate(file, selected_model) for file in uploaded_files]
+            estimate_text = format_cost_estimate(file_estimates)
+            if estimate_text:
+                st.caption(estimate_text)
+                with st.expander("🧮 Detail estimasi per file", expanded=False):
+                    st.dataframe(
+                        pd.DataFrame([
+                            {
+                                'File': file.name,
+                                'Request': estimate['requests'] if estimate else None,
+                                'Detail': ('low' if estimate['low'] else 'high') if estimate else '-',
+                                'Token input': estimate['tokens_in'] if estimate else None,
+                                'Token output': estimate['tokens_out'] if estimate else None,
+                                'Detik': round(estimate['latency'], 1) if estimate else None,
+                                'Alasan': estimate['reason'] if estimate else 'tidak bisa dianalisis',
+                            }
+                            for file, estimate in zip(uploaded_files, file_estimates)
+                        ]),
+                        hide_index=True,
+                        use_container_width=True,
+                    )
+            streaming_mode = st.checkbox(
+                "💾 Mode hemat memori (spill ke disk)",
+                value=len(uploaded_files) >= STREAMING_BATCH_MIN_FILES,
+                help=f"File diproses per {BATCH_WINDOW_SIZE} file, bytes & hasil sementara disimpan di disk. Disarankan untuk upload besar."
+            )
+            bulk_mode = st.checkbox(
+                "🐢 Mode bulk offline (Batch API)",
+                value=False,
+                help="Semua request dikirim sebagai satu job Batch API: lebih murah & tidak terkena rate limit, "
+                     "tetapi hasil baru tersedia setelah batch selesai (bisa sampai 24 jam). Cocok untuk backlog nota lama."
+            )
         
         with col_batch2:
             batch_scan_button = st.button(
@@ -1138,81 +1714,145 @@ if uploaded_files:
                 use_container_width=True
             )
         
-        if batch_scan_button:
-            all_items = []
+        if batch_scan_button and bulk_mode:
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def on_bulk_file_done(done, total, file_name):
+                status_text.text(f"⏳ Menyiapkan {done}/{total}: {file_name}")
+                progress_bar.progress(done / total)
+            
+            try:
+                # Render & crop untuk job bulk tidak mendesak: kelas backfill di process pool
+                with scheduler.use(scheduler_ticket(scheduler.BACKFILL)):
+                    job_id = prepare_bulk_job(uploaded_files, selected_model, on_file_done=on_bulk_file_done)
+                status_text.text("⏳ Mengirim batch...")
+                submitted = submit_bulk_job(job_id)
+                # Rerun supaya job baru langsung tampil di sidebar (🐢 Job Bulk Offline)
+                st.session_state.bulk_notice = (
+                    'success', f"✅ Job bulk {job_id} dibuat: {submitted} request dikirim ke Batch API"
+                )
+                st.rerun()
+            except Exception as e:
+                status_text.empty()
+                progress_bar.empty()
+                st.error(f"❌ Gagal membuat job bulk: {e}")
+        
+        elif batch_scan_button and streaming_mode:
+            # Status per file dicatat seperti batch biasa: file yang gagal bisa di-scan ulang satu per satu
+            st.session_state.batch_files = new_batch_status(uploaded_files)
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            
+            def on_file_done(done, total, file, error, item_count, file_low_conf):
+                update_batch_status(file.file_id, item_count, file_low_conf, error)
+                status_text.text(f"⏳ Selesai {done}/{total}: {file.name}")
+                progress_bar.progress(done / total)
+            
+            with spill_store.SpillStore(SPILL_DIR) as store, scheduler.use(scheduler_ticket(scheduler.BATCH)):
+                low_conf_count = process_streaming_batch(
+                    uploaded_files, selected_model, store,
+                    use_catalog=use_catalog,
+                    window_size=BATCH_WINDOW_SIZE,
+                    on_file_done=on_file_done
+                )
+                # DataFrame akhir dibangun dari disk
+                df_combined = store.to_dataframe()
+                total_logs = store.log_count
+                correction_logs_preview = store.read_logs(limit=200)
+            
+            status_text.empty()
+            progress_bar.empty()
+            
+            if not df_combined.empty:
+                set_scan_result(df_combined)
+                st.success(f"✅ Berhasil! Total {len(df_combined)} item dari {len(uploaded_files)} file.")
+                
+                if low_conf_count > 0:
+                    st.warning(f"⚠️ {low_conf_count} field memiliki confidence rendah. Ditandai dengan ⚠️ atau ❗. Silakan review!")
+                
+                if total_logs:
+                    with st.expander(f"🔧 Koreksi Otomatis ({total_logs} perubahan)", expanded=False):
+                        for log in correction_logs_preview:
+                            st.write(log)
+                        if total_logs > len(correction_logs_preview):
+                            st.caption(f"... dan {total_logs - len(correction_logs_preview)} koreksi lainnya")
+                
+                st.balloons()
+            else:
+                st.error("❌ Tidak ada item yang berhasil diekstrak dari semua file.")
+        
+        elif batch_scan_button:
             all_correction_logs = []
-            all_metadata_list = []  # Simpan metadata per file
+            all_preprocess = []
+            frames = []
+            low_conf_count = 0
             progress_bar = st.progress(0)
             status_text = st.empty()
+            # Status per file, hasil & ringkasan diperbarui setiap kali satu file selesai
+            status_table = st.empty()
+            live_summary = st.empty()
+            # Tabel sementara: setiap file hanya menambahkan barisnya sendiri, tidak menggambar ulang semua
+            live_slot = st.empty()
+            live_results = live_slot.container()
+            st.session_state.batch_files = new_batch_status(uploaded_files)
+            # Hasil sementara disimpan di session (totals & warnings dijumlah per file), dimuat ke editor
+            # sekali di akhir, atau di rerun berikutnya jika batch terputus di tengah jalan
+            pending = st.session_state.pending_batch = {
+                'frames': frames,
+                'totals': {'items': 0, 'qty': 0, 'grand_total': 0},
+                'warnings': {},
+            }
             
+            batch_ticket = scheduler_ticket(scheduler.BATCH)
             for idx, file in enumerate(uploaded_files):
                 status_text.text(f"⏳ Memproses {idx + 1}/{len(uploaded_files)}: {file.name}")
+                st.session_state.batch_files[file.file_id]['status'] = 'running'
+                status_table.dataframe(batch_status_frame(st.session_state.batch_files), hide_index=True, use_container_width=True)
                 
-                # Get image bytes
                 try:
-                    if file.type == "application/pdf":
-                        pdf_bytes = file.getvalue()
-                        img_bytes, img_mime = convert_pdf_to_image(pdf_bytes)
-                    else:
-                        img_bytes = file.getvalue()
-                        img_mime = file.type
-                    
-                    if img_bytes:
-                        # Process with AI
-                        json_data = process_image_with_gpt4o(img_bytes, img_mime, selected_model)
-                        
-                        if json_data and 'items' in json_data:
-                            items = json_data['items']
-                            metadata = json_data.get('metadata', {})
-                            
-                            # Validasi dan koreksi otomatis
-                            corrected_items, correction_logs = validate_and_correct_items(items)
-                            
-                            # Tambahkan metadata dan source file ke setiap item
-                            for item in corrected_items:
-                                item['source_file'] = file.name
-                                # Simpan metadata dalam item untuk batch mode
-                                item['_metadata'] = metadata
-                            
-                            all_items.extend(corrected_items)
-                            
-                            # Simpan log koreksi dengan info file
-                            for log in correction_logs:
-                                all_correction_logs.append(f"[{file.name}] {log}")
-                    
+                    # Process with AI (PDF: semua halaman diproses paralel)
+                    with scheduler.use(batch_ticket):
+                        df_file, file_logs, file_low_conf, preprocess = scan_batch_file(file, selected_model, use_catalog)
                 except Exception as e:
-                    st.warning(f"⚠️ Error pada {file.name}: {e}")
+                    update_batch_status(file.file_id, error=e)
+                else:
+                    update_batch_status(file.file_id, len(df_file), file_low_conf)
+                    all_preprocess.append(preprocess)
+                    all_correction_logs.extend(file_logs)
+                    low_conf_count += file_low_conf
+                    if not df_file.empty:
+                        # Row key lanjut dari file sebelumnya, jadi warnings per file tetap valid setelah concat
+                        totals = pending['totals']
+                        df_file.index = pd.RangeIndex(totals['items'], totals['items'] + len(df_file))
+                        result_editor.recalculate_totals(df_file)
+                        for key, value in result_editor.compute_totals(df_file).items():
+                            totals[key] += value
+                        pending['warnings'].update(result_editor.compute_warnings(df_file))
+                        frames.append(df_file)
+                        with live_summary.container():
+                            col_live1, col_live2, col_live3 = st.columns(3)
+                            col_live1.metric("Total Items", totals['items'])
+                            col_live2.metric("Total Quantity", int(totals['qty']))
+                            col_live3.metric("Grand Total", f"Rp {totals['grand_total']:,.0f}")
+                        live_results.dataframe(df_file[result_editor.visible_columns(df_file)], use_container_width=True)
                 
+                status_table.dataframe(batch_status_frame(st.session_state.batch_files), hide_index=True, use_container_width=True)
                 progress_bar.progress((idx + 1) / len(uploaded_files))
             
-            # Combine results
-            if all_items:
-                # Untuk batch mode, kita perlu handle metadata per-item
-                # Karena setiap file bisa punya metadata berbeda
-                df_rows = []
-                for item in all_items:
-                    item_metadata = item.pop('_metadata', {})
-                    # Prepare single item dengan metadata-nya
-                    df_single = prepare_dataframe_with_confidence([item], item_metadata)
-                    df_rows.append(df_single)
-                
-                # Gabungkan semua dataframe
-                df_combined = pd.concat(df_rows, ignore_index=True)
-                
-                st.session_state.ocr_result_df = df_combined
-                st.session_state.scan_timestamp = datetime.now()
-                
-                status_text.empty()
-                progress_bar.empty()
-                st.success(f"✅ Berhasil! Total {len(df_combined)} item dari {len(uploaded_files)} file.")
-                
-                # Hitung berapa field yang perlu review (confidence < 80)
-                low_conf_count = 0
-                for item in all_items:
-                    conf = item.get('confidence', {})
-                    for field, score in conf.items():
-                        if score < 80:
-                            low_conf_count += 1
+            # Tabel sementara diganti editor & panel status di bawah
+            status_text.empty()
+            progress_bar.empty()
+            status_table.empty()
+            live_summary.empty()
+            live_slot.empty()
+            load_pending_batch()
+            
+            if frames:
+                st.success(f"✅ Berhasil! Total {len(st.session_state.ocr_result_df)} item dari {len(frames)}/{len(uploaded_files)} file.")
+                preprocess_text = format_preprocess_stats(all_preprocess)
+                if preprocess_text:
+                    st.caption(preprocess_text)
                 
                 if low_conf_count > 0:
                     st.warning(f"⚠️ {low_conf_count} field memiliki confidence rendah. Ditandai dengan ⚠️ atau ❗. Silakan review!")
@@ -1225,9 +1865,36 @@ if uploaded_files:
                 
                 st.balloons()
             else:
-                status_text.empty()
-                progress_bar.empty()
                 st.error("❌ Tidak ada item yang berhasil diekstrak dari semua file.")
+        
+        # Status per file dari scan batch terakhir; file yang gagal bisa di-scan ulang satu per satu
+        batch_files = st.session_state.get('batch_files')
+        if batch_files:
+            files_by_id = {file.file_id: file for file in uploaded_files}
+            retryable = [
+                files_by_id[file_id] for file_id, entry in batch_files.items()
+                if entry['status'] == 'failed' and file_id in files_by_id
+            ]
+            done_count = sum(1 for entry in batch_files.values() if entry['status'] != 'failed')
+            with st.expander(
+                f"📋 Status Scan Batch ({done_count}/{len(batch_files)} berhasil)",
+                expanded=bool(retryable)
+            ):
+                batch_notice = st.session_state.pop('batch_notice', None)
+                if batch_notice:
+                    level, message = batch_notice
+                    getattr(st, level)(message)
+                st.dataframe(batch_status_frame(batch_files), hide_index=True, use_container_width=True)
+                for file in retryable:
+                    col_retry1, col_retry2 = st.columns([3, 1])
+                    with col_retry1:
+                        st.caption(f"❌ {file.name}: {batch_files[file.file_id]['error']}")
+                    with col_retry2:
+                        st.button("🔁 Scan ulang", key=f"batch_retry_{file.file_id}", use_container_width=True,
+                                  on_click=on_batch_retry, args=([file], selected_model, use_catalog))
+                if len(retryable) > 1:
+                    st.button(f"🔁 Scan ulang semua yang gagal ({len(retryable)})", use_container_width=True,
+                              on_click=on_batch_retry, args=(retryable, selected_model, use_catalog))
 
 
 
@@ -1247,111 +1914,10 @@ if uploaded_files:
             ⚠️ = Cek Ulang
             """)
         
-        # Prepare dataframe untuk display (tanpa kolom internal)
-        display_df = st.session_state.ocr_result_df.copy()
-        
-        # Hapus kolom internal yang dimulai dengan underscore
-        cols_to_hide = [col for col in display_df.columns if col.startswith('_')]
-        display_df = display_df.drop(columns=cols_to_hide, errors='ignore')
-        
-        # Widget Data Editor - Urutan kolom sesuai kebutuhan
-        column_config = {
-            "tanggal": st.column_config.TextColumn("Tanggal", width="medium", help="Format: YYYY-MM-DD atau DD/MM/YYYY"),
-            "nama_toko": st.column_config.TextColumn("Nama Toko", width="medium", required=True),
-            "nomor_rekening": st.column_config.TextColumn("Nomor Rekening", width="medium"),
-            "nama_bank": st.column_config.TextColumn("Nama Bank", width="small"),
-            "pemilik_rekening": st.column_config.TextColumn("Pemilik Rekening", width="medium"),
-            "jenis_pembayaran": st.column_config.SelectboxColumn(
-                "Jenis Pembayaran", 
-                width="small",
-                options=["Cash", "Transfer"],
-                required=True
-            ),
-            "kategori_transaksi": st.column_config.SelectboxColumn(
-                "Kategori", 
-                width="small",
-                options=["Bama", "Non Bama"],
-                required=True
-            ),
-            "qty": st.column_config.NumberColumn("Qty", width="small", min_value=0.01, required=True),
-            "unit": st.column_config.TextColumn("Unit", width="small", required=True),
-            "nama_barang": st.column_config.TextColumn("Nama Barang", width="large", required=True),
-            "harga_satuan": st.column_config.NumberColumn("Harga Satuan (Rp)", width="medium", format="%d", required=True),
-            "total_harga": st.column_config.NumberColumn("Total Harga (Rp)", width="medium", format="%d", required=True),
-        }
-        
-        # Tambahkan kolom source_file jika ada (untuk batch mode)
-        if 'source_file' in display_df.columns:
-            column_config["source_file"] = st.column_config.TextColumn("File Asal", width="medium")
-        
-        edited_df = st.data_editor(
-            display_df,
-            num_rows="dynamic",  # User bisa tambah/hapus baris
-            use_container_width=True,
-            column_config=column_config,
-            hide_index=False,
-        )
-        
-        # Auto-recalculate total_harga berdasarkan qty × harga_satuan
-        if 'qty' in edited_df.columns and 'harga_satuan' in edited_df.columns and 'total_harga' in edited_df.columns:
-            # Recalculate total_harga
-            edited_df['total_harga'] = (edited_df['qty'] * edited_df['harga_satuan']).astype(int)
-            st.info("💡 Total harga otomatis dihitung ulang: Qty × Harga Satuan")
-        
-        # Summary
-        col_sum1, col_sum2, col_sum3 = st.columns(3)
-        with col_sum1:
-            st.metric("Total Items", len(edited_df))
-        with col_sum2:
-            total_qty = edited_df['qty'].sum() if 'qty' in edited_df.columns else 0
-            st.metric("Total Quantity", int(total_qty))
-        with col_sum3:
-            grand_total = edited_df['total_harga'].sum() if 'total_harga' in edited_df.columns else 0
-            st.metric("Grand Total", f"Rp {grand_total:,.0f}")
-
-        # 4. Save to Google Sheet
-        st.markdown("---")
-        col_save1, col_save2 = st.columns([3, 1])
-        
-        with col_save1:
-            st.write("**Simpan data ke Google Sheets**")
-            st.caption("Data akan ditambahkan ke sheet sebagai baris baru (append mode)")
-        
-        with col_save2:
-            save_button = st.button("💾 Simpan ke Google Sheet", type="primary", use_container_width=True)
-        
-        if save_button:
-            if edited_df.empty:
-                st.error("❌ Tidak ada data untuk disimpan")
-            else:
-                sheet = connect_to_gsheet()
-                if sheet:
-                    try:
-                        # Bersihkan emoji indicator dari field yang mungkin punya emoji
-                        save_df = edited_df.copy()
-                        
-                        # Hapus emoji ⚠️ dan ❗ dari semua field text
-                        text_columns = ['nama_barang', 'unit', 'kategori_transaksi']
-                        for col in text_columns:
-                            if col in save_df.columns:
-                                save_df[col] = save_df[col].astype(str).str.replace('⚠️ ', '', regex=False)
-                                save_df[col] = save_df[col].astype(str).str.replace('❗ ', '', regex=False)
-                        
-                        # Append ke sheet (tanpa timestamp karena sudah ada kolom tanggal)
-                        rows_to_append = save_df.values.tolist()
-                        sheet.append_rows(rows_to_append)
-                        
-                        st.balloons()
-                        st.success(f"✅ Berhasil menyimpan {len(edited_df)} item ke Google Sheet: **{SHEET_NAME}**")
-                        
-                        # Opsional: Reset setelah save
-                        if st.checkbox("Reset data setelah save?"):
-                            st.session_state.ocr_result_df = None
-                            st.session_state.scan_timestamp = None
-                            st.rerun()
-                            
-                    except Exception as e:
-                        st.error(f"❌ Gagal menyimpan data: {e}")
+        # Fragment: edit cell / ganti halaman hanya menjalankan ulang editor & ringkasan,
+        # klik Simpan hanya kontrol simpan (CSS, sidebar, preview & legend tidak dirender ulang)
+        render_result_editor()
+        render_save_controls(selected_sinks, use_catalog)
 
 else:
     # Welcome screen
@@ -1427,6 +1993,36 @@ else:
         - Tanda tangan
         """)
 
+# Rekap bulanan dari penyimpanan lokal (tanpa membaca Google Sheet)
+local_sinks = [
+    sink for sink in result_store.build_sinks(selected_sinks, connect_to_gsheet, LOCAL_DB_PATH, PARQUET_DIR)
+    if hasattr(sink, 'monthly_summary')
+]
+if local_sinks:
+    with st.expander("📈 Rekap Bulanan (Data Lokal)", expanded=False):
+        col_rekap1, col_rekap2 = st.columns([1, 1])
+        with col_rekap1:
+            rekap_bulan = st.text_input("Bulan (YYYY-MM)", value=datetime.now().strftime('%Y-%m'))
+        with col_rekap2:
+            rekap_sink = st.selectbox(
+                "Sumber data",
+                options=local_sinks,
+                format_func=lambda sink: sink.label
+            )
+        
+        if st.button("📊 Tampilkan Rekap"):
+            try:
+                started = time.perf_counter()
+                summary_df = rekap_sink.monthly_summary(rekap_bulan.strip())
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if summary_df.empty:
+                    st.info(f"Belum ada data tersimpan untuk bulan {rekap_bulan}")
+                else:
+                    st.dataframe(summary_df, use_container_width=True, hide_index=True)
+                    st.caption(f"⚡ Query selesai dalam {elapsed_ms:.1f} ms")
+            except Exception as e:
+                st.error(f"❌ Gagal membaca rekap: {e}")
+
 # Footer
 st.markdown("<br>", unsafe_allow_html=True)
 st.markdown("---")
@@ -1434,4 +2030,7 @@ st.markdown("""
     <div style='text-align: center; padding: 1rem; color: #94a3b8;'>
         <p style='margin: 0; font-size: 0.85rem;'>Dibuat dengan ❤️ oleh Tim IT Ozza </p>
     </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+startup_profile.PROFILE.mark("main")
+startup_profile.PROFILE.finish(STARTUP_PROFILE_LOG, WARM_UP_MODULES)
@@ -0,0 +1,325 @@
+"""
+Mode bulk offline: OCR ribuan nota lama lewat Batch API (asinkron).
+
+Untuk digitalisasi backlog, latency tidak penting tetapi biaya & throughput
+penting, dan ribuan request ke endpoint sinkron cepat terkena rate limit.
+Mode bulk menyiapkan semua request sebagai file JSONL, mengirimnya lewat
+Batch API (`/v1/files` + `/v1/batches`), lalu memeriksa statusnya secara
+berkala sampai selesai (biasanya < 24 jam, dengan diskon biaya).
+
+Status job & setiap item disimpan di SQLite (`bulk_jobs` / `bulk_items`)
+dan bytes gambar di disk, jadi job tetap bisa dicek & dimuat setelah
+aplikasi di-restart. Status item:
+
+- pending   : siap dikirim di batch berikutnya
+- submitted : sedang diproses di batch `batch_id`
+- done      : hasil OCR tersimpan (sudah dalam format standar)
+- failed    : gagal (pesan di kolom `error`), bisa diulang
+
+Endpoint batch bisa diarahkan ke server lain lewat base URL client yang
+dipakai `OpenAIBatchBackend`, mis. stand-in lokal `load_test.FakeBatchServer`
+untuk pengujian (`python load_test.py --bulk N`).
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+MAX_BATCH_REQUESTS = 50000
+DEFAULT_MAX_BATCH_MB = 150  # batas file input Batch API 200 MB, sisakan ruang
+
+PENDING = 'pending'
+SUBMITTED = 'submitted'
+DONE = 'done'
+FAILED = 'failed'
+STATUSES = (PENDING, SUBMITTED, DONE, FAILED)
+
+# Status batch dari API
+BATCH_FINISHED = ('completed',)
+BATCH_RETRYABLE = ('expired', 'cancelled')  # item yang belum selesai dikirim ulang
+BATCH_FAILED = ('failed',)
+
+
+class OpenAIBatchBackend:
+    """Batch API kompatibel OpenAI: upload JSONL, buat batch, cek status, unduh hasil"""
+
+    def __init__(self, client, endpoint=BATCH_ENDPOINT, completion_window=COMPLETION_WINDOW):
+        self.client = client
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+
+    def submit(self, jsonl_path, metadata=None):
+        with open(jsonl_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window,
+            metadata=metadata,
+        )
+        return batch.id
+
+    def retrieve(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            'status': batch.status,
+            'output_file_id': batch.output_file_id,
+            'error_file_id': batch.error_file_id,
+            'errors': [error.message for error in ((batch.errors.data or []) if batch.errors else [])],
+        }
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).text
+
+    def cancel(self, batch_id):
+        self.client.batches.cancel(batch_id)
+
+
+def request_line(custom_id, body, endpoint=BATCH_ENDPOINT):
+    """Satu baris JSONL input Batch API"""
+    return json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': endpoint, 'body': body}, ensure_ascii=False)
+
+
+def parse_output_line(line):
+    """
+    Baris output/error Batch API → (custom_id, completion body atau None, pesan error atau None)
+    """
+    record = json.loads(line)
+    custom_id = record.get('custom_id')
+    response = record.get('response') or {}
+    if record.get('error'):
+        error = record['error']
+        return custom_id, None, error.get('message') if isinstance(error, dict) else str(error)
+    if response.get('status_code', 200) != 200:
+        body = response.get('body') or {}
+        message = (body.get('error') or {}).get('message') if isinstance(body, dict) else None
+        return custom_id, None, message or f"HTTP {response.get('status_code')}"
+    return custom_id, response.get('body'), None
+
+
+class BulkStore:
+    """Status job & item bulk di SQLite, bytes gambar di folder `files_dir/<job_id>/`"""
+
+    def __init__(self, db_path, files_dir):
+        self.db_path = db_path
+        self.files_dir = files_dir
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(files_dir, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS bulk_jobs ("
+                    "job_id TEXT PRIMARY KEY, model TEXT, created_at REAL, note TEXT)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS bulk_items ("
+                    "custom_id TEXT PRIMARY KEY, job_id TEXT, seq INTEGER, source_file TEXT, halaman INTEGER, "
+                    "mime_type TEXT, path TEXT, detail TEXT, expected_items INTEGER, cache_key TEXT, "
+                    "status TEXT, batch_id TEXT, attempts INTEGER DEFAULT 0, error TEXT, result TEXT, updated_at REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_items_job ON bulk_items(job_id, status)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_items_batch ON bulk_items(batch_id)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ---------- Job ----------
+
+    def create_job(self, model, note=None):
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        os.makedirs(os.path.join(self.files_dir, job_id), exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO bulk_jobs (job_id, model, created_at, note) VALUES (?, ?, ?, ?)",
+                    (job_id, model, time.time(), note),
+                )
+        finally:
+            conn.close()
+        return job_id
+
+    def add_item(self, job_id, seq, source_file, image_bytes, mime_type, detail, expected_items=None,
+                 halaman=None, cache_key=None, result=None):
+        """Simpan bytes gambar ke disk & daftarkan item; `result` diisi jika sudah ada di cache OCR"""
+        custom_id = f"{job_id}-{seq:06d}"
+        path = os.path.join(self.files_dir, job_id, f"{seq:06d}.bin")
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO bulk_items (custom_id, job_id, seq, source_file, halaman, mime_type, path, detail, "
+                    "expected_items, cache_key, status, result, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (custom_id, job_id, seq, source_file, halaman, mime_type, path, detail, expected_items,
+                     cache_key, DONE if result is not None else PENDING,
+                     json.dumps(result, ensure_ascii=False) if result is not None else None, time.time()),
+                )
+        finally:
+            conn.close()
+        return custom_id
+
+    def job(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT job_id, model, created_at, note FROM bulk_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def jobs(self, limit=20):
+        """Job terbaru + jumlah item per status"""
+        conn = self._connect()
+        try:
+            jobs = [dict(row) for row in conn.execute(
+                "SELECT job_id, model, created_at, note FROM bulk_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            )]
+            for job in jobs:
+                counts = dict(conn.execute(
+                    "SELECT status, COUNT(*) FROM bulk_items WHERE job_id = ? GROUP BY status", (job['job_id'],)
+                ).fetchall())
+                job['counts'] = {status: counts.get(status, 0) for status in STATUSES}
+                job['total'] = sum(job['counts'].values())
+            return jobs
+        finally:
+            conn.close()
+
+    def delete_job(self, job_id):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM bulk_items WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM bulk_jobs WHERE job_id = ?", (job_id,))
+        finally:
+            conn.close()
+        shutil.rmtree(os.path.join(self.files_dir, job_id), ignore_errors=True)
+
+    # ---------- Item ----------
+
+    def items(self, job_id, status=None):
+        conn = self._connect()
+        try:
+            sql = "SELECT * FROM bulk_items WHERE job_id = ?"
+            params = [job_id]
+            if status:
+                sql += " AND status = ?"
+                params.append(status)
+            return [dict(row) for row in conn.execute(sql + " ORDER BY seq", params)]
+        finally:
+            conn.close()
+
+    def active_batches(self, job_id=None):
+        """batch_id yang masih punya item berstatus submitted"""
+        conn = self._connect()
+        try:
+            sql = "SELECT DISTINCT batch_id FROM bulk_items WHERE status = ?"
+            params = [SUBMITTED]
+            if job_id:
+                sql += " AND job_id = ?"
+                params.append(job_id)
+            return [row[0] for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def update_items(self, updates):
+        """updates: list of (custom_id, dict kolom → nilai)"""
+        conn = self._connect()
+        try:
+            with conn:
+                for custom_id, values in updates:
+                    values = dict(values, updated_at=time.time())
+                    if 'result' in values and values['result'] is not None:
+                        values['result'] = json.dumps(values['result'], ensure_ascii=False)
+                    assignments = ", ".join(f"{column} = ?" for column in values)
+                    conn.execute(
+                        f"UPDATE bulk_items SET {assignments} WHERE custom_id = ?",
+                        [*values.values(), custom_id],
+                    )
+        finally:
+            conn.close()
+
+    def mark_submitted(self, custom_ids, batch_id):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE bulk_items SET status = ?, batch_id = ?, attempts = attempts + 1, error = NULL, "
+                    "updated_at = ? WHERE custom_id = ?",
+                    [(SUBMITTED, batch_id, time.time(), custom_id) for custom_id in custom_ids],
+                )
+        finally:
+            conn.close()
+
+    def retry_failed(self, job_id):
+        """Item gagal dikembalikan ke pending untuk batch berikutnya"""
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(
+                    "UPDATE bulk_items SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                    (PENDING, time.time(), job_id, FAILED),
+                ).rowcount
+        finally:
+            conn.close()
+
+    @staticmethod
+    def read_bytes(item):
+        with open(item['path'], 'rb') as f:
+            return f.read()
+
+
+def write_batches(items, build_body, max_batch_mb=DEFAULT_MAX_BATCH_MB, endpoint=BATCH_ENDPOINT, tmp_dir=None):
+    """
+    Tulis item ke satu atau beberapa file JSONL sesuai batas ukuran & jumlah request.
+
+    Args:
+        build_body: fungsi(item) → body request chat completions
+
+    Yields:
+        (path file JSONL, list custom_id di dalamnya); file dihapus setelah generator dilanjutkan
+    """
+    max_bytes = int(max_batch_mb * 1024 * 1024)
+    chunk_ids, chunk_bytes, handle, path = [], 0, None, None
+
+    def flush():
+        handle.close()
+        return path, list(chunk_ids)
+
+    try:
+        for item in items:
+            line = (request_line(item['custom_id'], build_body(item), endpoint) + "\n").encode('utf-8')
+            if handle is not None and (chunk_bytes + len(line) > max_bytes or len(chunk_ids) >= MAX_BATCH_REQUESTS):
+                yield flush()
+                os.remove(path)
+                handle = None
+            if handle is None:
+                fd, path = tempfile.mkstemp(prefix="nota-bulk-", suffix=".jsonl", dir=tmp_dir)
+                handle = os.fdopen(fd, 'wb')
+                chunk_ids, chunk_bytes = [], 0
+            handle.write(line)
+            chunk_ids.append(item['custom_id'])
+            chunk_bytes += len(line)
+        if handle is not None:
+            yield flush()
+            os.remove(path)
+            handle = None
+    finally:
+        if handle is not None:
+            handle.close()
+            os.remove(path)
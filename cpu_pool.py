@@ -0,0 +1,226 @@
+"""
+Process pool bersama untuk pekerjaan gambar & PDF yang berat di CPU.
+
+Render halaman PDF (load hasil Poppler + re-encode JPEG quality 95), crop &
+deskew foto nota, dan pemotongan struk panjang semuanya kode Python/Pillow
+yang memegang GIL. Jika dijalankan di thread script Streamlit, PDF besar
+milik satu user membuat semua session lain di replica yang sama ikut
+tersendat. `CpuPool` menjalankannya di beberapa proses worker:
+
+- Jumlah worker dibatasi (`max_workers`), jadi pekerjaan CPU tersebar ke
+  beberapa core tanpa berebut GIL dengan server Streamlit
+- Back-pressure: paling banyak `max_pending` tugas yang antre/berjalan;
+  pemanggil berikutnya menunggu giliran sebelum bytes-nya dikirim ke worker,
+  sehingga lonjakan upload tidak menumpuk puluhan MB di antrean. Giliran
+  diatur `scheduler.PriorityScheduler`: scan interaktif didahulukan dari batch
+- Hanya bytes hasil (JPEG) / dict kecil yang dikirim balik ke script
+- Payload kecil (< `min_bytes`) dijalankan langsung di proses ini karena
+  biaya kirim ke worker lebih besar dari pekerjaannya; begitu juga jika
+  `max_workers=0`
+- Worker mati (mis. OOM): pool dibuat ulang dan tugas diulang sekali di pool
+  baru; jika worker mati lagi, `WorkerCrashed` dilempar. Tugas yang pernah
+  dikirim ke worker tidak pernah dijalankan di proses ini, supaya payload
+  yang mematikan worker tidak ikut mematikan server
+
+Fungsi tugas di modul ini dijalankan di worker, jadi hanya boleh memakai
+modul ringan tanpa Streamlit. Setiap tugas mengembalikan (hasil, {tahap:
+detik}); durasi per tahap dicatat ke pipeline_metrics di proses utama
+karena registry metrik worker tidak pernah di-scrape.
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pipeline_metrics
+import scheduler
+
+DEFAULT_MIN_KB = 256
+
+
+class WorkerCrashed(RuntimeError):
+    """Worker mati saat menjalankan tugas, juga setelah diulang di pool baru"""
+
+
+# ==========================================
+# Tugas (dijalankan di proses worker)
+# ==========================================
+
+def render_pdf_page(pdf_bytes, page_number, dpi, output_folder=None):
+    """Render satu halaman PDF → JPEG bytes (atau None jika halaman tidak ada)"""
+    from pdf2image import convert_from_bytes
+
+    import spill_store
+
+    timings = {}
+    started = time.perf_counter()
+    if output_folder:
+        # Poppler menulis JPEG langsung: render & encode terukur sebagai satu tahap
+        paths = convert_from_bytes(
+            pdf_bytes, dpi=dpi, first_page=page_number, last_page=page_number,
+            output_folder=output_folder, fmt="jpeg", jpegopt={"quality": 95}, paths_only=True
+        )
+        timings['pdf_rasterize'] = time.perf_counter() - started
+        if not paths:
+            return None, timings
+        page_bytes = spill_store.SpillStore.read_bytes(paths[0])
+        spill_store.SpillStore.discard(paths[0])
+        return page_bytes, timings
+
+    images = convert_from_bytes(pdf_bytes, dpi=dpi, first_page=page_number, last_page=page_number)
+    timings['pdf_rasterize'] = time.perf_counter() - started
+    if not images:
+        return None, timings
+    started = time.perf_counter()
+    img_byte_arr = BytesIO()
+    images[0].save(img_byte_arr, format='JPEG', quality=95)
+    timings['jpeg_encode'] = time.perf_counter() - started
+    return img_byte_arr.getvalue(), timings
+
+
+def prepare_receipt(image_bytes):
+    """`receipt_crop.prepare_receipt` di worker"""
+    import receipt_crop
+
+    return receipt_crop.prepare_receipt(image_bytes), {}
+
+
+def split_tiles(image_bytes, min_aspect):
+    """`receipt_tiling.split_tiles` di worker"""
+    import receipt_tiling
+
+    return receipt_tiling.split_tiles(image_bytes, min_aspect=min_aspect), {}
+
+
+def _call(fn, args):
+    # Waktu mulai (wall clock, sama di semua proses satu host) untuk menghitung lama antre
+    started = time.time()
+    result, timings = fn(*args)
+    return result, timings, started
+
+
+# ==========================================
+# Pool
+# ==========================================
+
+def _payload_size(args):
+    return sum(len(arg) for arg in args if isinstance(arg, (bytes, bytearray, memoryview)))
+
+
+class CpuPool:
+    """Process pool berukuran tetap dengan back-pressure, dipakai bersama semua session"""
+
+    def __init__(self, max_workers, max_pending=None, min_bytes=DEFAULT_MIN_KB * 1024):
+        self.max_workers = max(0, int(max_workers))
+        self.max_pending = max(1, int(max_pending or self.max_workers * 2 or 1))
+        self.min_bytes = min_bytes
+        self.scheduler = scheduler.PriorityScheduler(self.max_pending, name="cpu")
+        self._lock = threading.Lock()
+        self._executor = None
+        self.submitted = 0
+        self.inline = 0
+        self.restarts = 0
+        self.crashed = 0
+        self.waiting = 0
+
+    def _get_executor(self):
+        # Worker baru dibuat saat tugas pertama, bukan saat startup (cold start tetap cepat)
+        with self._lock:
+            if self._executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                # fork di proses multi-thread (server Streamlit) rawan deadlock
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args, min_bytes=None):
+        """
+        Jalankan tugas `fn(*args)` (fungsi di modul ini) dan kembalikan hasilnya.
+
+        Memblok pemanggil selama pool penuh (back-pressure). Exception dari
+        tugas dilempar apa adanya.
+
+        Args:
+            min_bytes: batas payload untuk dijalankan langsung (default: `self.min_bytes`);
+                0 untuk tugas yang selalu berat walau input-nya kecil (render PDF)
+
+        Raises:
+            WorkerCrashed: worker mati dua kali saat menjalankan tugas ini
+        """
+        min_bytes = self.min_bytes if min_bytes is None else min_bytes
+        if not self.max_workers or _payload_size(args) < min_bytes:
+            with self._lock:
+                self.inline += 1
+            result, timings, _ = _call(fn, args)
+            return self._record(result, timings)
+
+        queued = time.time()
+        ticket = scheduler.current()
+        with self._lock:
+            self.waiting += 1
+        priority = self.scheduler.acquire(ticket)
+        with self._lock:
+            self.waiting -= 1
+        try:
+            try:
+                result = self._submit(fn, args)
+            except BrokenProcessPool:
+                # Worker mati (mis. OOM saat render PDF raksasa); penyebabnya bisa juga
+                # tugas lain yang berjalan bersamaan, jadi diulang sekali di pool baru
+                try:
+                    result = self._submit(fn, args)
+                except BrokenProcessPool as error:
+                    with self._lock:
+                        self.crashed += 1
+                    raise WorkerCrashed(f"Worker process pool mati saat menjalankan {fn.__name__}") from error
+        finally:
+            self.scheduler.release(priority, ticket)
+        result, timings, started = result
+        return self._record(result, timings, wait=max(0.0, started - queued))
+
+    def _submit(self, fn, args):
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_call, fn, args)
+            with self._lock:
+                self.submitted += 1
+            return future.result()
+        except BrokenProcessPool:
+            # Pool rusak dibuang sekali (tugas lain yang ikut gagal tidak membuangnya lagi)
+            self._discard_executor(executor)
+            raise
+
+    def _record(self, result, timings, wait=None):
+        if wait is not None:
+            pipeline_metrics.METRICS.observe('stage_duration_seconds', wait, stage='cpu_pool_wait')
+        for stage, seconds in timings.items():
+            pipeline_metrics.METRICS.observe('stage_duration_seconds', seconds, stage=stage)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'inline': self.inline,
+                'waiting': self.waiting,
+                'restarts': self.restarts,
+                'crashed': self.crashed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,167 @@
+"""
+Pemilihan detail gambar (low / high) + estimasi token & latency sebelum OCR.
+
+`detail: high` selalu memakai jumlah tile gambar maksimal, padahal foto
+nota kecil yang jelas sudah terbaca di `detail: low` (satu gambar 512px,
+token tetap). Sebelum request dikirim, gambar dianalisis secara lokal:
+
+- ukuran gambar → jumlah tile & token input untuk setiap detail
+- ketajaman (variance Laplacian) → foto blur butuh resolusi penuh
+- kepadatan teks (profil baris tinta) → jumlah baris & jarak antar baris;
+  jika jarak baris setelah diperkecil ke 512px masih terbaca, `low` cukup
+
+Hasil `low` yang confidence-nya rendah di-escalate ulang ke `high`
+(lihat `needs_escalation`). Semua angka token/latency adalah estimasi kasar
+untuk ditampilkan di UI, bukan tagihan.
+"""
+
+import math
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import wire_format
+
+# (token dasar, token per tile 512px) untuk detail high; detail low = token dasar saja
+MODEL_IMAGE_TOKENS = {
+    'gpt-4o': (85, 170),
+    'gpt-4o-mini': (2833, 5667),
+}
+DEFAULT_IMAGE_TOKENS = (85, 170)
+
+PROMPT_TOKENS = 1500          # system prompt + instruksi ekstraksi
+HEADER_FOOTER_LINES = 8       # baris teks non-item (nama toko, alamat, total, dll)
+
+LATENCY_BASE = 1.5            # detik, overhead request
+PREFILL_TOKENS_PER_SEC = 4000
+DECODE_TOKENS_PER_SEC = 60
+
+LOW_DETAIL_SIZE = 512
+MIN_LINE_PX_LOW = 16          # jarak antar baris teks minimal (px) agar terbaca di detail low
+MIN_SHARPNESS = 40.0          # variance Laplacian minimal (gambar analisis 1024px)
+ESCALATE_BELOW = 80           # confidence rata-rata item di bawah ini → ulang dengan detail high
+
+ANALYSIS_SIZE = 1024
+
+
+def image_tokens(width, height, detail, model):
+    """Token input gambar sesuai aturan resize OpenAI (fit 2048, sisi pendek 768, tile 512)"""
+    base, per_tile = MODEL_IMAGE_TOKENS.get(model, DEFAULT_IMAGE_TOKENS)
+    if detail == 'low':
+        return base, 1
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return base + per_tile * tiles, tiles
+
+
+def estimate_request(width, height, detail, model, expected_items, output_format=wire_format.VERBOSE):
+    """Estimasi token input/output dan latency satu request"""
+    tokens_image, tiles = image_tokens(width, height, detail, model)
+    tokens_in = PROMPT_TOKENS + tokens_image
+    tokens_out = wire_format.BASE_TOKENS[output_format] + wire_format.TOKENS_PER_ITEM[output_format] * expected_items
+    latency = LATENCY_BASE + tokens_in / PREFILL_TOKENS_PER_SEC + tokens_out / DECODE_TOKENS_PER_SEC
+    return {'tiles': tiles, 'tokens_in': tokens_in, 'tokens_out': tokens_out, 'latency': latency}
+
+
+def analyze_image(image_bytes):
+    """
+    Analisis lokal murah: ukuran, ketajaman dan jumlah/jarak baris teks.
+
+    Returns:
+        dict: width, height, sharpness, text_lines, line_px (jarak antar baris di gambar asli, atau None)
+    """
+    image = Image.open(BytesIO(image_bytes))
+    # JPEG bisa di-decode langsung di resolusi kecil (jauh lebih cepat dari decode penuh)
+    image.draft('L', (ANALYSIS_SIZE, ANALYSIS_SIZE))
+    image = ImageOps.exif_transpose(image).convert('L')
+    width, height = _original_size(image_bytes)
+
+    image.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    pixels = np.asarray(image, dtype=np.float32)
+    scale = pixels.shape[0] / height
+
+    # Ketajaman: variance Laplacian (tepi huruf yang tegas → nilai tinggi)
+    laplacian = (
+        -4 * pixels[1:-1, 1:-1]
+        + pixels[:-2, 1:-1] + pixels[2:, 1:-1]
+        + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+    )
+    sharpness = float(laplacian.var()) if laplacian.size else 0.0
+
+    # Baris teks: baris pixel yang mengandung cukup banyak tinta gelap
+    ink = pixels < pixels.mean() - 0.5 * pixels.std()
+    text_rows = ink.mean(axis=1) > 0.02
+    starts = np.flatnonzero(text_rows[1:] & ~text_rows[:-1]) + 1
+    if text_rows[:1].any():
+        starts = np.concatenate([[0], starts])
+    text_lines = int(len(starts))
+    line_px = float(np.median(np.diff(starts)) / scale) if text_lines >= 3 else None
+
+    return {
+        'width': width,
+        'height': height,
+        'sharpness': sharpness,
+        'text_lines': text_lines,
+        'line_px': line_px,
+    }
+
+
+def _original_size(image_bytes):
+    image = Image.open(BytesIO(image_bytes))
+    width, height = image.size
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def plan_detail(analysis, model, mode='auto', output_format=wire_format.VERBOSE):
+    """
+    Pilih detail untuk satu gambar dan estimasi biayanya.
+
+    Args:
+        analysis: hasil `analyze_image`
+        mode: 'auto', 'low' atau 'high' (paksa)
+        output_format: format output respons (lihat wire_format), untuk estimasi token output
+
+    Returns:
+        dict: detail, reason, expected_items, estimates {'low': {...}, 'high': {...}}
+    """
+    width, height = analysis['width'], analysis['height']
+    expected_items = max(1, analysis['text_lines'] - HEADER_FOOTER_LINES)
+    estimates = {
+        detail: estimate_request(width, height, detail, model, expected_items, output_format)
+        for detail in ('low', 'high')
+    }
+
+    if mode in ('low', 'high'):
+        detail, reason = mode, "dipaksa dari konfigurasi"
+    elif analysis['line_px'] is None:
+        detail, reason = 'high', "baris teks tidak terdeteksi"
+    elif analysis['sharpness'] < MIN_SHARPNESS:
+        detail, reason = 'high', "gambar kurang tajam"
+    else:
+        line_px_low = analysis['line_px'] * LOW_DETAIL_SIZE / max(width, height)
+        if line_px_low >= MIN_LINE_PX_LOW:
+            detail, reason = 'low', f"teks tetap terbaca di 512px (±{line_px_low:.0f}px per baris)"
+        else:
+            detail, reason = 'high', f"teks terlalu kecil di 512px (±{line_px_low:.0f}px per baris)"
+
+    return {'detail': detail, 'reason': reason, 'expected_items': expected_items, 'estimates': estimates}
+
+
+def needs_escalation(result):
+    """Hasil detail low perlu diulang dengan high: tidak ada item atau confidence rendah"""
+    items = (result or {}).get('items') or []
+    if not items:
+        return True
+    scores = [
+        score for item in items
+        for score in (item.get('confidence') or {}).values()
+        if isinstance(score, (int, float))
+    ]
+    return bool(scores) and sum(scores) / len(scores) < ESCALATE_BELOW
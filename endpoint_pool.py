@@ -0,0 +1,258 @@
+"""
+Beberapa endpoint OCR (gateway / provider) dengan load balancing & circuit breaker.
+
+Dengan satu `OPENAI_BASE_URL`, gateway yang lambat atau mati membuat setiap
+scan menunggu sampai timeout. `EndpointPool` menyebar request ke beberapa
+endpoint berbobot:
+
+- Pemilihan acak berbobot: bobot konfigurasi dibagi latency rata-rata (EWMA),
+  jumlah request yang sedang berjalan, dan dikurangi sesuai error rate
+- Circuit breaker per endpoint: setelah beberapa error berturut-turut (atau
+  error rate tinggi) endpoint "dibuka" dan tidak dipakai selama cooldown.
+  Setelah cooldown, SATU request dipakai sebagai probe (half-open): berhasil →
+  endpoint pulih, gagal → dibuka lagi dengan cooldown lebih lama
+- Request yang gagal karena endpoint (timeout, koneksi, 5xx, rate limit)
+  langsung dicoba di endpoint lain; error karena request-nya sendiri
+  (mis. 400) dilempar apa adanya dan tidak dihitung sebagai endpoint sakit
+"""
+
+import json
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+EWMA_ALPHA = 0.3
+DEFAULT_LATENCY = 5.0        # detik, asumsi awal sebelum ada data
+FAILURE_THRESHOLD = 3        # error berturut-turut sebelum circuit dibuka
+ERROR_RATE_THRESHOLD = 0.5   # atau error rate (EWMA) di atas nilai ini ...
+MIN_SAMPLES = 10             # ... setelah minimal sekian request
+BASE_COOLDOWN = 15.0         # detik, cooldown pertama; berlipat dua setiap kali gagal pulih
+MAX_COOLDOWN = 300.0
+
+
+class NoHealthyEndpoint(RuntimeError):
+    """Semua endpoint sedang dibuka circuit breaker-nya"""
+
+
+class Endpoint:
+    """Satu endpoint OCR beserta statistik & status circuit breaker-nya"""
+
+    def __init__(self, name, base_url, client=None, weight=1.0, client_factory=None):
+        """
+        Args:
+            client: client API, atau None jika dibuat saat pertama dipakai lewat
+                `client_factory` (fungsi tanpa argumen) sehingga import library
+                client yang berat tidak terjadi saat startup
+        """
+        self.name = name
+        self.base_url = base_url
+        self._client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.weight = max(0.0, float(weight))
+
+        self.latency = None          # EWMA latency request yang berhasil (detik)
+        self.error_rate = 0.0        # EWMA 0..1
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.trips = 0               # berapa kali berturut-turut circuit dibuka tanpa pulih
+        self.probing = False
+        self.last_error = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def score(self):
+        latency = self.latency or DEFAULT_LATENCY
+        return self.weight * (1.0 - self.error_rate) ** 2 / (latency * (1 + self.in_flight))
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        return {
+            'name': self.name,
+            'base_url': self.base_url,
+            'weight': self.weight,
+            'state': self.state,
+            'latency': self.latency,
+            'error_rate': self.error_rate,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'retry_in': max(0.0, self.open_until - now) if self.state == OPEN else 0.0,
+            'last_error': self.last_error,
+        }
+
+
+class EndpointPool:
+    """Kumpulan endpoint, dipakai bersama semua session & thread dalam satu proses"""
+
+    def __init__(self, endpoints, is_endpoint_error, rng=None):
+        """
+        Args:
+            endpoints: list Endpoint
+            is_endpoint_error: fungsi(exception) → True jika error disebabkan endpoint
+                (timeout, koneksi, 5xx, rate limit) sehingga perlu failover
+        """
+        if not endpoints:
+            raise ValueError("Minimal satu endpoint OCR harus dikonfigurasi")
+        self.endpoints = list(endpoints)
+        self.is_endpoint_error = is_endpoint_error
+        self._lock = threading.Lock()
+        self._rng = rng or random.Random()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def health(self):
+        now = time.time()
+        with self._lock:
+            return [endpoint.snapshot(now) for endpoint in self.endpoints]
+
+    # ---------- Pemilihan ----------
+
+    def _acquire(self, exclude):
+        now = time.time()
+        with self._lock:
+            candidates = []
+            for endpoint in self.endpoints:
+                if endpoint in exclude or endpoint.weight <= 0:
+                    continue
+                if endpoint.state == OPEN and now >= endpoint.open_until:
+                    endpoint.state = HALF_OPEN
+                if endpoint.state == CLOSED or (endpoint.state == HALF_OPEN and not endpoint.probing):
+                    candidates.append(endpoint)
+
+            if not candidates:
+                raise NoHealthyEndpoint("Semua endpoint OCR sedang gangguan, coba lagi sebentar lagi")
+
+            # Endpoint half-open diberi satu request probe sebelum dipakai normal lagi
+            probes = [endpoint for endpoint in candidates if endpoint.state == HALF_OPEN]
+            if probes:
+                chosen = probes[0]
+                chosen.probing = True
+            else:
+                chosen = self._rng.choices(candidates, weights=[endpoint.score() for endpoint in candidates])[0]
+            chosen.in_flight += 1
+            chosen.requests += 1
+            return chosen
+
+    # ---------- Pencatatan hasil ----------
+
+    def _record_success(self, endpoint, latency):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+            endpoint.latency = latency if endpoint.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * endpoint.latency
+            )
+            endpoint.error_rate *= (1 - EWMA_ALPHA)
+            endpoint.consecutive_failures = 0
+            endpoint.state = CLOSED
+            endpoint.trips = 0
+
+    def _record_neutral(self, endpoint):
+        # Endpoint menjawab, tapi request-nya sendiri ditolak (mis. 400): bukan tanda endpoint sakit
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+            if endpoint.state == HALF_OPEN:
+                endpoint.state = CLOSED
+                endpoint.trips = 0
+
+    def _record_failure(self, endpoint, error):
+        now = time.time()
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            endpoint.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * endpoint.error_rate
+            endpoint.last_error = f"{type(error).__name__}: {error}"[:200]
+
+            trip = (
+                endpoint.state == HALF_OPEN
+                or endpoint.consecutive_failures >= FAILURE_THRESHOLD
+                or (endpoint.requests >= MIN_SAMPLES and endpoint.error_rate > ERROR_RATE_THRESHOLD)
+            )
+            if trip:
+                endpoint.trips += 1
+                cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (endpoint.trips - 1))
+                endpoint.state = OPEN
+                endpoint.open_until = now + cooldown
+
+    # ---------- Pemanggilan ----------
+
+    def call(self, fn, attempts=None):
+        """
+        Jalankan `fn(endpoint)` di endpoint terpilih, failover ke endpoint lain jika gagal.
+
+        Args:
+            attempts: jumlah percobaan maksimal (default: jumlah endpoint + 1)
+
+        Raises:
+            Error terakhir dari `fn`, atau NoHealthyEndpoint
+        """
+        attempts = attempts or len(self.endpoints) + 1
+        tried = set()
+        last_error = None
+        for _ in range(attempts):
+            try:
+                # Endpoint yang sudah gagal untuk request ini dihindari selama masih ada pilihan lain
+                endpoint = self._acquire(tried if len(tried) < len(self.endpoints) else set())
+            except NoHealthyEndpoint:
+                if last_error is not None:
+                    raise last_error
+                raise
+
+            started = time.monotonic()
+            try:
+                result = fn(endpoint)
+            except Exception as e:
+                if not self.is_endpoint_error(e):
+                    self._record_neutral(endpoint)
+                    raise
+                self._record_failure(endpoint, e)
+                tried.add(endpoint)
+                last_error = e
+                continue
+            self._record_success(endpoint, time.monotonic() - started)
+            return result
+        raise last_error
+
+
+def parse_endpoints(value, default_api_key=None):
+    """
+    Konfigurasi OCR_ENDPOINTS → list dict {name, base_url, api_key, weight}.
+
+    Menerima list of dict (array of tables di secrets.toml) atau string JSON.
+    `api_key` yang kosong memakai `default_api_key`.
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    endpoints = []
+    for index, entry in enumerate(value, start=1):
+        entry = dict(entry)
+        if not entry.get('base_url'):
+            raise ValueError(f"OCR_ENDPOINTS #{index}: base_url wajib diisi")
+        endpoints.append({
+            'name': entry.get('name') or f"endpoint-{index}",
+            'base_url': entry['base_url'],
+            'api_key': entry.get('api_key') or default_api_key,
+            'weight': float(entry.get('weight', 1)),
+        })
+    return endpoints
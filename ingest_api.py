@@ -0,0 +1,340 @@
+"""
+HTTP ingestion API ringan untuk upload nota dari aplikasi mobile / scanner.
+
+Setiap session Streamlit membawa websocket, rerun script dan state UI,
+terlalu berat untuk perangkat yang hanya ingin mengirim foto. API ini
+menerima upload multipart, langsung membalas dengan job id, lalu
+menjalankan pipeline ekstraksi yang sama dengan aplikasi (`nota_pipeline.py`:
+cache OCR, single-flight, pool endpoint, PDF multi-halaman) di thread pool.
+
+Jalankan (satu proses; konkurensi lewat async + thread pool, job disimpan di memory):
+
+    uvicorn ingest_api:app --host 0.0.0.0 --port 8080
+
+Endpoint:
+
+- POST /v1/nota                 multipart `file` (JPEG/PNG/PDF), opsional `model`,
+                                `catalog` (true/false), `save` (true/false),
+                                `priority` (interactive/batch/backfill) → 202 + job id
+- GET  /v1/jobs/{job_id}        status job (queued / processing / done / failed)
+- GET  /v1/jobs/{job_id}/result hasil ekstraksi (202 selama job belum selesai)
+- GET  /healthz                 antrean job + kesehatan endpoint OCR
+- GET  /metrics                 timing per tahap pipeline (format Prometheus)
+
+Jika INGEST_API_TOKEN diset, setiap request wajib membawa header
+`Authorization: Bearer <token>`.
+"""
+
+import asyncio
+import hmac
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import nota_pipeline
+import pipeline_metrics
+import result_editor
+import result_store
+import scheduler
+from nota_pipeline import get_config
+
+# Di luar `streamlit run`, st.cache_resource memperingatkan setiap worker thread tanpa ScriptRunContext
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+INGEST_API_TOKEN = get_config("INGEST_API_TOKEN") or None
+INGEST_WORKERS = int(get_config("INGEST_WORKERS", 8))
+INGEST_MAX_PENDING = int(get_config("INGEST_MAX_PENDING", 200))    # job antre + berjalan sebelum 503
+INGEST_MAX_UPLOAD_MB = float(get_config("INGEST_MAX_UPLOAD_MB", 20))
+INGEST_JOB_TTL_HOURS = float(get_config("INGEST_JOB_TTL_HOURS", 24))
+INGEST_DEFAULT_MODEL = get_config("INGEST_DEFAULT_MODEL", "gpt-4o")
+# Kelas scheduler untuk upload tanpa field `priority` (scanner biasanya mengirim banyak file sekaligus)
+INGEST_DEFAULT_PRIORITY = scheduler.parse_priority(get_config("INGEST_DEFAULT_PRIORITY", "batch"))
+# Sink untuk upload dengan save=true (Google Sheets tidak didukung: koneksinya bagian dari UI)
+INGEST_SINKS = [
+    name for name in result_store.parse_sink_names(get_config("INGEST_SINKS", "sqlite"))
+    if name != result_store.GoogleSheetSink.name
+]
+PARQUET_DIR = get_config("PARQUET_DIR", "data/parquet")
+
+ALLOWED_TYPES = ("image/jpeg", "image/png", "application/pdf")
+ALLOWED_MODELS = ("gpt-4o", "gpt-4o-mini")
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobRegistry:
+    """Status & hasil job di memory, dibuang setelah INGEST_JOB_TTL_HOURS"""
+
+    def __init__(self, ttl_hours=INGEST_JOB_TTL_HOURS):
+        self.ttl = ttl_hours * 3600
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, file_name, file_type, size, model):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': QUEUED,
+                'file_name': file_name,
+                'file_type': file_type,
+                'size': size,
+                'model': model,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'result': None,
+            }
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **values):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(values)
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] in (QUEUED, PROCESSING))
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+jobs = JobRegistry()
+executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# Antrean executor FIFO: job diambil dari antrean prioritas saat worker kosong, sehingga upload
+# interaktif tidak menunggu ratusan job batch yang sudah lebih dulu antre
+job_queue = queue.PriorityQueue()
+_job_seq = itertools.count()
+
+
+def status_payload(job):
+    payload = {key: value for key, value in job.items() if key != 'result'}
+    if job['result'] is not None:
+        payload['item_count'] = len(job['result']['items'])
+    return payload
+
+
+def save_result(metadata, items, file_name):
+    """Simpan baris hasil ke INGEST_SINKS → {nama sink: jumlah baris}"""
+    for item in items:
+        item['source_file'] = file_name
+    df = pd.DataFrame(nota_pipeline.build_result_rows(items, metadata))
+    conf_cols = [col for col in df.columns if col.startswith('_conf_')]
+    save_df = result_store.prepare_save_frame(df[result_editor.visible_columns(df)], df[conf_cols])
+    sinks = result_store.build_sinks(INGEST_SINKS, None, nota_pipeline.LOCAL_DB_PATH, PARQUET_DIR)
+    saved = {}
+    for sink in sinks:
+        with pipeline_metrics.span("save", sink=sink.name):
+            saved[sink.name] = sink.write(save_df)
+        pipeline_metrics.count('saved_rows_total', saved[sink.name], sink=sink.name)
+    return saved
+
+
+def run_job(job_id, file_bytes, file_type, model, use_catalog, save, ticket):
+    """Dijalankan di worker thread: ekstraksi, validasi, lalu (opsional) simpan"""
+    job = jobs.get(job_id)
+    jobs.update(job_id, status=PROCESSING, started_at=time.time())
+    try:
+        with scheduler.use(ticket):
+            json_data, warnings = nota_pipeline.extract_document(file_bytes, file_type, model)
+        metadata, items, logs = nota_pipeline.correct_result(json_data, use_catalog)
+        saved = save_result(metadata, items, job['file_name']) if save else None
+        result = {
+            'metadata': metadata,
+            'items': items,
+            'correction_logs': logs,
+            'warnings': warnings,
+            'preprocess': json_data.get('preprocess'),
+            'saved': saved,
+        }
+        jobs.update(job_id, status=DONE, result=result, finished_at=time.time())
+    except Exception as e:
+        jobs.update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished_at=time.time())
+
+
+def run_next_job():
+    """Dijalankan di worker thread: satu submit executor = satu job, diambil yang prioritasnya tertinggi"""
+    _, _, args = job_queue.get_nowait()
+    run_job(*args)
+
+
+def _authorized(request):
+    if not INGEST_API_TOKEN:
+        return True
+    header = request.headers.get('authorization', '')
+    scheme, _, token = header.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), INGEST_API_TOKEN)
+
+
+def _error(status_code, message):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+class UploadTooLarge(Exception):
+    """Body request melewati batas ukuran upload"""
+
+
+def _limit_body(request, max_bytes):
+    """
+    Request yang sama, tapi body-nya dihitung saat dibaca: lempar UploadTooLarge begitu
+    melewati max_bytes. Upload chunked (tanpa Content-Length) juga ikut dibatasi,
+    sebelum seluruh file ditulis ke file sementara.
+    """
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > max_bytes:
+                raise UploadTooLarge()
+        return message
+
+    return Request(request.scope, receive)
+
+
+def _flag(value, default):
+    if value is None:
+        return default
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+async def upload(request):
+    if not _authorized(request):
+        return _error(401, "Token tidak valid")
+    if jobs.pending() >= INGEST_MAX_PENDING:
+        return JSONResponse({'error': "Antrean penuh, coba lagi sebentar lagi"}, status_code=503,
+                            headers={'Retry-After': '30'})
+
+    max_bytes = int(INGEST_MAX_UPLOAD_MB * 1024 * 1024)
+    max_body = max_bytes + 64 * 1024  # ruang untuk boundary & field form lain
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_body:
+        return _error(413, f"Ukuran upload maksimal {INGEST_MAX_UPLOAD_MB:g} MB")
+
+    try:
+        form = await _limit_body(request, max_body).form(max_files=1)
+    except UploadTooLarge:
+        return _error(413, f"Ukuran upload maksimal {INGEST_MAX_UPLOAD_MB:g} MB")
+    except Exception as e:
+        return _error(400, f"Form multipart tidak valid: {e}")
+
+    try:
+        upload_file = form.get('file')
+        if upload_file is None or isinstance(upload_file, str):
+            return _error(400, "Field `file` wajib diisi")
+        file_type = (upload_file.content_type or '').split(';')[0].strip().lower()
+        if file_type not in ALLOWED_TYPES:
+            return _error(415, f"Tipe file tidak didukung: {file_type or '-'} (JPG, PNG atau PDF)")
+        model = form.get('model') or INGEST_DEFAULT_MODEL
+        if model not in ALLOWED_MODELS:
+            return _error(400, f"Model tidak dikenal: {model}")
+        file_bytes = await upload_file.read()
+        file_name = upload_file.filename or "upload"
+        use_catalog = _flag(form.get('catalog'), True)
+        save = _flag(form.get('save'), False)
+        priority = form.get('priority')
+        if priority and str(priority).strip().lower() not in scheduler.PRIORITIES:
+            return _error(400, f"Prioritas tidak dikenal: {priority} (interactive, batch, backfill)")
+        priority = scheduler.parse_priority(priority, INGEST_DEFAULT_PRIORITY)
+    finally:
+        await form.close()
+
+    if not file_bytes:
+        return _error(400, "File kosong")
+    if len(file_bytes) > max_bytes:
+        return _error(413, f"Ukuran upload maksimal {INGEST_MAX_UPLOAD_MB:g} MB")
+
+    job_id = jobs.create(file_name, file_type, len(file_bytes), model)
+    # Fair sharing scheduler per client: satu scanner yang mengirim ratusan file tidak menghabiskan slot
+    ticket = scheduler.Ticket(priority, session=request.client.host if request.client else None)
+    # Tidak di-await: respons dikirim sekarang, pipeline berjalan di thread pool
+    job_queue.put((priority, next(_job_seq), (job_id, file_bytes, file_type, model, use_catalog, save, ticket)))
+    asyncio.get_running_loop().run_in_executor(executor, run_next_job)
+    return JSONResponse(
+        {
+            'job_id': job_id,
+            'status': QUEUED,
+            'status_url': f"/v1/jobs/{job_id}",
+            'result_url': f"/v1/jobs/{job_id}/result",
+        },
+        status_code=202,
+    )
+
+
+async def job_status(request):
+    if not _authorized(request):
+        return _error(401, "Token tidak valid")
+    job = jobs.get(request.path_params['job_id'])
+    if job is None:
+        return _error(404, "Job tidak ditemukan")
+    return JSONResponse(status_payload(job))
+
+
+async def job_result(request):
+    if not _authorized(request):
+        return _error(401, "Token tidak valid")
+    job = jobs.get(request.path_params['job_id'])
+    if job is None:
+        return _error(404, "Job tidak ditemukan")
+    if job['status'] == FAILED:
+        return JSONResponse(status_payload(job), status_code=422)
+    if job['status'] != DONE:
+        return JSONResponse(status_payload(job), status_code=202, headers={'Retry-After': '2'})
+    return JSONResponse(dict(status_payload(job), **job['result']))
+
+
+async def healthz(request):
+    try:
+        endpoints = nota_pipeline.get_ocr_endpoints().health()
+    except Exception as e:
+        endpoints = [{'error': str(e)}]
+    return JSONResponse({
+        'ok': nota_pipeline.CLIENT_READY,
+        'pending_jobs': jobs.pending(),
+        'workers': INGEST_WORKERS,
+        'endpoints': endpoints,
+        'scheduler': nota_pipeline.get_ocr_scheduler().stats(),
+    })
+
+
+async def metrics(request):
+    # Tanpa token: di-scrape Prometheus dari jaringan internal, tidak berisi data nota
+    return Response(pipeline_metrics.render(), media_type=pipeline_metrics.CONTENT_TYPE)
+
+
+app = Starlette(routes=[
+    Route('/v1/nota', upload, methods=['POST']),
+    Route('/v1/jobs/{job_id}', job_status, methods=['GET']),
+    Route('/v1/jobs/{job_id}/result', job_result, methods=['GET']),
+    Route('/healthz', healthz, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+])
@@ -0,0 +1,285 @@
+"""
+Katalog barang lokal untuk normalisasi nama & kategori (Bama / Non Bama).
+
+Setiap nama barang yang sudah dikonfirmasi user (tersimpan lewat tombol
+simpan) masuk ke katalog. Setelah `validate_and_correct_items`, nama hasil
+OCR dicocokkan ke entri katalog terdekat memakai index trigram:
+
+- "Mlnyak Goreng" → "Minyak Goreng" (nama kanonik dari katalog)
+- kategori_transaksi diambil dari katalog, model hanya dipakai untuk
+  barang yang belum dikenal
+
+Posting list (id entri per trigram) disimpan sebagai array numpy, sehingga
+overlap query dengan SEMUA entri dihitung sekaligus lewat `np.bincount`,
+lalu Jaccard similarity dihitung secara vektor. Dengan begitu lookup tetap
+di bawah 1 ms walau katalog berisi puluhan ribu entri.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.6
+VALID_CATEGORIES = ("Bama", "Non Bama")
+
+
+def normalize_name(name):
+    """Kunci normalisasi: huruf kecil, tanpa emoji indicator/tanda baca, spasi tunggal"""
+    text = str(name or '').lower()
+    text = re.sub(r'[^0-9a-z]+', ' ', text)
+    return ' '.join(text.split())
+
+
+def name_trigrams(key):
+    """Trigram dari kunci yang sudah dinormalisasi (dengan padding spasi)"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _numbers(key):
+    # Angka di nama barang (ukuran/varian) harus sama persis: "Gula 1kg" ≠ "Gula 2kg"
+    return tuple(re.findall(r'\d+', key))
+
+
+class ItemCatalog:
+    """Katalog nama barang terkonfirmasi dengan index trigram di memory dan persistensi SQLite"""
+
+    table = "item_catalog"
+
+    def __init__(self, db_path=None, threshold=DEFAULT_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.entries = []                 # list of dict: key, nama_barang, kategori_transaksi, hits
+        self.by_key = {}                  # kunci normalisasi → id entri
+        self.grams = []                   # id entri → set trigram
+        self.postings = defaultdict(list) # trigram → list id entri
+        self._posting_arrays = {}         # cache trigram → np.array (dibuang saat trigram bertambah)
+        self._sizes = None                # cache np.array jumlah trigram per entri
+        self.lock = threading.Lock()
+
+        if self.db_path:
+            self._load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ---------- Persistensi ----------
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, nama_barang TEXT, kategori_transaksi TEXT, "
+            "hits INTEGER DEFAULT 1, updated_at TEXT)"
+        )
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT nama_barang, kategori_transaksi, hits FROM {self.table}"
+            ).fetchall()
+            if not rows:
+                rows = self._seed_from_results(conn)
+        finally:
+            conn.close()
+
+        for nama, kategori, hits in rows:
+            self._add_entry(nama, kategori, hits or 1)
+
+    def _seed_from_results(self, conn):
+        """Katalog kosong: isi dari item yang sudah pernah disimpan ke SQLite (jika ada)"""
+        exists = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'nota_items'"
+        ).fetchone()
+        if not exists:
+            return []
+
+        # Ambil kategori yang paling sering dipakai untuk setiap nama barang
+        rows = conn.execute(
+            """
+            SELECT nama_barang, kategori_transaksi, COUNT(*) AS hits
+            FROM nota_items
+            WHERE nama_barang IS NOT NULL AND nama_barang != ''
+            GROUP BY nama_barang, kategori_transaksi
+            ORDER BY hits DESC
+            """
+        ).fetchall()
+
+        seen = {}
+        for nama, kategori, hits in rows:
+            key = normalize_name(nama)
+            if key and key not in seen and kategori in VALID_CATEGORIES:
+                seen[key] = (nama, kategori, hits)
+
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (key, nama_barang, kategori_transaksi, hits, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, nama, kategori, hits, now) for key, (nama, kategori, hits) in seen.items()],
+            )
+        return list(seen.values())
+
+    # ---------- Index ----------
+
+    def _add_entry(self, nama, kategori, hits=1):
+        """Tambah/perbarui entri di index memory, return True jika entri baru"""
+        key = normalize_name(nama)
+        if not key:
+            return False
+
+        entry_id = self.by_key.get(key)
+        if entry_id is not None:
+            entry = self.entries[entry_id]
+            entry['nama_barang'] = nama
+            entry['kategori_transaksi'] = kategori
+            entry['hits'] += hits
+            return False
+
+        entry_id = len(self.entries)
+        grams = name_trigrams(key)
+        self.entries.append({
+            'key': key,
+            'nama_barang': nama,
+            'kategori_transaksi': kategori,
+            'hits': hits,
+            'numbers': _numbers(key),
+        })
+        self.grams.append(grams)
+        self.by_key[key] = entry_id
+        for gram in grams:
+            self.postings[gram].append(entry_id)
+            self._posting_arrays.pop(gram, None)
+        self._sizes = None
+        return True
+
+    def _posting_array(self, gram):
+        array = self._posting_arrays.get(gram)
+        if array is None:
+            array = np.fromiter(self.postings.get(gram, ()), dtype=np.int32)
+            self._posting_arrays[gram] = array
+        return array
+
+    def _size_array(self):
+        if self._sizes is None:
+            self._sizes = np.fromiter((len(grams) for grams in self.grams), dtype=np.float64, count=len(self.grams))
+        return self._sizes
+
+    def add_many(self, rows):
+        """
+        Tambahkan nama barang yang sudah dikonfirmasi user.
+
+        Args:
+            rows: iterable of (nama_barang, kategori_transaksi)
+
+        Returns:
+            int: jumlah entri baru
+        """
+        cleaned = []
+        for nama, kategori in rows:
+            nama = str(nama or '').strip()
+            if nama and normalize_name(nama) and kategori in VALID_CATEGORIES:
+                cleaned.append((nama, kategori))
+        if not cleaned:
+            return 0
+
+        with self.lock:
+            added = sum(1 for nama, kategori in cleaned if self._add_entry(nama, kategori))
+
+        if self.db_path:
+            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO {self.table} (key, nama_barang, kategori_transaksi, hits, updated_at) "
+                        "VALUES (?, ?, ?, 1, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET nama_barang = excluded.nama_barang, "
+                        "kategori_transaksi = excluded.kategori_transaksi, hits = hits + 1, "
+                        "updated_at = excluded.updated_at",
+                        [(normalize_name(nama), nama, kategori, now) for nama, kategori in cleaned],
+                    )
+            finally:
+                conn.close()
+        return added
+
+    def lookup(self, name):
+        """
+        Cari entri katalog paling mirip.
+
+        Returns:
+            tuple (entry, score) dengan score = Jaccard similarity trigram (1.0 = sama persis),
+            atau None jika tidak ada entri di atas threshold.
+        """
+        key = normalize_name(name)
+        if not key:
+            return None
+
+        with self.lock:
+            entry_id = self.by_key.get(key)
+            if entry_id is not None:
+                return self.entries[entry_id], 1.0
+
+            query = name_trigrams(key)
+            arrays = [array for array in (self._posting_array(gram) for gram in query) if len(array)]
+            if not arrays:
+                return None
+
+            # overlap[i] = jumlah trigram yang sama antara query dan entri i
+            overlap = np.bincount(np.concatenate(arrays), minlength=len(self.entries))
+            scores = overlap / (len(query) + self._size_array() - overlap)
+            candidates = np.flatnonzero(scores >= self.threshold)
+            if not len(candidates):
+                return None
+
+            # Skor tertinggi dulu; jika sama, pilih entri yang paling sering dikonfirmasi
+            hits = np.array([self.entries[candidate]['hits'] for candidate in candidates])
+            ranked = candidates[np.lexsort((-hits, -scores[candidates]))]
+            numbers = _numbers(key)
+            for candidate in ranked:
+                entry = self.entries[candidate]
+                if entry['numbers'] == numbers:
+                    return entry, float(scores[candidate])
+        return None
+
+    def apply(self, items):
+        """
+        Normalisasi nama & kategori item hasil validasi berdasarkan katalog.
+
+        Item yang tidak dikenal dibiarkan apa adanya (nama & kategori dari model).
+
+        Returns:
+            list: Items yang sudah dinormalisasi
+            list: Log perubahan
+        """
+        logs = []
+        for item in items:
+            nama = item.get('nama_barang', '')
+            match = self.lookup(nama)
+            if match is None:
+                continue
+
+            entry, score = match
+            confidence = item.setdefault('confidence', {})
+            canonical = entry['nama_barang']
+            if canonical != nama:
+                item['nama_barang'] = canonical
+                logs.append(f"📚 '{nama}' → '{canonical}' (katalog, kemiripan {score:.0%})")
+            confidence['nama_barang'] = max(confidence.get('nama_barang', 100), int(round(score * 100)))
+
+            kategori = entry['kategori_transaksi']
+            if item.get('kategori_transaksi') != kategori:
+                logs.append(f"🏷️ '{canonical}': Kategori {item.get('kategori_transaksi')} → {kategori} (katalog)")
+                item['kategori_transaksi'] = kategori
+            confidence['kategori_transaksi'] = 100
+        return items, logs
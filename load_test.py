@@ -0,0 +1,802 @@
+"""
+Load test: berapa session kasir bersamaan yang sanggup dilayani satu replica.
+
+Setiap session disimulasikan dengan `AppTest` Streamlit (script `app.py` yang
+sama, dijalankan di proses ini seperti server Streamlit menjalankan session
+di thread-nya masing-masing) dan melakukan alur kasir:
+
+    buka halaman → upload nota → scan → edit beberapa cell → simpan
+
+Backend eksternal diganti stand-in lokal supaya hasilnya bisa diulang dan
+tidak memakai kuota:
+
+- OCR: server HTTP lokal yang meniru `/chat/completions` (latency bisa diatur),
+  sehingga client OpenAI, pool endpoint, preprocessing & validasi tetap berjalan
+- Google Sheets: spreadsheet di memory (latency append bisa diatur)
+- Batch API (mode bulk offline): server HTTP lokal yang meniru `/files` &
+  `/batches`; `--bulk N` menjalankan alur kirim → cek status → muat → simpan
+- Cache OCR dimatikan dan setiap session meng-upload gambar yang berbeda,
+  sehingga setiap scan benar-benar memanggil OCR
+
+Untuk setiap level konkurensi dilaporkan persentil latency per langkah,
+CPU & pertambahan memory proses per session, dan throughput. Titik saturasi
+adalah level terakhir sebelum throughput berhenti naik atau p95 melewati SLO.
+
+    python load_test.py --sessions 1,2,4,8,16 --ocr-latency 3 --slo 10
+
+Catatan: websocket & serialisasi ke browser tidak ikut terukur, jadi angka
+ini batas bawah latency yang dirasakan user.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from email import policy as email_policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+STEPS = ['open', 'upload', 'scan', 'edit', 'save']
+DEFAULT_LEVELS = "1,2,4,8"
+THROUGHPUT_GAIN_MIN = 0.1  # level berikutnya dianggap saturasi jika throughput naik < 10%
+
+
+# ==========================================
+# Stand-in backend
+# ==========================================
+
+def fake_ocr_content(item_count, seed):
+    """Isi respons OCR format standar (verbose) dengan `item_count` item"""
+    rng = random.Random(seed)
+    items = []
+    for index in range(item_count):
+        qty = rng.choice([1, 2, 3, 0.5])
+        price = rng.randrange(2, 80) * 1000
+        items.append({
+            'nama_barang': f"Barang {index + 1}",
+            'qty': qty,
+            'unit': rng.choice(['pcs', 'kg', 'liter']),
+            'harga_satuan': price,
+            'total_harga': int(qty * price),
+            'kategori_transaksi': rng.choice(['Bama', 'Non Bama']),
+            'confidence': {field: rng.randrange(65, 101) for field in (
+                'nama_barang', 'qty', 'unit', 'harga_satuan', 'total_harga', 'kategori_transaksi'
+            )},
+        })
+    return {
+        'metadata': {
+            'tanggal': "2025-11-09", 'nama_toko': "Toko Uji Beban", 'nomor_rekening': None,
+            'nama_bank': None, 'pemilik_rekening': None, 'jenis_pembayaran': "Cash",
+            'confidence': {'tanggal': 95, 'nama_toko': 95, 'jenis_pembayaran': 90},
+        },
+        'items': items,
+    }
+
+
+def fake_completion(item_count, seed):
+    """Body respons chat completions dengan isi `fake_ocr_content`"""
+    content = json.dumps(fake_ocr_content(item_count, seed))
+    return {
+        'id': f"chatcmpl-load-{seed}",
+        'object': "chat.completion",
+        'created': int(time.time()),
+        'model': "gpt-4o-mini",
+        'choices': [{
+            'index': 0,
+            'finish_reason': "stop",
+            'message': {'role': "assistant", 'content': content},
+        }],
+        'usage': {'prompt_tokens': 1100, 'completion_tokens': len(content) // 4,
+                  'total_tokens': 1100 + len(content) // 4},
+    }
+
+
+class FakeOCRServer:
+    """Server lokal yang meniru endpoint chat completions (satu thread per request, seperti gateway)"""
+
+    def __init__(self, latency=2.0, jitter=0.25, items=15):
+        self.latency = latency
+        self.jitter = jitter
+        self.items = items
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                with server._lock:
+                    server.requests += 1
+                    seed = server.requests
+                time.sleep(max(0.0, random.gauss(server.latency, server.latency * server.jitter)))
+                body = json.dumps(fake_completion(server.items, seed)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, name="fake-ocr", daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeBatchServer:
+    """
+    Server lokal yang meniru Batch API (`/files` + `/batches`) untuk mode bulk offline.
+
+    Batch dijawab saat dibuat: setiap baris input mendapat respons chat
+    completions palsu (isi sama seperti FakeOCRServer). Status batch
+    `in_progress` sampai `latency` detik berlalu, lalu `completed` dengan file
+    output, dan file error untuk setiap request ke-`error_every` (0 = tanpa error).
+    """
+
+    def __init__(self, latency=1.0, items=15, error_every=0):
+        self.latency = latency
+        self.items = items
+        self.error_every = error_every
+        self.files = {}     # id → {'bytes', 'filename', 'purpose'}
+        self.batches = {}   # id → batch (output/error file dibuka saat selesai)
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length)
+                parts = self.path.rstrip('/').split('/')
+                if parts[-1] == 'files':
+                    self.reply(server.upload(self.headers.get('Content-Type', ''), body))
+                elif parts[-1] == 'batches':
+                    self.reply(server.create_batch(json.loads(body)))
+                elif parts[-1] == 'cancel' and parts[-3] == 'batches':
+                    self.reply(server.cancel_batch(parts[-2]))
+                else:
+                    self.reply(None)
+
+            def do_GET(self):
+                parts = self.path.rstrip('/').split('/')
+                if parts[-1] == 'content' and parts[-3] == 'files':
+                    entry = server.files.get(parts[-2])
+                    self.reply(entry and entry['bytes'], content_type='application/octet-stream')
+                elif parts[-2] == 'files':
+                    self.reply(server.file_object(parts[-1]))
+                elif parts[-2] == 'batches':
+                    self.reply(server.batch_object(parts[-1]))
+                else:
+                    self.reply(None)
+
+            def reply(self, payload, content_type='application/json'):
+                if payload is None:
+                    status, payload = 404, {'error': {'message': f"Tidak ditemukan: {self.path}", 'type': "invalid_request_error"}}
+                else:
+                    status = 200
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type if status == 200 else 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, name="fake-batch", daemon=True).start()
+
+    def _add_file(self, data, filename, purpose):
+        file_id = f"file-{next(self._ids)}"
+        self.files[file_id] = {'bytes': data, 'filename': filename, 'purpose': purpose, 'created_at': int(time.time())}
+        return file_id
+
+    def file_object(self, file_id):
+        entry = self.files.get(file_id)
+        if entry is None:
+            return None
+        return {
+            'id': file_id, 'object': "file", 'bytes': len(entry['bytes']), 'created_at': entry['created_at'],
+            'filename': entry['filename'], 'purpose': entry['purpose'], 'status': "processed",
+        }
+
+    def upload(self, content_type, body):
+        # multipart/form-data dari client OpenAI: field `file` & `purpose`
+        message = BytesParser(policy=email_policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+        )
+        fields = {}
+        for part in message.iter_parts():
+            fields[part.get_param('name', header='content-disposition')] = part
+        if 'file' not in fields:
+            return None
+        purpose = fields['purpose'].get_payload(decode=True).decode('utf-8') if 'purpose' in fields else "batch"
+        with self._lock:
+            file_id = self._add_file(fields['file'].get_payload(decode=True), fields['file'].get_filename(), purpose)
+        return self.file_object(file_id)
+
+    def create_batch(self, request):
+        entry = self.files.get(request.get('input_file_id'))
+        if entry is None:
+            return None
+        outputs, errors = [], []
+        with self._lock:
+            for line in entry['bytes'].decode('utf-8').splitlines():
+                if not line.strip():
+                    continue
+                self.requests += 1
+                seed = self.requests
+                custom_id = json.loads(line)['custom_id']
+                if self.error_every and seed % self.error_every == 0:
+                    errors.append({'id': f"batch_req_{seed}", 'custom_id': custom_id, 'response': None,
+                                   'error': {'code': "server_error", 'message': "Stand-in: request gagal"}})
+                else:
+                    outputs.append({'id': f"batch_req_{seed}", 'custom_id': custom_id, 'error': None, 'response': {
+                        'status_code': 200, 'request_id': f"req-{seed}", 'body': fake_completion(self.items, seed),
+                    }})
+            batch_id = f"batch_{next(self._ids)}"
+
+            def jsonl(records, name):
+                if not records:
+                    return None
+                data = "".join(json.dumps(record) + "\n" for record in records).encode('utf-8')
+                return self._add_file(data, f"{batch_id}_{name}.jsonl", "batch_output")
+
+            self.batches[batch_id] = {
+                'id': batch_id, 'object': "batch", 'endpoint': request.get('endpoint'), 'errors': None,
+                'input_file_id': request['input_file_id'], 'completion_window': request.get('completion_window'),
+                'status': "in_progress", 'output_file_id': None, 'error_file_id': None,
+                'created_at': int(time.time()), 'metadata': request.get('metadata'),
+                'request_counts': {'total': len(outputs) + len(errors), 'completed': len(outputs), 'failed': len(errors)},
+                '_ready_at': time.monotonic() + self.latency,
+                '_output_file_id': jsonl(outputs, "output"),
+                '_error_file_id': jsonl(errors, "error"),
+            }
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch['status'] == "in_progress" and time.monotonic() >= batch['_ready_at']:
+                batch.update(status="completed", completed_at=int(time.time()),
+                             output_file_id=batch['_output_file_id'], error_file_id=batch['_error_file_id'])
+            return {key: value for key, value in batch.items() if not key.startswith('_')}
+
+    def cancel_batch(self, batch_id):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return None
+            if batch['status'] == "in_progress":
+                batch.update(status="cancelled", cancelled_at=int(time.time()))
+        return self.batch_object(batch_id)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.rows = []
+
+    def append_row(self, row):
+        return self.append_rows([row])
+
+    def append_rows(self, rows):
+        time.sleep(self.spreadsheet.latency)
+        with self.spreadsheet.lock:
+            start = len(self.rows) + 1
+            self.rows.extend(rows)
+            end = len(self.rows)
+        return {'updates': {'updatedRange': f"'{self.title}'!A{start}:L{end}"}}
+
+    def col_values(self, column):
+        with self.spreadsheet.lock:
+            return [row[column - 1] for row in self.rows if len(row) >= column]
+
+
+class FakeSpreadsheet:
+    """Spreadsheet di memory dengan API yang dipakai `result_store.WorksheetPartitions`"""
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self._worksheets = {}
+
+    def worksheets(self):
+        with self.lock:
+            return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        with self.lock:
+            return self._worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        with self.lock:
+            return self._worksheets.setdefault(title, FakeWorksheet(self, title))
+
+    @property
+    def row_count(self):
+        with self.lock:
+            return sum(len(worksheet.rows) for worksheet in self._worksheets.values())
+
+
+def install_fake_sheets(spreadsheet):
+    """Ganti otorisasi gspread / service account dengan spreadsheet di memory"""
+    import gspread
+    from oauth2client import service_account
+
+    class FakeClient:
+        def open(self, name):
+            return spreadsheet
+
+    class FakeCredentials:
+        @classmethod
+        def from_json_keyfile_name(cls, *args, **kwargs):
+            return cls()
+
+    gspread.authorize = lambda creds: FakeClient()
+    service_account.ServiceAccountCredentials = FakeCredentials
+
+
+def receipt_image(seed, lines=15):
+    """Foto nota sintetis (JPEG), berbeda per seed supaya tidak kena cache / single-flight"""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new('RGB', (900, 1300), (70, 70, 70))
+    paper = Image.new('RGB', (600, 1100), (250, 250, 245))
+    draw = ImageDraw.Draw(paper)
+    draw.text((40, 30), f"TOKO UJI BEBAN #{seed}", fill=(0, 0, 0))
+    for index in range(lines):
+        draw.text((40, 90 + index * 60), f"Barang {index + 1}  x{rng.randrange(1, 5)}", fill=(0, 0, 0))
+        draw.text((420, 90 + index * 60), f"{rng.randrange(2, 80)}.000", fill=(0, 0, 0))
+    image.paste(paper, (150, 100))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+# ==========================================
+# Session & pengukuran
+# ==========================================
+
+def _editor_edit_widget(node, edits):
+    """Widget pengganti `st.data_editor` di tree AppTest yang mengirim perubahan cell"""
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    from streamlit.testing.v1.element_tree import Widget
+
+    class DataEditorEdit(Widget):
+        def __init__(self):
+            self.proto = node.proto
+            self.root = node.root
+            self.type = "data_editor"
+            self.id = node.proto.id
+            self.key = None
+            self._value = edits
+
+        @property
+        def value(self):
+            return self._value
+
+        @property
+        def _widget_state(self):
+            state = WidgetState()
+            state.id = self.id
+            state.string_value = json.dumps(self._value)
+            return state
+
+    return DataEditorEdit()
+
+
+def edit_result_cell(at, row, column, value):
+    """Set satu cell di editor hasil (AppTest belum bisa berinteraksi dengan data_editor)"""
+    from streamlit.testing.v1.element_tree import Block, Dataframe
+
+    edits = {'edited_rows': {str(row): {column: value}}, 'added_rows': [], 'deleted_rows': []}
+
+    def swap(block):
+        for index, child in block.children.items():
+            if isinstance(child, Dataframe) and 'result_editor_' in child.proto.id:
+                block.children[index] = _editor_edit_widget(child, edits)
+                return True
+            if isinstance(child, Block) and swap(child):
+                return True
+        return False
+
+    if not swap(at._tree):
+        raise RuntimeError("Editor hasil tidak ditemukan")
+
+
+def share_app_test_runtime():
+    """
+    Satu Runtime untuk semua session, seperti server Streamlit sungguhan.
+
+    `AppTest` memasang Runtime tiruan global di awal setiap run lalu
+    melepasnya di akhir, sehingga run paralel saling mencabut runtime.
+    Runtime bersama dipasang sekali, dan AppTest diarahkan menulis ke
+    subclass yang tidak dibaca siapa pun.
+    """
+    from unittest.mock import MagicMock
+    from streamlit import config, logger
+    from streamlit.testing.v1 import app_test, local_script_runner, util
+
+    # Peringatan deprecation per widget membanjiri output di setiap rerun
+    logger.set_log_level("error")
+
+    runtime_class = app_test.Runtime
+    shared = MagicMock(spec=runtime_class)
+    shared.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    shared.dataframe_source_mgr = app_test.DataframeSourceManager()
+    shared.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    components = app_test.BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    shared.bidi_component_registry = components
+    runtime_class._instance = shared
+    app_test.Runtime = type("LoadTestRuntime", (runtime_class,), {})
+    # Bytecode app.py juga dipakai bersama (AppTest meng-compile ulang di setiap run, dan
+    # compile paralel di thread berbeda bisa gagal di CPython 3.11)
+    scripts = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: scripts
+    # Opsi config "global.appTest" di-patch per run (patch.object pada config.get_option); run
+    # paralel saling memulihkan patch-nya, jadi dipasang sekali untuk seluruh proses
+    config.get_option = util.build_mock_config_get_option({"global.appTest": True, "logger.level": "error"})
+    app_test.patch_config_options = lambda overrides: nullcontext()
+
+
+def _button(at, label):
+    for button in at.button:
+        if button.label == label:
+            return button
+    raise RuntimeError(f"Tombol tidak ditemukan: {label}")
+
+
+def _check(at, step):
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].message}")
+    errors = [element.value for element in at.error]
+    if errors:
+        raise RuntimeError(f"{step}: {errors[0]}")
+
+
+def run_session(session_id, args, start_barrier=None):
+    """Satu session kasir; returns dict {'latency': {langkah: [detik]}, 'error': str atau None}"""
+    from streamlit.testing.v1 import AppTest
+
+    latency = {step: [] for step in STEPS}
+    record = {'session': session_id, 'latency': latency, 'error': None}
+
+    def timed(step, action):
+        started = time.perf_counter()
+        action()
+        latency[step].append(time.perf_counter() - started)
+        _check(at, step)
+
+    at = AppTest.from_file(args.app, default_timeout=args.timeout)
+    if start_barrier is not None:
+        start_barrier.wait()
+    try:
+        timed('open', at.run)
+        image = receipt_image(f"{args.run_id}-{session_id}", args.items)
+        at.sidebar.file_uploader[0].set_value((f"nota-{session_id}.jpg", image, "image/jpeg"))
+        timed('upload', at.run)
+        _button(at, "🔍 Scan Nota dengan AI").click()
+        timed('scan', at.run)
+        if at.session_state['ocr_result_df'] is None:
+            raise RuntimeError("scan: tidak ada hasil")
+        for edit in range(args.edits):
+            edit_result_cell(at, edit % args.items, 'qty', 2 + edit)
+            timed('edit', at.run)
+        _button(at, "💾 Simpan Data").click()
+        timed('save', at.run)
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+
+def run_bulk(args):
+    """
+    Alur mode bulk offline end-to-end lewat stand-in Batch API:
+    upload → Scan Semua (bulk: siapkan & kirim) → Cek status batch (sampai
+    tidak ada yang diproses) → Muat hasil ke editor → Simpan.
+
+    Returns:
+        dict: {'latency': {langkah: detik}, 'polls', 'rows', 'error'}
+    """
+    from streamlit.testing.v1 import AppTest
+
+    record = {'latency': {}, 'polls': 0, 'rows': 0, 'error': None}
+
+    def timed(step, action):
+        started = time.perf_counter()
+        action()
+        record['latency'][step] = record['latency'].get(step, 0.0) + time.perf_counter() - started
+        _check(at, step)
+
+    at = AppTest.from_file(args.app, default_timeout=args.timeout)
+    try:
+        timed('open', at.run)
+        files = [
+            (f"nota-bulk-{index}.jpg", receipt_image(f"{args.run_id}-bulk-{index}", args.items), "image/jpeg")
+            for index in range(args.bulk)
+        ]
+        at.sidebar.file_uploader[0].set_value(files)
+        timed('upload', at.run)
+        next(checkbox for checkbox in at.checkbox if checkbox.label.startswith("🐢")).check()
+        _button(at, "🚀 Scan Semua").click()
+        timed('submit', at.run)
+
+        deadline = time.monotonic() + args.timeout
+        while any(button.label == "🔄 Cek status batch" for button in at.button):
+            if time.monotonic() > deadline:
+                raise RuntimeError("poll: batch tidak selesai")
+            time.sleep(args.batch_latency)
+            _button(at, "🔄 Cek status batch").click()
+            timed('poll', at.run)
+            record['polls'] += 1
+
+        _button(at, "📥 Muat hasil ke editor").click()
+        timed('load', at.run)
+        df = at.session_state['ocr_result_df']
+        record['rows'] = 0 if df is None else len(df)
+        if not record['rows']:
+            raise RuntimeError("load: tidak ada hasil")
+        _button(at, "💾 Simpan Data").click()
+        timed('save', at.run)
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+
+class ResourceSampler:
+    """CPU proses (user + system) dan RSS puncak selama satu level konkurensi"""
+
+    interval = 0.05
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self.peak_rss = 0
+        self.base_rss = 0
+        self.cpu_seconds = 0.0
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # Non-Linux: puncak seumur proses (ru_maxrss dalam KB di Linux, byte di macOS)
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    @staticmethod
+    def cpu():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    def __enter__(self):
+        self.base_rss = self.peak_rss = self.rss()
+        self._cpu_started = self.cpu()
+        self._thread = threading.Thread(target=self._sample, name="load-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.cpu_seconds = self.cpu() - self._cpu_started
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.rss())
+
+
+def percentile(values, q):
+    """Persentil `q` (0-100) dengan interpolasi linear, None jika kosong"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_level(sessions, args):
+    """Jalankan `sessions` session bersamaan, kembalikan ringkasan level ini"""
+    records = [None] * sessions
+    barrier = threading.Barrier(sessions)
+
+    def worker(index):
+        records[index] = run_session(index + 1, args, barrier)
+
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(index,), name=f"session-{index + 1}") for index in range(sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+    completed = [record for record in records if record['error'] is None]
+    steps = {}
+    for step in STEPS:
+        values = [value for record in records for value in record['latency'][step]]
+        steps[step] = {
+            'p50': percentile(values, 50), 'p95': percentile(values, 95), 'max': max(values) if values else None,
+        }
+    interactions = [value for record in records for step in STEPS for value in record['latency'][step]]
+    return {
+        'sessions': sessions,
+        'completed': len(completed),
+        'errors': [f"session {record['session']}: {record['error']}" for record in records if record['error']],
+        'wall_s': wall,
+        'throughput_per_min': len(completed) / wall * 60 if wall else 0.0,
+        'p95_s': percentile(interactions, 95),
+        'steps': steps,
+        'cpu_s_per_session': sampler.cpu_seconds / sessions,
+        'cpu_utilization': sampler.cpu_seconds / wall if wall else 0.0,
+        'rss_mb': sampler.peak_rss / (1024 * 1024),
+        'rss_mb_per_session': max(0, sampler.peak_rss - sampler.base_rss) / (1024 * 1024) / sessions,
+    }
+
+
+def saturation_point(levels, slo):
+    """
+    Level konkurensi terbesar yang masih sehat: semua session selesai, p95 ≤ SLO,
+    dan throughput masih naik berarti dibanding level sebelumnya.
+    """
+    best = None
+    previous = None
+    for level in levels:
+        if level['errors'] or (slo and level['p95_s'] is not None and level['p95_s'] > slo):
+            break
+        if previous is not None and level['throughput_per_min'] < previous['throughput_per_min'] * (1 + THROUGHPUT_GAIN_MIN):
+            break
+        best = previous = level
+    return best['sessions'] if best else None
+
+
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:,.0f}"
+
+
+def format_report(levels, saturation, slo):
+    lines = []
+    header = f"{'sesi':>5} {'selesai':>8} {'sesi/mnt':>9} {'p95 ms':>8} {'CPU s/sesi':>11} {'CPU %':>6} {'RSS MB':>7} {'MB/sesi':>8}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    for level in levels:
+        lines.append(
+            f"{level['sessions']:>5} {level['completed']:>8} {level['throughput_per_min']:>9.1f} "
+            f"{_ms(level['p95_s']):>8} {level['cpu_s_per_session']:>11.2f} {level['cpu_utilization']:>6.0%} "
+            f"{level['rss_mb']:>7.0f} {level['rss_mb_per_session']:>8.1f}"
+        )
+    lines.append("")
+    lines.append("Latency per langkah (p50 / p95 ms):")
+    for level in levels:
+        parts = [f"{step} {_ms(level['steps'][step]['p50'])}/{_ms(level['steps'][step]['p95'])}" for step in STEPS]
+        lines.append(f"  {level['sessions']:>3} sesi: " + " · ".join(parts))
+    for level in levels:
+        for error in level['errors'][:3]:
+            lines.append(f"  ❌ [{level['sessions']} sesi] {error}")
+    lines.append("")
+    if saturation is None:
+        lines.append("Titik saturasi: level terkecil sudah melewati batas (cek error / SLO)")
+    else:
+        lines.append(f"Titik saturasi: {saturation} sesi bersamaan per replica"
+                     + (f" (p95 ≤ {slo:g} dtk)" if slo else ""))
+    return "\n".join(lines)
+
+
+def configure_environment(args, work_dir, ocr_url, batch_url=None):
+    """Konfigurasi app untuk load test; harus dipanggil sebelum nota_pipeline di-import"""
+    credentials = os.path.join(work_dir, "credentials.json")
+    with open(credentials, "w") as f:
+        json.dump({'type': "service_account"}, f)
+    os.environ.update({
+        'OPENAI_API_KEY': "sk-load-test",
+        'OPENAI_BASE_URL': ocr_url,
+        'OCR_ENDPOINTS': "",
+        'OCR_CACHE_URL': "none",
+        'GOOGLE_CREDENTIALS_FILE': credentials,
+        'RESULT_SINKS': args.sinks,
+        'LOCAL_DB_PATH': os.path.join(work_dir, "nota.db"),
+        'PARQUET_DIR': os.path.join(work_dir, "parquet"),
+        'BULK_DIR': os.path.join(work_dir, "bulk"),
+        'BULK_BATCH_BASE_URL': batch_url or "",
+        'STARTUP_PROFILE_LOG': "",
+        'PREFETCH_OCR': "false",
+        'METRICS_FILE': "",
+        'METRICS_PORT': "0",
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test session Streamlit bersamaan dengan OCR & Sheets palsu")
+    parser.add_argument("--sessions", default=DEFAULT_LEVELS, help="Level konkurensi, dipisah koma (default 1,2,4,8)")
+    parser.add_argument("--ocr-latency", type=float, default=2.0, help="Latency rata-rata OCR palsu (detik)")
+    parser.add_argument("--sheets-latency", type=float, default=0.5, help="Latency append Google Sheets palsu (detik)")
+    parser.add_argument("--items", type=int, default=15, help="Jumlah item per nota")
+    parser.add_argument("--edits", type=int, default=3, help="Jumlah edit cell per session")
+    parser.add_argument("--sinks", default="gsheet,sqlite", help="Sink yang dipakai saat simpan")
+    parser.add_argument("--slo", type=float, default=10.0, help="Batas p95 latency per interaksi (detik, 0 = tanpa batas)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Batas waktu satu rerun (detik)")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    parser.add_argument("--json", dest="json_path", help="Simpan hasil lengkap ke file JSON")
+    parser.add_argument("--bulk", type=int, default=0,
+                        help="Uji mode bulk offline end-to-end dengan N file (tanpa level konkurensi)")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Lama batch palsu sampai selesai (detik)")
+    parser.add_argument("--batch-error-every", type=int, default=0,
+                        help="Setiap request ke-N di batch palsu gagal (0 = tidak ada)")
+    args = parser.parse_args(argv)
+    levels = [int(value) for value in args.sessions.split(',') if value.strip()]
+
+    ocr_server = FakeOCRServer(latency=args.ocr_latency, items=args.items)
+    batch_server = FakeBatchServer(latency=args.batch_latency, items=args.items, error_every=args.batch_error_every)
+    spreadsheet = FakeSpreadsheet(latency=args.sheets_latency)
+    with tempfile.TemporaryDirectory(prefix="nota-load-") as work_dir:
+        configure_environment(args, work_dir, ocr_server.base_url, batch_server.base_url)
+        install_fake_sheets(spreadsheet)
+        share_app_test_runtime()
+        if args.bulk:
+            args.run_id = "bulk"
+            record = run_bulk(args)
+            ocr_server.close()
+            batch_server.close()
+            steps = " · ".join(f"{step} {_ms(seconds)}" for step, seconds in record['latency'].items())
+            print(f"Bulk {args.bulk} file: {steps} ms · {record['polls']} kali cek status · {record['rows']} baris")
+            print(f"Batch palsu: {len(batch_server.batches)} batch, {batch_server.requests} request · "
+                  f"OCR palsu: {ocr_server.requests} request · Sheets palsu: {spreadsheet.row_count} baris",
+                  file=sys.stderr)
+            if record['error']:
+                print(f"❌ {record['error']}")
+            return 1 if record['error'] else 0
+        # Satu session pemanasan: import & cache_resource tidak ikut terhitung di level pertama
+        args.run_id = "warm-up"
+        run_session(0, args)
+
+        results = []
+        for index, sessions in enumerate(levels):
+            args.run_id = f"level-{index}"
+            print(f"⏳ {sessions} session bersamaan...", file=sys.stderr)
+            results.append(run_level(sessions, args))
+
+    ocr_server.close()
+    batch_server.close()
+    saturation = saturation_point(results, args.slo)
+    print(format_report(results, saturation, args.slo))
+    print(f"\nOCR palsu: {ocr_server.requests} request · Sheets palsu: {spreadsheet.row_count} baris", file=sys.stderr)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({'levels': results, 'saturation': saturation, 'config': vars(args)}, f, indent=2)
+    return 0 if saturation is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1214 @@
+"""
+Pipeline ekstraksi nota tanpa UI: konfigurasi OCR, request ke model vision,
+cache & single-flight, PDF multi-halaman, validasi dan baris hasil.
+
+Dipakai bersama oleh aplikasi Streamlit (`app.py`) dan HTTP ingestion API
+(`ingest_api.py`). Semua fungsi di sini melempar exception (tidak memanggil
+`st.error` dkk), pelaporan error ke user dilakukan oleh pemanggil.
+Singleton proses memakai `st.cache_resource`, yang juga berjalan di luar
+`streamlit run` (mis. di bawah uvicorn).
+"""
+
+import base64
+import contextvars
+import copy
+import functools
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+import cpu_pool
+import detail_planner
+import endpoint_pool
+import item_catalog
+import ocr_cache
+import ocr_cassette
+import pipeline_metrics
+import receipt_tiling
+import result_editor
+import scheduler
+import single_flight
+import wire_format
+
+# Load environment variables dari .env file (untuk local development)
+load_dotenv()
+
+# ==========================================
+# 1. KONFIGURASI
+# ==========================================
+
+def get_config(name, default=None):
+    """Ambil konfigurasi opsional: Streamlit secrets dulu, lalu environment variable"""
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except (FileNotFoundError, KeyError, AttributeError):
+        pass
+    return os.getenv(name, default)
+
+# Secrets/env sama dengan aplikasi Streamlit
+OPENAI_API_KEY = get_config("OPENAI_API_KEY")
+OPENAI_BASE_URL = get_config("OPENAI_BASE_URL", "https://ai.sumopod.com")
+
+LOCAL_DB_PATH = get_config("LOCAL_DB_PATH", "data/nota.db")
+# Katalog barang lokal untuk normalisasi nama & kategori
+CATALOG_MATCH_THRESHOLD = float(get_config("CATALOG_MATCH_THRESHOLD", item_catalog.DEFAULT_THRESHOLD))
+
+# PDF multi-halaman: jumlah halaman yang dirender & di-OCR bersamaan
+MAX_PARALLEL_PAGES = int(get_config("MAX_PARALLEL_PAGES", 8))
+PDF_DPI = 300  # DPI tinggi untuk kualitas OCR lebih baik
+
+# Cache OCR bersama antar replica: sqlite:///path/file.db, redis://host:6379/0, atau "none"
+OCR_CACHE_URL = get_config("OCR_CACHE_URL", "sqlite:///data/ocr_cache.db")
+OCR_CACHE_TTL_HOURS = float(get_config("OCR_CACHE_TTL_HOURS", ocr_cache.DEFAULT_TTL_HOURS))
+OCR_CACHE_MAX_MB = float(get_config("OCR_CACHE_MAX_MB", ocr_cache.DEFAULT_MAX_MB))
+# Struk panjang: gambar dengan tinggi/lebar ≥ nilai ini dipotong jadi beberapa tile (0 = nonaktif)
+TILE_MIN_ASPECT = float(get_config("TILE_MIN_ASPECT", receipt_tiling.DEFAULT_MIN_ASPECT))
+# Foto nota: crop ke kertas nota, luruskan & naikkan kontras sebelum OCR (lihat receipt_crop.py)
+RECEIPT_CROP = str(get_config("RECEIPT_CROP", "true")).lower() in ("1", "true", "yes")
+# Detail gambar untuk OCR: auto (low jika cukup, escalate ke high), low, atau high
+IMAGE_DETAIL = str(get_config("IMAGE_DETAIL", "auto")).lower()
+PROMPT_VERSION = "v1"  # Naikkan setiap kali prompt di call_vision_api diubah (cache lama tidak terpakai)
+# Format output OCR: compact (baris posisional, hemat token output) atau verbose (JSON lengkap)
+OCR_OUTPUT_FORMAT = str(get_config("OCR_OUTPUT_FORMAT", wire_format.COMPACT)).lower()
+if OCR_OUTPUT_FORMAT not in wire_format.FORMATS:
+    OCR_OUTPUT_FORMAT = wire_format.COMPACT
+# Structured outputs (JSON schema) untuk format compact; otomatis turun ke JSON mode jika endpoint menolak
+OCR_STRUCTURED_OUTPUTS = str(get_config("OCR_STRUCTURED_OUTPUTS", "true")).lower() in ("1", "true", "yes")
+# Metrik per tahap (format Prometheus): file teks yang ditulis berkala dan/atau port HTTP lokal (0 = nonaktif)
+METRICS_FILE = get_config("METRICS_FILE") or None
+METRICS_PORT = int(get_config("METRICS_PORT", 0))
+METRICS_INTERVAL_SECONDS = float(get_config("METRICS_INTERVAL_SECONDS", 15))
+# Process pool untuk render PDF, crop & tiling: jumlah worker (0 = jalan di proses Streamlit),
+# batas tugas antre/berjalan (back-pressure), dan gambar di bawah ukuran ini tetap diproses langsung
+CPU_POOL_WORKERS = int(get_config("CPU_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+CPU_POOL_MAX_PENDING = int(get_config("CPU_POOL_MAX_PENDING", 0)) or None
+CPU_POOL_MIN_KB = float(get_config("CPU_POOL_MIN_KB", cpu_pool.DEFAULT_MIN_KB))
+# Scheduler prioritas request OCR: total request berjalan per proses, dan batas kumulatif kelas
+# batch (+ backfill) / backfill; sisanya selalu tersedia untuk scan interaktif (lihat scheduler.py)
+OCR_MAX_IN_FLIGHT = int(get_config("OCR_MAX_IN_FLIGHT", 16))
+OCR_BATCH_MAX_IN_FLIGHT = int(get_config("OCR_BATCH_MAX_IN_FLIGHT", 0)) or None
+OCR_BACKFILL_MAX_IN_FLIGHT = int(get_config("OCR_BACKFILL_MAX_IN_FLIGHT", 0)) or None
+# Rekam/putar ulang traffic OCR (off, record, replay) untuk uji performa offline, lihat ocr_cassette.py
+OCR_CASSETTE_MODE = str(get_config("OCR_CASSETTE_MODE", ocr_cassette.OFF)).lower()
+if OCR_CASSETTE_MODE not in ocr_cassette.MODES:
+    OCR_CASSETTE_MODE = ocr_cassette.OFF
+OCR_CASSETTE_PATH = get_config("OCR_CASSETTE_PATH", "data/cassettes/ocr.jsonl")
+OCR_CASSETTE_TIMING = float(get_config("OCR_CASSETTE_TIMING", 1.0))  # pengali latency saat replay (0 = tanpa jeda)
+OCR_CASSETTE_STORE_IMAGES = str(get_config("OCR_CASSETTE_STORE_IMAGES", "false")).lower() in ("1", "true", "yes")
+OCR_CASSETTE_LOG = get_config("OCR_CASSETTE_LOG") or None  # hasil replay untuk `python ocr_cassette.py diff`
+
+def prompt_version():
+    """Versi prompt untuk kunci cache: format output berbeda = prompt berbeda"""
+    if OCR_OUTPUT_FORMAT == wire_format.VERBOSE:
+        return PROMPT_VERSION
+    return f"{PROMPT_VERSION}-{OCR_OUTPUT_FORMAT}"
+
+# Beberapa endpoint OCR berbobot (JSON / array of tables), kosong = hanya OPENAI_BASE_URL
+# Konfigurasi yang tidak valid tidak menghentikan import; pesan error ditampilkan oleh pemanggil
+OCR_ENDPOINTS_ERROR = None
+try:
+    OCR_ENDPOINTS = endpoint_pool.parse_endpoints(get_config("OCR_ENDPOINTS"), default_api_key=OPENAI_API_KEY)
+except (TypeError, ValueError) as e:
+    OCR_ENDPOINTS_ERROR = str(e)
+    OCR_ENDPOINTS = []
+OCR_TIMEOUT_SECONDS = float(get_config("OCR_TIMEOUT_SECONDS", 90))
+
+# Client OpenAI dibuat per endpoint saat request pertama (lihat get_ocr_endpoints): import `openai`
+# memakan beberapa ratus ms dan tidak perlu ditanggung render pertama. Di sini cukup dicek
+# apakah API key tersedia; CLIENT_ERROR berisi alasannya jika belum.
+# Mode replay tidak memanggil API sama sekali, jadi tidak butuh API key
+CLIENT_READY = bool(
+    OPENAI_API_KEY or any(endpoint['api_key'] for endpoint in OCR_ENDPOINTS)
+    or OCR_CASSETTE_MODE == ocr_cassette.REPLAY
+)
+CLIENT_ERROR = None if CLIENT_READY else "API key belum diset (OPENAI_API_KEY atau api_key di OCR_ENDPOINTS)"
+
+# ==========================================
+# 2. OCR
+# ==========================================
+
+@st.cache_resource
+def get_item_catalog():
+    """Katalog barang dimuat sekali per proses dan dipakai bersama semua session"""
+    return item_catalog.ItemCatalog(LOCAL_DB_PATH, threshold=CATALOG_MATCH_THRESHOLD)
+
+@st.cache_resource
+def get_ocr_cache():
+    """Cache OCR bersama (SQLite/Redis) dibuka sekali per proses, None jika nonaktif"""
+    return ocr_cache.build_cache(OCR_CACHE_URL, OCR_CACHE_TTL_HOURS, OCR_CACHE_MAX_MB)
+
+@st.cache_resource
+def get_metrics_exporter():
+    """Exporter metrik dijalankan sekali per proses, None jika METRICS_FILE & METRICS_PORT kosong"""
+    if not METRICS_FILE and not METRICS_PORT:
+        return None
+    return pipeline_metrics.MetricsExporter(METRICS_FILE, METRICS_PORT, interval=METRICS_INTERVAL_SECONDS).start()
+
+@st.cache_resource
+def get_cpu_pool():
+    """Process pool pekerjaan CPU (worker dibuat saat tugas pertama), dipakai bersama semua session"""
+    return cpu_pool.CpuPool(CPU_POOL_WORKERS, CPU_POOL_MAX_PENDING, min_bytes=int(CPU_POOL_MIN_KB * 1024))
+
+@st.cache_resource
+def get_ocr_scheduler():
+    """Slot request OCR berprioritas (interaktif > batch > backfill), dipakai bersama semua session"""
+    return scheduler.PriorityScheduler(
+        OCR_MAX_IN_FLIGHT, OCR_BATCH_MAX_IN_FLIGHT, OCR_BACKFILL_MAX_IN_FLIGHT, name="ocr"
+    )
+
+@st.cache_resource
+def get_ocr_cassette():
+    """Cassette record/replay OCR dibuka sekali per proses, None jika OCR_CASSETTE_MODE=off"""
+    if OCR_CASSETTE_MODE == ocr_cassette.OFF:
+        return None
+    return ocr_cassette.Cassette(
+        OCR_CASSETTE_PATH, OCR_CASSETTE_MODE,
+        timing=OCR_CASSETTE_TIMING, store_images=OCR_CASSETTE_STORE_IMAGES, log_path=OCR_CASSETTE_LOG,
+    )
+
+def shared_cache():
+    """Cache OCR bersama, None jika tidak tersedia (salah konfigurasi) atau cassette sedang aktif"""
+    # Saat record/replay setiap gambar harus benar-benar lewat API/cassette, cache hit
+    # akan membuat rekaman bolong dan throughput replay terlihat lebih baik dari aslinya
+    if OCR_CASSETTE_MODE != ocr_cassette.OFF:
+        return None
+    # Cache bersifat opsional: salah konfigurasi tidak boleh menggagalkan OCR
+    try:
+        return get_ocr_cache()
+    except Exception:
+        return None
+
+# Prompt ekstraksi dibagi per bagian supaya instruksi yang sama dipakai untuk format
+# output standar (verbose) maupun ringkas (compact, lihat wire_format.py)
+PROMPT_HEADER = """
+    Analisa gambar nota/invoice ini dengan SANGAT TELITI. Ekstrak SEMUA informasi yang ada.
+    
+    ⚠️ PERHATIAN KHUSUS UNTUK TULISAN TANGAN:
+    - Nota ini kemungkinan TULISAN TANGAN yang sulit dibaca
+    - Baca SETIAP karakter dengan EKSTRA HATI-HATI
+    - Perhatikan konteks untuk memvalidasi pembacaan
+    - Jika ada coretan atau angka yang ambigu, lihat pola keseluruhan
+    - JANGAN tebak - jika tidak yakin, beri confidence rendah (<70)
+    
+"""
+
+PROMPT_VERBOSE_SCHEMA = """    Output WAJIB format JSON Object dengan struktur berikut:
+    
+    {
+      "metadata": {
+        "tanggal": "YYYY-MM-DD atau DD/MM/YYYY (tanggal transaksi di nota)",
+        "nama_toko": "Nama toko/merchant",
+        "nomor_rekening": "Nomor rekening toko (jika ada)",
+        "nama_bank": "Nama bank (jika ada, misal: BCA, Mandiri, BRI)",
+        "pemilik_rekening": "Nama pemilik rekening (jika ada)",
+        "jenis_pembayaran": "Cash atau Transfer",
+        "confidence": {
+          "tanggal": 0-100,
+          "nama_toko": 0-100,
+          "nomor_rekening": 0-100,
+          "nama_bank": 0-100,
+          "pemilik_rekening": 0-100,
+          "jenis_pembayaran": 0-100
+        }
+      },
+      "items": [
+        {
+          "nama_barang": "Nama produk/item",
+          "qty": 1.0,
+          "unit": "kg/pcs/liter/dll",
+          "harga_satuan": 10000,
+          "total_harga": 10000,
+          "kategori_transaksi": "Bama atau Non Bama",
+          "confidence": {
+            "nama_barang": 0-100,
+            "qty": 0-100,
+            "unit": 0-100,
+            "harga_satuan": 0-100,
+            "total_harga": 0-100,
+            "kategori_transaksi": 0-100
+          }
+        }
+      ]
+    }
+    
+"""
+
+PROMPT_INSTRUCTIONS = """    INSTRUKSI DETAIL:
+    
+    A. METADATA (Informasi Nota):
+    1. 'tanggal': Tanggal transaksi di nota (format: YYYY-MM-DD atau DD/MM/YYYY)
+       - PENTING: Cari di POJOK KIRI ATAS atau header nota
+       - Format bisa: DD-MM-YYYY, DD/MM/YYYY, YYYY-MM-DD
+       - Contoh: "09-11-2025" atau "09/11/2025" → "2025-11-09"
+       - JANGAN buat tanggal sendiri - HARUS dari nota
+       - Jika tidak ada, isi dengan null
+    
+    2. 'nama_toko': Nama toko/merchant
+       - Biasanya di header paling atas
+       - Jika tidak ada, isi dengan "Unknown"
+    
+    3. 'nomor_rekening': Nomor rekening toko (jika ada)
+       - Cari di footer atau header
+       - Jika tidak ada, isi dengan null
+    
+    4. 'nama_bank': Nama bank (BCA, Mandiri, BRI, BNI, dll)
+       - Jika tidak ada, isi dengan null
+    
+    5. 'pemilik_rekening': Nama pemilik rekening
+       - Jika tidak ada, isi dengan null
+    
+    6. 'jenis_pembayaran': "Cash" atau "Transfer"
+       - Jika ada tulisan "Transfer", "QRIS", "Debit", "Credit", "Bank" = "Transfer"
+       - Jika ada tulisan "Cash", "Tunai" = "Cash"
+       - Jika tidak jelas, coba tebak dari konteks (ada nomor rekening = Transfer)
+       - Default: "Cash"
+    
+    B. ITEMS (Daftar Barang):
+    Untuk setiap item barang:
+    
+    1. 'nama_barang': Nama produk/item (string)
+       - Baca SETIAP huruf dengan teliti
+       - Perhatikan spasi dan kapitalisasi
+       - Jangan singkat atau ubah nama
+    
+    2. 'qty': Jumlah/kuantitas barang (float)
+       - Integer (1, 2, 3, dst) atau desimal (0.5, 1.5, dst)
+       - Jika tertulis "1/2" = 0.5, "1/4" = 0.25
+       - Default: 1
+    
+    3. 'unit': Satuan barang (string)
+       - Contoh: "kg", "pcs", "liter", "gram", "box", "pack", "meter", dll
+       - Jika qty dalam bentuk pecahan (0.5), kemungkinan unit adalah "kg" atau "liter"
+       - Jika tidak ada, coba tebak dari nama barang atau isi "pcs"
+    
+    4. 'harga_satuan': Harga per unit (integer)
+       - PERHATIAN: "20" atau "20k" kemungkinan = 20.000
+       - Gunakan konteks total_harga untuk validasi
+    
+    5. 'total_harga': Total harga (qty × harga_satuan) (integer)
+       - PERHATIAN: "20" atau "20k" kemungkinan = 20.000
+    
+    6. 'kategori_transaksi': "Bama" atau "Non Bama"
+       - "Bama" = Bahan Makanan (beras, minyak, gula, sayur, buah, daging, ikan, telur, susu, dll)
+       - "Non Bama" = Bukan Bahan Makanan (sabun, shampo, tissue, alat tulis, elektronik, dll)
+       - Kategorikan berdasarkan nama barang
+    
+    7. 'confidence': Tingkat kepercayaan untuk setiap field (0-100)
+       - Berikan confidence rendah (<70) jika:
+         * Teks blur atau tidak jelas
+         * Tulisan tangan yang sulit dibaca
+         * Angka yang ambigu atau terpotong
+         * Harus melakukan asumsi/tebakan
+         * Format tidak standar
+    
+    TIPS OCR - PENTING UNTUK AKURASI:
+    
+    1. ANGKA yang sering tertukar:
+       - "0" (nol) vs "O" (huruf O) → Lihat konteks (di angka = 0, di kata = O)
+       - "1" (satu) vs "l" (huruf L kecil) vs "I" (huruf i besar) → Lihat konteks
+       - "5" (lima) vs "S" (huruf S) → Di angka = 5, di kata = S
+       - "8" (delapan) vs "B" (huruf B) → Di angka = 8, di kata = B
+       - "6" (enam) vs "G" (huruf G) → Di angka = 6, di kata = G
+    
+    2. NAMA BARANG - Baca dengan teliti:
+       - "Beras Premium" BUKAN "Beras Premum" atau "Beras Premlum"
+       - "Minyak Goreng" BUKAN "Mlnyak Goreng" atau "Minyak Goreng"
+       - Perhatikan ejaan yang benar
+    
+    3. QUANTITY - Validasi dengan total:
+       - Jika qty=5, harga_satuan=10000, maka total_harga HARUS 50000
+       - Jika tidak match, kemungkinan qty atau harga salah baca
+    
+    4. HARGA - Perhatikan pemisah ribuan:
+       - "15.000" atau "15,000" atau "15000" = 15000
+       - "20k" atau "20rb" = 20000
+       - Jangan lupa hapus pemisah ribuan
+    
+    ATURAN KHUSUS HARGA:
+    - Jika harga tertulis "20", "25", "30" dll (angka kecil), cek apakah masuk akal
+    - Jika total_harga jauh lebih besar, kemungkinan harga dalam ribuan (20 = 20.000)
+    - Jika ada notasi "k" atau "rb", kalikan dengan 1000 (20k = 20000)
+    - Pastikan qty × harga_satuan = total_harga
+    - Format dengan titik/koma (15.000 atau 15,000) → 15000
+    
+    YANG DIABAIKAN:
+    - Subtotal, pajak (tax/PPN), diskon, total pembayaran akhir
+    - Informasi kasir, tanda tangan
+    
+"""
+
+PROMPT_VERBOSE_EXAMPLE = """    Contoh output:
+    {
+      "metadata": {
+        "tanggal": "2024-01-15",
+        "nama_toko": "Toko Sumber Rezeki",
+        "nomor_rekening": "1234567890",
+        "nama_bank": "BCA",
+        "pemilik_rekening": "Budi Santoso",
+        "jenis_pembayaran": "Transfer",
+        "confidence": {
+          "tanggal": 95,
+          "nama_toko": 100,
+          "nomor_rekening": 90,
+          "nama_bank": 95,
+          "pemilik_rekening": 85,
+          "jenis_pembayaran": 80
+        }
+      },
+      "items": [
+        {
+          "nama_barang": "Beras Premium",
+          "qty": 5,
+          "unit": "kg",
+          "harga_satuan": 15000,
+          "total_harga": 75000,
+          "kategori_transaksi": "Bama",
+          "confidence": {
+            "nama_barang": 95,
+            "qty": 100,
+            "unit": 90,
+            "harga_satuan": 90,
+            "total_harga": 90,
+            "kategori_transaksi": 100
+          }
+        },
+        {
+          "nama_barang": "Minyak Goreng",
+          "qty": 2,
+          "unit": "liter",
+          "harga_satuan": 25000,
+          "total_harga": 50000,
+          "kategori_transaksi": "Bama",
+          "confidence": {
+            "nama_barang": 100,
+            "qty": 100,
+            "unit": 95,
+            "harga_satuan": 95,
+            "total_harga": 95,
+            "kategori_transaksi": 100
+          }
+        }
+      ]
+    }
+    
+    Jika tidak ada item: {"metadata": {...}, "items": []}
+    """
+
+def build_prompt(output_format=wire_format.VERBOSE):
+    """Prompt ekstraksi untuk format output standar (verbose) atau ringkas (compact)"""
+    if output_format == wire_format.COMPACT:
+        return PROMPT_HEADER + wire_format.COMPACT_SCHEMA_TEXT + PROMPT_INSTRUCTIONS + wire_format.COMPACT_EXAMPLE_TEXT
+    return PROMPT_HEADER + PROMPT_VERBOSE_SCHEMA + PROMPT_INSTRUCTIONS + PROMPT_VERBOSE_EXAMPLE
+
+@st.cache_resource
+def get_structured_output_support():
+    """(base URL, model) → False jika endpoint menolak JSON schema (structured outputs)"""
+    return {}
+
+def build_ocr_request(image_bytes, mime_type, model="gpt-4o", detail="high", expected_items=None, structured=None):
+    """
+    Body request chat completions untuk OCR satu gambar (dipakai request
+    sinkron maupun baris JSONL mode bulk).
+    
+    Args:
+        expected_items: Perkiraan jumlah item untuk batas `max_tokens` (None = batas penuh)
+        structured: Paksa/nonaktifkan JSON schema; None = sesuai konfigurasi & dukungan endpoint
+    """
+    # Encode gambar ke base64
+    with pipeline_metrics.span("base64"):
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    
+    if structured is None:
+        structured = (
+            OCR_OUTPUT_FORMAT == wire_format.COMPACT and OCR_STRUCTURED_OUTPUTS
+            and get_structured_output_support().get((OPENAI_BASE_URL, model), True)
+        )
+    
+    return {
+        "model": model,  # Gunakan model yang dipilih user
+        "messages": [
+            {
+                "role": "system",
+                "content": """Anda adalah AI expert untuk OCR nota belanja Indonesia. 
+                Tugas Anda: Ekstrak data dengan SANGAT TELITI dan AKURAT.
+                
+                PENTING:
+                - Baca SETIAP karakter dengan hati-hati
+                - Jangan skip atau asumsikan data
+                - Jika ragu, beri confidence rendah
+                - Perhatikan konteks untuk validasi (misal: harga harus masuk akal)
+                """
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": build_prompt(OCR_OUTPUT_FORMAT)},
+                    {"type": "image_url", "image_url": {
+                        "url": f"data:{mime_type};base64,{base64_image}",
+                        "detail": detail  # low/high, dipilih oleh detail_planner (lihat ocr_adaptive)
+                    }}
+                ],
+            }
+        ],
+        "response_format": wire_format.response_format(OCR_OUTPUT_FORMAT, structured),
+        "temperature": 0,  # 0 untuk konsistensi maksimal
+        "max_tokens": wire_format.max_tokens(OCR_OUTPUT_FORMAT, expected_items),
+    }
+
+def parse_ocr_content(content):
+    """Isi pesan respons AI → dict format standar {"metadata": ..., "items": [...]}"""
+    with pipeline_metrics.span("json_parse"):
+        return wire_format.expand(json.loads(content))
+
+def is_endpoint_error(error):
+    """Error yang disebabkan endpoint (bukan isi request): perlu failover ke endpoint lain"""
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+    
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+def _openai_client(api_key, base_url):
+    from openai import OpenAI
+    
+    # Retry ditangani pool (pindah endpoint), bukan client
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=OCR_TIMEOUT_SECONDS, max_retries=0)
+
+@st.cache_resource
+def get_ocr_endpoints():
+    """
+    Pool endpoint OCR (load balancing + circuit breaker), dipakai bersama semua session.
+    
+    Tanpa OCR_ENDPOINTS, pool berisi satu endpoint dari OPENAI_BASE_URL.
+    """
+    configs = OCR_ENDPOINTS or [
+        {'name': 'default', 'base_url': OPENAI_BASE_URL, 'api_key': OPENAI_API_KEY, 'weight': 1.0}
+    ]
+    endpoints = [
+        endpoint_pool.Endpoint(
+            config['name'], config['base_url'],
+            weight=config['weight'],
+            client_factory=functools.partial(_openai_client, config['api_key'], config['base_url']),
+        )
+        for config in configs
+    ]
+    return endpoint_pool.EndpointPool(endpoints, is_endpoint_error)
+
+def call_vision_api(image_bytes, mime_type, model="gpt-4o", detail="high", expected_items=None):
+    """
+    Mengirim gambar ke OpenAI GPT-4o/mini dan mengembalikan hasil JSON (dict).
+    
+    Versi tanpa UI dari `process_image_with_gpt4o`: semua error dilempar sebagai
+    exception (tidak memanggil st.*), sehingga aman dipanggil dari worker thread.
+    
+    Dengan OCR_OUTPUT_FORMAT=compact, model diminta menulis format ringkas
+    (lihat wire_format.py) yang diubah kembali ke bentuk standar sebelum dikembalikan.
+    `max_tokens` dihitung dari `expected_items` (perkiraan jumlah item).
+    
+    Request dikirim lewat pool endpoint (lihat endpoint_pool.py): endpoint yang
+    lambat/gangguan dihindari dan request yang gagal dicoba di endpoint lain.
+    """
+    if not CLIENT_READY:
+        raise RuntimeError("OpenAI client belum diinisialisasi. Periksa API key Anda.")
+    
+    structured = OCR_OUTPUT_FORMAT == wire_format.COMPACT and OCR_STRUCTURED_OUTPUTS
+    request = build_ocr_request(image_bytes, mime_type, model, detail, expected_items, structured)
+    support = get_structured_output_support()
+    
+    cassette = get_ocr_cassette()
+    if cassette is not None and cassette.replaying:
+        with get_ocr_scheduler().slot():
+            return _replay_vision_api(cassette, image_bytes, model, detail)
+    
+    from openai import BadRequestError
+    
+    calls = []  # (endpoint, response) setiap request ke API, untuk rekaman cassette
+    
+    def create(endpoint, body):
+        # Jaringan + antrean + generate model: tidak bisa dipisah dari sisi client, token output
+        # (nota_ocr_tokens_total) dipakai untuk membandingkan porsi generate antar request
+        with pipeline_metrics.span("api_call", endpoint=endpoint.name, model=model):
+            response = endpoint.client.chat.completions.create(**body)
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            pipeline_metrics.count('ocr_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, model=model, kind='input')
+            pipeline_metrics.count('ocr_tokens_total', getattr(usage, 'completion_tokens', 0) or 0, model=model, kind='output')
+        calls.append((endpoint, response))
+        return response
+    
+    def complete(endpoint):
+        body = dict(request)
+        schema = structured and support.get((endpoint.base_url, model), True)
+        if not schema:
+            body["response_format"] = wire_format.response_format(OCR_OUTPUT_FORMAT, structured=False)
+        
+        try:
+            response = create(endpoint, body)
+        except BadRequestError:
+            if not schema:
+                raise
+            # Endpoint/proxy belum mendukung JSON schema: ingat, lalu pakai JSON mode biasa
+            support[(endpoint.base_url, model)] = False
+            body["response_format"] = wire_format.response_format(OCR_OUTPUT_FORMAT, structured=False)
+            response = create(endpoint, body)
+        
+        if response.choices[0].finish_reason == "length" and body["max_tokens"] < wire_format.MAX_OUTPUT_TOKENS:
+            # Item lebih banyak dari perkiraan sehingga JSON terpotong: ulang dengan batas penuh
+            body["max_tokens"] = wire_format.MAX_OUTPUT_TOKENS
+            response = create(endpoint, body)
+        return response
+    
+    if cassette is None:
+        # Giliran per kelas prioritas: scan interaktif tidak mengantre di belakang batch
+        with get_ocr_scheduler().slot():
+            response = get_ocr_endpoints().call(complete)
+        return parse_ocr_content(response.choices[0].message.content)
+    
+    key = ocr_cache.ocr_key(ocr_cache.content_hash(image_bytes), model, prompt_version(), detail)
+    metadata = {
+        'model': model,
+        'detail': detail,
+        'mime_type': mime_type,
+        'expected_items': expected_items,
+        'max_tokens': request['max_tokens'],
+        'response_format': request['response_format']['type'],
+        'output_format': OCR_OUTPUT_FORMAT,
+        'prompt_version': prompt_version(),
+    }
+    started = time.monotonic()
+    try:
+        with get_ocr_scheduler().slot():
+            response = get_ocr_endpoints().call(complete)
+    except Exception as e:
+        cassette.record(key, metadata, image_bytes, latency=time.monotonic() - started, error=e)
+        raise
+    latency = time.monotonic() - started
+    recorded = _cassette_response(response, calls)
+    try:
+        result = parse_ocr_content(recorded['content'])
+    except Exception:
+        # Respons yang gagal di-parse tetap direkam: bentuk respons aslinya yang ingin diuji ulang
+        cassette.record(key, metadata, image_bytes, recorded, latency)
+        raise
+    cassette.record(key, metadata, image_bytes, recorded, latency, result=result)
+    return result
+
+def _cassette_response(response, calls):
+    usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+    for _, call_response in calls:
+        call_usage = getattr(call_response, 'usage', None)
+        for field in usage:
+            usage[field] += getattr(call_usage, field, 0) or 0
+    return {
+        'content': response.choices[0].message.content,
+        'finish_reason': response.choices[0].finish_reason,
+        'usage': usage,
+        'endpoint': calls[-1][0].name if calls else None,
+        'api_calls': len(calls),
+    }
+
+def _replay_vision_api(cassette, image_bytes, model, detail):
+    """`call_vision_api` dari rekaman cassette: respons & timing asli, tanpa request ke API"""
+    key = ocr_cache.ocr_key(ocr_cache.content_hash(image_bytes), model, prompt_version(), detail)
+    started = time.monotonic()
+    with pipeline_metrics.span("api_call", endpoint="cassette", model=model):
+        entry = cassette.replay(key)
+    usage = entry['response'].get('usage') or {}
+    pipeline_metrics.count('ocr_tokens_total', usage.get('prompt_tokens') or 0, model=model, kind='input')
+    pipeline_metrics.count('ocr_tokens_total', usage.get('completion_tokens') or 0, model=model, kind='output')
+    result = parse_ocr_content(entry['response']['content'])
+    cassette.log_replay(entry, time.monotonic() - started, result)
+    return result
+
+@st.cache_resource
+def get_ocr_flights():
+    """Registry single-flight OCR, dipakai bersama semua session dalam proses ini"""
+    return single_flight.SingleFlight()
+
+def ocr_image(image_bytes, mime_type, model="gpt-4o", detail="high", expected_items=None):
+    """
+    `call_vision_api` dengan cache bersama dan single-flight.
+    
+    - Gambar yang sama (model & versi prompt sama) tidak di-OCR ulang, di replica manapun
+    - Request identik yang sedang berjalan (session lain / klik dobel) cukup ditunggu,
+      semua pemanggil menerima hasil (atau error) dari satu panggilan API
+    """
+    cache = shared_cache()
+    key = ocr_cache.ocr_key(ocr_cache.content_hash(image_bytes), model, prompt_version(), detail)
+    if cache is not None:
+        cached = cache.get_json(key)
+        pipeline_metrics.count('ocr_cache_total', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached
+    
+    result = get_ocr_flights().do(key, _ocr_uncached, image_bytes, mime_type, model, detail, expected_items, key, cache)
+    # Hasil dipakai bersama pemanggil lain, copy supaya aman diubah (validasi, tag halaman)
+    return copy.deepcopy(result)
+
+def _ocr_uncached(image_bytes, mime_type, model, detail, expected_items, key, cache):
+    if cache is not None:
+        # Bisa saja baru diisi oleh flight sebelumnya atau replica lain
+        cached = cache.get_json(key)
+        if cached is not None:
+            return cached
+    
+    result = call_vision_api(image_bytes, mime_type, model, detail, expected_items)
+    # Response yang formatnya tidak sesuai tidak di-cache
+    if cache is not None and isinstance(result, dict) and 'items' in result:
+        cache.set_json(key, result)
+    return result
+
+def plan_ocr_request(image_bytes, model="gpt-4o"):
+    """
+    Detail gambar (dari konfigurasi, atau analisis lokal di mode auto) dan
+    perkiraan jumlah item untuk batas token output.
+    
+    Returns:
+        tuple: (detail, expected_items atau None)
+    """
+    try:
+        plan = detail_planner.plan_detail(detail_planner.analyze_image(image_bytes), model, IMAGE_DETAIL)
+    except Exception:
+        # Gambar yang tidak bisa dianalisis dikirim dengan detail penuh & batas token maksimal
+        return (IMAGE_DETAIL if IMAGE_DETAIL in ('low', 'high') else 'high'), None
+    return plan['detail'], plan['expected_items']
+
+def ocr_adaptive(image_bytes, mime_type, model="gpt-4o"):
+    """
+    OCR dengan detail `low` jika analisis lokal menilai cukup; jika hasil `low`
+    kosong atau confidence-nya rendah, gambar yang sama diulang dengan `high`.
+    """
+    detail, expected_items = plan_ocr_request(image_bytes, model)
+    if detail == 'low':
+        result = ocr_image(image_bytes, mime_type, model, detail='low', expected_items=expected_items)
+        if IMAGE_DETAIL == 'low' or not detail_planner.needs_escalation(result):
+            return result
+    return ocr_image(image_bytes, mime_type, model, detail='high', expected_items=expected_items)
+
+def estimate_ocr_cost(file_bytes, file_type, model="gpt-4o"):
+    """
+    Estimasi jumlah request, token dan latency untuk satu file sebelum di-scan.
+    
+    Returns:
+        dict: requests, low, high, tokens_in, tokens_out, latency, reason
+    """
+    if file_type == "application/pdf":
+        # Halaman PDF baru dirender saat scan: asumsikan A4 di PDF_DPI dengan detail high
+        pages = count_pdf_pages(file_bytes)
+        width, height = int(8.27 * PDF_DPI), int(11.69 * PDF_DPI)
+        estimate = detail_planner.estimate_request(width, height, 'high', model, 15, OCR_OUTPUT_FORMAT)
+        return {
+            'requests': pages, 'low': 0, 'high': pages,
+            'tokens_in': estimate['tokens_in'] * pages,
+            'tokens_out': estimate['tokens_out'] * pages,
+            'latency': estimate['latency'],  # halaman diproses paralel
+            'reason': f"PDF {pages} halaman",
+        }
+    
+    # Yang dikirim adalah hasil crop: ukuran, detail & jumlah tile dihitung dari nota saja
+    file_bytes, _, _ = preprocess_receipt_image(file_bytes, file_type)
+    analysis = detail_planner.analyze_image(file_bytes)
+    width, height = analysis['width'], analysis['height']
+    tiles = 1
+    if TILE_MIN_ASPECT > 0 and height / width >= TILE_MIN_ASPECT:
+        # Struk panjang: dipotong jadi tile yang di-OCR paralel, detail dipilih per tile
+        tiles = receipt_tiling.tile_count(width, height)
+        analysis = dict(
+            analysis,
+            height=int(width * receipt_tiling.DEFAULT_TILE_ASPECT),
+            text_lines=math.ceil(analysis['text_lines'] / tiles) + detail_planner.HEADER_FOOTER_LINES,
+        )
+    
+    plan = detail_planner.plan_detail(analysis, model, IMAGE_DETAIL, OCR_OUTPUT_FORMAT)
+    estimate = plan['estimates'][plan['detail']]
+    return {
+        'requests': tiles,
+        'low': tiles if plan['detail'] == 'low' else 0,
+        'high': tiles if plan['detail'] == 'high' else 0,
+        'tokens_in': estimate['tokens_in'] * tiles,
+        'tokens_out': estimate['tokens_out'] * tiles,
+        'latency': estimate['latency'],  # tile diproses paralel
+        'reason': plan['reason'] if tiles == 1 else f"struk panjang, {tiles} tile; {plan['reason']}",
+    }
+
+def preprocess_receipt_image(image_bytes, mime_type):
+    """
+    Crop & deskew foto nota (jika RECEIPT_CROP aktif).
+    
+    Returns:
+        tuple: (bytes gambar, mime type, stats atau None jika gambar tidak diubah)
+    """
+    if not RECEIPT_CROP:
+        return image_bytes, mime_type, None
+    try:
+        with pipeline_metrics.span("receipt_crop"):
+            prepared, prepared_type, stats = get_cpu_pool().run(cpu_pool.prepare_receipt, image_bytes)
+    except Exception:
+        return image_bytes, mime_type, None  # Format yang tidak bisa dibaca Pillow dikirim utuh
+    if prepared_type is None:
+        return image_bytes, mime_type, None
+    return prepared, prepared_type, stats
+
+def ocr_receipt_image(image_bytes, mime_type, model="gpt-4o", preprocess=True):
+    """
+    OCR satu gambar nota. Foto dipotong ke kertas nota & diluruskan dulu
+    (`preprocess`, statistik pixel disimpan di `result['preprocess']`).
+    Struk yang sangat panjang dipotong menjadi tile yang saling overlap,
+    di-OCR paralel, lalu item-nya digabung tanpa duplikat.
+    """
+    stats = None
+    if preprocess:
+        image_bytes, mime_type, stats = preprocess_receipt_image(image_bytes, mime_type)
+    
+    tiles = None
+    if TILE_MIN_ASPECT > 0:
+        try:
+            with pipeline_metrics.span("tiling"):
+                tiles = get_cpu_pool().run(cpu_pool.split_tiles, image_bytes, TILE_MIN_ASPECT)
+        except Exception:
+            tiles = None  # Format yang tidak bisa dibaca Pillow dikirim utuh
+    if not tiles:
+        result = ocr_adaptive(image_bytes, mime_type, model)
+        if stats and isinstance(result, dict):
+            result['preprocess'] = stats
+        return result
+    
+    with ThreadPoolExecutor(max_workers=min(len(tiles), MAX_PARALLEL_PAGES)) as executor:
+        # copy_context: tile di-OCR dengan kelas prioritas scheduler milik pemanggil
+        futures = [
+            executor.submit(contextvars.copy_context().run, ocr_adaptive, tile, "image/jpeg", model)
+            for tile in tiles
+        ]
+        tile_results = [future.result() for future in futures]
+    
+    # Metadata dari tile paling atas (field kosong diisi dari tile berikutnya)
+    merged = merge_page_results({
+        index: {'metadata': (result or {}).get('metadata')}
+        for index, result in enumerate(tile_results, start=1)
+    })
+    merged['items'] = receipt_tiling.merge_tile_items([(result or {}).get('items') for result in tile_results])
+    if stats:
+        merged['preprocess'] = stats
+    return merged
+
+def count_pdf_pages(pdf_bytes):
+    """Hitung jumlah halaman PDF (via pdfinfo dari Poppler)"""
+    from pdf2image import pdfinfo_from_bytes
+    
+    info = pdfinfo_from_bytes(pdf_bytes)
+    return int(info.get("Pages", 1))
+
+def rasterize_pdf_page(pdf_bytes, page_number, dpi=PDF_DPI, output_folder=None, pdf_hash=None):
+    """
+    Render satu halaman PDF (nomor halaman mulai dari 1) menjadi JPEG bytes.
+    
+    Jika `output_folder` diisi, Poppler menulis JPEG langsung ke disk (tanpa
+    objek gambar PIL di memory) lalu file-nya dibaca dan dihapus.
+    
+    Jika `pdf_hash` diisi, hasil render diambil/disimpan di cache bersama.
+    """
+    cache = shared_cache() if pdf_hash else None
+    if cache is not None:
+        key = ocr_cache.page_key(pdf_hash, page_number, dpi)
+        page_bytes = cache.get(key)
+        if page_bytes:
+            return page_bytes
+    
+    page_bytes = _render_pdf_page(pdf_bytes, page_number, dpi, output_folder)
+    if cache is not None and page_bytes:
+        cache.set(key, page_bytes)
+    return page_bytes
+
+def _render_pdf_page(pdf_bytes, page_number, dpi, output_folder):
+    # Render & re-encode berjalan di process pool (lihat cpu_pool.py); PDF kecil pun
+    # menghasilkan halaman besar, jadi tidak ada batas ukuran minimum
+    return get_cpu_pool().run(cpu_pool.render_pdf_page, pdf_bytes, page_number, dpi, output_folder, min_bytes=0)
+
+def ocr_pdf_page(pdf_bytes, page_number, model, spill_dir=None, pdf_hash=None):
+    """Render lalu OCR satu halaman PDF (dijalankan di worker thread)"""
+    image_bytes = rasterize_pdf_page(pdf_bytes, page_number, output_folder=spill_dir, pdf_hash=pdf_hash)
+    if not image_bytes:
+        raise RuntimeError("Halaman tidak bisa dirender")
+    # Halaman PDF hasil render sudah berupa halaman utuh, tidak perlu di-crop
+    return ocr_receipt_image(image_bytes, "image/jpeg", model, preprocess=False)
+
+METADATA_FIELDS = ['tanggal', 'nama_toko', 'nomor_rekening', 'nama_bank', 'pemilik_rekening', 'jenis_pembayaran']
+
+def _is_empty_value(value):
+    return value is None or str(value).strip() in ("", "Unknown", "null", "None", "-")
+
+def merge_page_results(page_results):
+    """
+    Gabungkan hasil OCR per halaman menjadi satu nota.
+    
+    - Metadata diambil dari halaman header (halaman pertama). Field yang kosong
+      diisi dari halaman berikutnya, misal nomor rekening di footer halaman terakhir.
+    - Items dari semua halaman digabung sesuai urutan halaman, dan setiap item
+      diberi nomor halaman (`halaman`).
+    
+    Args:
+        page_results: dict {nomor_halaman: hasil JSON dari AI}
+    """
+    metadata = {}
+    metadata_confidence = {}
+    items = []
+    
+    for page in sorted(page_results):
+        result = page_results[page] or {}
+        page_metadata = result.get('metadata') or {}
+        page_confidence = page_metadata.get('confidence') or {}
+        
+        for field in METADATA_FIELDS:
+            value = page_metadata.get(field)
+            if _is_empty_value(metadata.get(field)) and not _is_empty_value(value):
+                metadata[field] = value
+                if field in page_confidence:
+                    metadata_confidence[field] = page_confidence[field]
+        
+        for item in result.get('items') or []:
+            page_item = dict(item)
+            page_item['halaman'] = page
+            items.append(page_item)
+    
+    metadata['confidence'] = metadata_confidence
+    return {"metadata": metadata, "items": items}
+
+def ocr_pdf_pages(pdf_bytes, model="gpt-4o", on_page_done=None, spill_dir=None, total_pages=None):
+    """
+    Render & OCR SEMUA halaman PDF secara paralel.
+    
+    Setiap halaman dirender lalu langsung di-OCR di worker thread-nya sendiri,
+    jadi invoice 10 halaman selesai kira-kira selama halaman yang paling lambat,
+    bukan 10 panggilan berurutan.
+    
+    Args:
+        on_page_done: callback(selesai, total_halaman), dipanggil di thread pemanggil
+        spill_dir: Folder sementara untuk render halaman langsung ke disk (batch besar)
+        total_pages: Jumlah halaman jika sudah dihitung pemanggil
+        
+    Returns:
+        tuple: (dict {halaman: hasil}, dict {halaman: exception})
+    """
+    total_pages = total_pages or count_pdf_pages(pdf_bytes)
+    page_results = {}
+    page_errors = {}
+    workers = max(1, min(total_pages, MAX_PARALLEL_PAGES))
+    pdf_hash = ocr_cache.content_hash(pdf_bytes)  # kunci cache halaman, dihitung sekali per PDF
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # copy_context: halaman di-OCR dengan kelas prioritas scheduler milik pemanggil
+        futures = {
+            executor.submit(contextvars.copy_context().run, ocr_pdf_page, pdf_bytes, page, model, spill_dir, pdf_hash): page
+            for page in range(1, total_pages + 1)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            page = futures[future]
+            try:
+                page_results[page] = future.result()
+            except Exception as e:
+                page_errors[page] = e
+            if on_page_done:
+                on_page_done(done, total_pages)
+    
+    return page_results, page_errors
+
+@pipeline_metrics.timed("extract")
+def extract_document(file_bytes, file_type, model="gpt-4o", on_page_done=None, spill_dir=None):
+    """
+    Ekstrak data nota dari gambar, atau dari semua halaman PDF (versi tanpa UI
+    dari `extract_nota` di app.py).
+    
+    Returns:
+        tuple: (hasil {"metadata": ..., "items": [...]}, list pesan peringatan)
+        
+    Raises:
+        RuntimeError jika client belum siap atau semua halaman PDF gagal,
+        serta error dari API / konversi PDF apa adanya
+    """
+    if not CLIENT_READY:
+        raise RuntimeError("OpenAI client belum diinisialisasi. Periksa API key Anda.")
+    
+    if file_type == "application/pdf":
+        page_results, page_errors = ocr_pdf_pages(file_bytes, model, on_page_done, spill_dir)
+        if not page_results:
+            raise RuntimeError("Semua halaman PDF gagal diproses")
+        warnings = [f"Halaman {page} gagal diproses: {error}" for page, error in sorted(page_errors.items())]
+        return merge_page_results(page_results), warnings
+    
+    result = ocr_receipt_image(file_bytes, file_type, model)
+    if not isinstance(result, dict) or 'items' not in result:
+        return {"items": []}, ["Response dari AI tidak sesuai format"]
+    return result, []
+
+# ==========================================
+# 3. VALIDASI & BARIS HASIL
+# ==========================================
+
+@pipeline_metrics.timed("validate")
+def validate_and_correct_items(items):
+    """
+    Validasi dan koreksi otomatis data hasil ekstraksi AI.
+    
+    Menangani:
+    1. Hyper-efficiency: Harga "20" yang sebenarnya "20.000" 
+    2. Kuantitas abstrak: "1/2" atau "0.5" untuk setengah
+    3. Balance check: qty × harga_satuan = total_harga
+    4. Confidence score: Mempertahankan skor kepercayaan dari AI
+    5. Field baru: unit, kategori_transaksi
+    
+    Returns:
+        list: Items yang sudah dikoreksi
+        list: Log koreksi yang dilakukan
+    """
+    corrected_items = []
+    correction_logs = []
+    
+    for idx, item in enumerate(items):
+        original_item = item.copy()
+        
+        # Pastikan semua field ada
+        nama = item.get('nama_barang', f'Item {idx+1}')
+        qty = item.get('qty', 1)
+        unit = item.get('unit', 'pcs')
+        harga_satuan = item.get('harga_satuan', 0)
+        total_harga = item.get('total_harga', 0)
+        kategori = item.get('kategori_transaksi', 'Non Bama')
+        
+        # Ambil confidence score jika ada, atau buat default
+        confidence = item.get('confidence', {
+            'nama_barang': 100,
+            'qty': 100,
+            'unit': 100,
+            'harga_satuan': 100,
+            'total_harga': 100,
+            'kategori_transaksi': 100
+        })
+        
+        # Pastikan confidence adalah dict
+        if not isinstance(confidence, dict):
+            confidence = {
+                'nama_barang': 100,
+                'qty': 100,
+                'unit': 100,
+                'harga_satuan': 100,
+                'total_harga': 100,
+                'kategori_transaksi': 100
+            }
+        
+        # Convert ke numeric jika masih string
+        try:
+            qty = float(qty) if not isinstance(qty, (int, float)) else qty
+            harga_satuan = int(harga_satuan) if not isinstance(harga_satuan, (int, float)) else harga_satuan
+            total_harga = int(total_harga) if not isinstance(total_harga, (int, float)) else total_harga
+        except:
+            correction_logs.append(f"⚠️ Item '{nama}': Gagal convert ke numeric, skip")
+            continue
+        
+        # KOREKSI 1: Deteksi hyper-efficiency pada harga_satuan
+        # Jika harga_satuan < 1000 tapi total_harga > 10000, kemungkinan harga dalam ribuan
+        if harga_satuan < 1000 and total_harga > 10000:
+            # Cek apakah total_harga adalah kelipatan ribuan dari harga_satuan
+            multiplier = total_harga / (harga_satuan * qty) if qty > 0 else 0
+            
+            # Jika multiplier mendekati 1000, berarti harga_satuan seharusnya dikali 1000
+            if 900 <= multiplier <= 1100:
+                old_harga = harga_satuan
+                harga_satuan = harga_satuan * 1000
+                correction_logs.append(
+                    f"✅ '{nama}': Harga satuan dikoreksi {old_harga} → {harga_satuan:,} (hyper-efficiency)"
+                )
+                # Turunkan confidence karena ada koreksi
+                confidence['harga_satuan'] = min(confidence.get('harga_satuan', 100), 80)
+        
+        # KOREKSI 2: Deteksi hyper-efficiency pada total_harga
+        # Jika total_harga < 1000 tapi harga_satuan > 10000
+        if total_harga < 1000 and harga_satuan > 10000:
+            multiplier = (harga_satuan * qty) / total_harga if total_harga > 0 else 0
+            
+            if 900 <= multiplier <= 1100:
+                old_total = total_harga
+                total_harga = total_harga * 1000
+                correction_logs.append(
+                    f"✅ '{nama}': Total harga dikoreksi {old_total} → {total_harga:,} (hyper-efficiency)"
+                )
+                # Turunkan confidence karena ada koreksi
+                confidence['total_harga'] = min(confidence.get('total_harga', 100), 80)
+        
+        # KOREKSI 3: Balance check - qty × harga_satuan = total_harga
+        expected_total = qty * harga_satuan
+        
+        # Toleransi 5% untuk pembulatan
+        tolerance = 0.05
+        diff_ratio = abs(expected_total - total_harga) / expected_total if expected_total > 0 else 0
+        
+        if diff_ratio > tolerance:
+            # Ada ketidaksesuaian, tentukan mana yang benar
+            
+            # Strategi: Percaya total_harga, koreksi harga_satuan
+            # Karena biasanya total_harga lebih akurat di nota
+            if total_harga > 0 and qty > 0:
+                old_harga_satuan = harga_satuan
+                harga_satuan = int(total_harga / qty)
+                
+                correction_logs.append(
+                    f"⚖️ '{nama}': Balance dikoreksi - Harga satuan {old_harga_satuan:,} → {harga_satuan:,} "
+                    f"(qty={qty}, total={total_harga:,})"
+                )
+                # Turunkan confidence karena ada koreksi
+                confidence['harga_satuan'] = min(confidence.get('harga_satuan', 100), 70)
+            # Jika total_harga = 0, hitung dari qty × harga_satuan
+            elif total_harga == 0 and harga_satuan > 0:
+                total_harga = int(qty * harga_satuan)
+                correction_logs.append(
+                    f"⚖️ '{nama}': Total harga dihitung = {total_harga:,} (dari qty × harga_satuan)"
+                )
+                # Turunkan confidence karena ada koreksi
+                confidence['total_harga'] = min(confidence.get('total_harga', 100), 70)
+        
+        # Simpan item yang sudah dikoreksi dengan confidence score
+        corrected_items.append({
+            'nama_barang': nama,
+            'qty': qty,
+            'unit': unit,
+            'harga_satuan': int(harga_satuan),
+            'total_harga': int(total_harga),
+            'kategori_transaksi': kategori,
+            'confidence': confidence
+        })
+        
+        # Bawa info asal item (halaman PDF / file batch) jika ada
+        for key in ('halaman', 'source_file'):
+            if key in item:
+                corrected_items[-1][key] = item[key]
+    
+    return corrected_items, correction_logs
+
+@pipeline_metrics.timed("dataframe")
+def prepare_dataframe_with_confidence(items, metadata=None):
+    """
+    Menyiapkan DataFrame dengan kolom confidence indicator dan metadata.
+    
+    Lihat `build_result_rows` untuk detail kolom dan indicator.
+    """
+    return pd.DataFrame(build_result_rows(items, metadata))
+
+def build_result_rows(items, metadata=None):
+    """
+    Menyiapkan baris hasil (list of dict) dengan kolom confidence indicator dan metadata.
+    
+    Menambahkan emoji/simbol untuk menandai field dengan confidence rendah:
+    - 🟢 (>= 80): Confidence tinggi
+    - 🟡 (70-79): Confidence sedang
+    - 🔴 (< 70): Confidence rendah - perlu review
+    
+    Args:
+        items: List of dict dengan confidence score
+        metadata: Dict dengan informasi nota (tanggal, nama_toko, dll)
+        
+    Returns:
+        list of dict dengan kolom lengkap sesuai urutan yang dibutuhkan
+    """
+    df_data = []
+    
+    # Default metadata jika tidak ada
+    if metadata is None:
+        metadata = {
+            'tanggal': None,
+            'nama_toko': 'Unknown',
+            'nomor_rekening': None,
+            'nama_bank': None,
+            'pemilik_rekening': None,
+            'jenis_pembayaran': 'Cash'
+        }
+    
+    for item in items:
+        confidence = item.get('confidence', {})
+        
+        # Buat visual indicator untuk setiap field
+        nama_conf = confidence.get('nama_barang', 100)
+        qty_conf = confidence.get('qty', 100)
+        unit_conf = confidence.get('unit', 100)
+        harga_conf = confidence.get('harga_satuan', 100)
+        total_conf = confidence.get('total_harga', 100)
+        kategori_conf = confidence.get('kategori_transaksi', 100)
+        
+        # Tambahkan indicator ke field yang perlu
+        # Jika ada field numeric dengan confidence rendah, indicator ditambahkan di nama juga
+        # Karena NumberColumn tidak bisa menampilkan emoji
+        nama_display = result_editor.with_indicators(
+            item.get('nama_barang', ''),
+            result_editor.name_indicators(nama_conf, qty_conf, harga_conf, total_conf)
+        )
+        
+        unit_display = result_editor.with_indicators(
+            item.get('unit', 'pcs'), [result_editor.confidence_indicator(unit_conf)]
+        )
+        kategori_display = result_editor.with_indicators(
+            item.get('kategori_transaksi', 'Non Bama'), [result_editor.confidence_indicator(kategori_conf)]
+        )
+        
+        # Urutan kolom sesuai kebutuhan:
+        # Tanggal, Nama Toko, Nomor Rekening, Nama Bank, Pemilik Rekening, 
+        # Jenis Pembayaran, Kategori Transaksi, Quantity, Unit, Nama Barang, 
+        # Harga Satuan, Harga Total
+        row = {
+            'tanggal': None,  # Biarkan kosong sesuai permintaan user
+            'nama_toko': metadata.get('nama_toko', 'Unknown'),
+            'nomor_rekening': metadata.get('nomor_rekening'),
+            'nama_bank': metadata.get('nama_bank'),
+            'pemilik_rekening': metadata.get('pemilik_rekening'),
+            'jenis_pembayaran': metadata.get('jenis_pembayaran', 'Cash'),
+            'kategori_transaksi': kategori_display,
+            'qty': item.get('qty', 1),
+            'unit': unit_display,
+            'nama_barang': nama_display,
+            'harga_satuan': item.get('harga_satuan', 0),
+            'total_harga': item.get('total_harga', 0),
+            # Simpan confidence untuk referensi (hidden)
+            '_conf_nama': nama_conf,
+            '_conf_qty': qty_conf,
+            '_conf_unit': unit_conf,
+            '_conf_harga': harga_conf,
+            '_conf_total': total_conf,
+            '_conf_kategori': kategori_conf,
+            # Simpan nilai asli tanpa indicator
+            '_nama_asli': item.get('nama_barang', ''),
+            '_unit_asli': item.get('unit', 'pcs'),
+            '_kategori_asli': item.get('kategori_transaksi', 'Non Bama')
+        }
+        
+        # Tambahkan nomor halaman jika ada (untuk PDF multi-halaman)
+        if 'halaman' in item:
+            row['halaman'] = item['halaman']
+        
+        # Tambahkan source_file jika ada (untuk batch mode)
+        if 'source_file' in item:
+            row['source_file'] = item['source_file']
+        
+        df_data.append(row)
+    
+    return df_data
+
+def correct_result(json_data, use_catalog=True):
+    """
+    Validasi item hasil AI lalu (opsional) normalisasi lewat katalog barang.
+    
+    Returns:
+        tuple: (metadata, item terkoreksi, log koreksi)
+    """
+    metadata = json_data.get('metadata') or {}
+    corrected_items, correction_logs = validate_and_correct_items(json_data.get('items') or [])
+    if use_catalog:
+        with pipeline_metrics.span("catalog"):
+            corrected_items, catalog_logs = get_item_catalog().apply(corrected_items)
+        correction_logs.extend(catalog_logs)
+    return metadata, corrected_items, correction_logs
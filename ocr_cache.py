@@ -0,0 +1,262 @@
+"""
+Cache hasil OCR & halaman PDF yang dipakai bersama oleh beberapa replica.
+
+Beberapa replica Streamlit di belakang load balancer tidak berbagi memory,
+sehingga nota yang sama yang di-upload dua kasir di replica berbeda di-OCR
+dua kali. Cache di modul ini disimpan di luar proses:
+
+- SQLiteCache : satu file SQLite (mode WAL) di volume yang sama untuk semua
+  replica di satu host. Juga dipakai sebagai cache lokal saat development.
+- RedisCache  : server Redis (atau yang kompatibel), untuk replica di host
+  berbeda. Butuh package `redis`.
+
+Yang di-cache:
+
+- hasil ekstraksi  : kunci = hash gambar + model + versi prompt + detail gambar
+- halaman PDF      : kunci = hash PDF + nomor halaman + DPI (JPEG hasil render)
+
+Setiap entri punya TTL, dan total ukuran cache dibatasi (SQLite: entri yang
+paling lama tidak dipakai dibuang; Redis: gunakan `maxmemory` +
+`maxmemory-policy allkeys-lru` di server). Cache bersifat best-effort:
+error backend dianggap cache miss dan tidak pernah menggagalkan OCR.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_MB = 512
+EVICT_EVERY = 20  # cek batas ukuran setiap N penulisan
+TOUCH_FRACTION = 0.01  # accessed_at baru ditulis ulang jika lebih lama dari porsi TTL ini
+
+
+def content_hash(data):
+    """SHA-256 hex dari bytes file/gambar"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def ocr_key(image_hash, model, prompt_version, detail="high"):
+    return f"ocr:{prompt_version}:{model}:{detail}:{image_hash}"
+
+
+def page_key(pdf_hash, page_number, dpi):
+    return f"page:{dpi}:{pdf_hash}:{page_number}"
+
+
+class OcrCache:
+    """Interface cache: get/set bytes, ditambah helper untuk nilai JSON"""
+
+    name = None
+
+    def __init__(self, ttl_seconds, max_entry_bytes):
+        self.ttl_seconds = ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self.errors = 0
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def get_json(self, key):
+        raw = self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return None
+
+    def set_json(self, key, value):
+        self.set(key, json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+
+class SQLiteCache(OcrCache):
+    """
+    Cache di file SQLite yang bisa dibuka beberapa proses sekaligus.
+
+    Mode WAL + busy timeout membuat pembaca tidak saling blokir dan penulis
+    bergantian dengan aman. Setiap thread membuka koneksi sendiri.
+    """
+
+    name = "sqlite"
+    table = "ocr_cache"
+
+    def __init__(self, db_path, ttl_seconds, max_bytes, max_entry_bytes=None):
+        super().__init__(ttl_seconds, max_entry_bytes or max_bytes // 8)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.touch_interval = ttl_seconds * TOUCH_FRACTION
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value BLOB, size INTEGER, expires_at REAL, accessed_at REAL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed ON {self.table} (accessed_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    f"SELECT value, expires_at, accessed_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] < now:
+                    return None
+                # Cache hit biasanya cukup baca saja: urutan LRU tidak perlu presisi sampai detik,
+                # jadi write lock hanya diambil jika accessed_at sudah cukup lama
+                if now - row[2] > self.touch_interval:
+                    with conn:
+                        conn.execute(
+                            f"UPDATE {self.table} SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                            (now, key, now - self.touch_interval),
+                        )
+                return bytes(row[0])
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+
+    def set(self, key, value):
+        if not value or len(value) > self.max_entry_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, sqlite3.Binary(value), len(value), now + self.ttl_seconds, now),
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self.errors += 1
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_EVERY == 1
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Buang entri kadaluarsa, lalu entri yang paling lama tidak dipakai sampai di bawah batas ukuran"""
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+                total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+                if total > self.max_bytes:
+                    # Sisakan ruang 10% supaya eviction tidak terjadi di setiap penulisan
+                    excess = total - int(self.max_bytes * 0.9)
+                    victims = []
+                    for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at"):
+                        victims.append((key,))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            self.errors += 1
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            count, total = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table} WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()
+        finally:
+            conn.close()
+        return {'entries': count, 'bytes': total}
+
+
+class RedisCache(OcrCache):
+    """
+    Cache di Redis. TTL memakai `SET ... EX`, batas ukuran total diatur
+    server (`maxmemory` + `maxmemory-policy allkeys-lru`).
+    """
+
+    name = "redis"
+
+    def __init__(self, url, ttl_seconds, max_entry_bytes, prefix="nota-scan:"):
+        super().__init__(ttl_seconds, max_entry_bytes)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Package 'redis' belum terinstall. Jalankan: pip install redis") from e
+        self._redis_error = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except self._redis_error:
+            self.errors += 1
+            return None
+
+    def set(self, key, value):
+        if not value or len(value) > self.max_entry_bytes:
+            return
+        try:
+            self.client.set(self.prefix + key, value, ex=int(self.ttl_seconds))
+        except self._redis_error:
+            self.errors += 1
+
+    def stats(self):
+        memory = self.client.info('memory')
+        return {'entries': self.client.dbsize(), 'bytes': memory.get('used_memory', 0)}
+
+
+def build_cache(url, ttl_hours=DEFAULT_TTL_HOURS, max_mb=DEFAULT_MAX_MB):
+    """
+    Buat cache dari URL konfigurasi.
+
+    - ``redis://host:6379/0`` / ``rediss://...``  → RedisCache
+    - ``sqlite:///data/ocr_cache.db`` atau path file → SQLiteCache
+    - kosong / ``none`` / ``off``                  → None (cache nonaktif)
+    """
+    url = str(url or '').strip()
+    if not url or url.lower() in ('none', 'off', 'false', '0'):
+        return None
+
+    ttl_seconds = float(ttl_hours) * 3600
+    max_bytes = int(float(max_mb) * 1024 * 1024)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url, ttl_seconds, max_entry_bytes=max_bytes // 8)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteCache(url, ttl_seconds, max_bytes)
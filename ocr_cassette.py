@@ -0,0 +1,302 @@
+"""
+Rekam & putar ulang (record/replay) traffic OCR untuk uji performa offline.
+
+Fixture sintetis tidak menangkap bentuk, ukuran, dan timing respons dari
+nota sungguhan. Dengan cassette, satu korpus nota nyata cukup di-OCR sekali
+(mode record), lalu seluruh pipeline bisa dijalankan ulang tanpa biaya API
+(mode replay) untuk membandingkan throughput & output antar versi:
+
+- record : setiap panggilan OCR dicatat sebagai satu baris JSONL berisi
+  metadata request (model, detail, hash & ukuran gambar, batas token, format
+  respons), isi mentah respons model, usage token, endpoint, dan latency.
+  Gambar hanya disimpan sebagai hash SHA-256, kecuali `store_images=True`
+- replay : request dicocokkan lewat kunci yang sama dengan cache OCR (hash
+  gambar + model + versi prompt + detail), respons mentah dikembalikan
+  setelah menunggu latency aslinya dikali `timing` (0 = tanpa jeda). Gambar
+  yang sama direkam beberapa kali → rekamannya dipakai bergiliran. Error
+  yang terekam (timeout, 5xx) dilempar ulang sebagai CassetteReplayError
+
+Hasil replay bisa ditulis ke `log_path` dengan format yang sama, sehingga
+dua rekaman/replay bisa dibandingkan:
+
+    python ocr_cassette.py summary data/cassettes/ocr.jsonl
+    python ocr_cassette.py diff data/cassettes/ocr.jsonl data/cassettes/replay.jsonl
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from ocr_cache import content_hash
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (OFF, RECORD, REPLAY)
+
+
+class CassetteMiss(LookupError):
+    """Tidak ada rekaman untuk request ini (mode replay)"""
+
+
+class CassetteReplayError(RuntimeError):
+    """Error yang terekam saat record, dilempar ulang saat replay"""
+
+
+def _append_jsonl(path, entry, lock):
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    with lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def load(path):
+    """Semua entri cassette (baris JSONL yang rusak, mis. terpotong saat proses mati, dilewati)"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+class Cassette:
+    """Satu file cassette JSONL, dipakai bersama semua session & thread dalam proses"""
+
+    def __init__(self, path, mode, timing=1.0, store_images=False, log_path=None):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Mode cassette tidak dikenal: {mode}")
+        self.path = path
+        self.mode = mode
+        self.timing = max(0.0, float(timing))
+        self.store_images = store_images
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._entries = None   # kunci → list entri (replay)
+        self._positions = {}   # kunci → indeks rekaman berikutnya
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    # ---------- Record ----------
+
+    def record(self, key, request, image_bytes, response=None, latency=0.0, error=None, result=None):
+        """
+        Catat satu panggilan OCR.
+
+        Args:
+            request: metadata request (model, detail, mime_type, max_tokens, ...)
+            response: {content, finish_reason, usage, endpoint, api_calls}, None jika gagal
+            error: exception jika panggilan gagal
+            result: hasil yang sudah di-parse (untuk `diff`)
+        """
+        entry = {
+            'key': key,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'request': dict(request, image_sha256=content_hash(image_bytes), image_bytes=len(image_bytes)),
+            'response': response,
+            'latency': round(latency, 4),
+            'error': f"{type(error).__name__}: {error}"[:500] if error is not None else None,
+            'result': result,
+        }
+        if self.store_images:
+            entry['image'] = base64.b64encode(image_bytes).decode('ascii')
+        _append_jsonl(self.path, entry, self._lock)
+        self.recorded += 1
+
+    # ---------- Replay ----------
+
+    def _index(self):
+        if self._entries is None:
+            entries = {}
+            for entry in load(self.path) if os.path.exists(self.path) else []:
+                entries.setdefault(entry.get('key'), []).append(entry)
+            self._entries = entries
+        return self._entries
+
+    def lookup(self, key):
+        """Rekaman berikutnya untuk `key` (bergiliran jika ada beberapa)"""
+        with self._lock:
+            recordings = self._index().get(key)
+            if not recordings:
+                self.misses += 1
+                raise CassetteMiss(f"Tidak ada rekaman OCR untuk request ini di {self.path}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            return recordings[position % len(recordings)]
+
+    def replay(self, key):
+        """
+        Putar ulang satu panggilan: tunggu latency rekaman × timing, lalu
+        kembalikan entri rekaman (isi respons mentah ada di entry['response']).
+
+        Raises:
+            CassetteMiss, CassetteReplayError
+        """
+        entry = self.lookup(key)
+        delay = (entry.get('latency') or 0.0) * self.timing
+        if delay > 0:
+            time.sleep(delay)
+        self.replayed += 1
+        if entry.get('error') or not entry.get('response'):
+            raise CassetteReplayError(entry.get('error') or "Rekaman tanpa respons")
+        return entry
+
+    def log_replay(self, entry, latency, result):
+        """Tulis hasil replay ke `log_path` (format sama dengan rekaman) untuk dibandingkan"""
+        if not self.log_path:
+            return
+        replayed = {key: value for key, value in entry.items() if key != 'image'}
+        replayed.update(
+            recorded_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            latency=round(latency, 4),
+            result=result,
+        )
+        _append_jsonl(self.log_path, replayed, self._lock)
+
+    def stats(self):
+        with self._lock:
+            available = sum(len(recordings) for recordings in (self._entries or {}).values())
+        return {
+            'mode': self.mode,
+            'path': self.path,
+            'recorded': self.recorded,
+            'replayed': self.replayed,
+            'misses': self.misses,
+            'available': available,
+        }
+
+
+# ==========================================
+# Ringkasan & perbandingan
+# ==========================================
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(entries):
+    """Jumlah request, error, latency (p50/p95/total) dan token dari entri cassette"""
+    latencies = [entry.get('latency') or 0.0 for entry in entries if not entry.get('error')]
+    tokens = {'input': 0, 'output': 0}
+    for entry in entries:
+        usage = (entry.get('response') or {}).get('usage') or {}
+        tokens['input'] += usage.get('prompt_tokens') or 0
+        tokens['output'] += usage.get('completion_tokens') or 0
+    return {
+        'requests': len(entries),
+        'images': len({entry.get('key') for entry in entries}),
+        'errors': sum(1 for entry in entries if entry.get('error')),
+        'latency_p50': _percentile(latencies, 50),
+        'latency_p95': _percentile(latencies, 95),
+        'latency_total': sum(latencies),
+        'tokens': tokens,
+    }
+
+
+def _result_signature(result):
+    # Ringkasan output yang dibandingkan: jumlah item, total nominal, dan nama barang
+    items = (result or {}).get('items') or []
+    total = 0.0
+    for item in items:
+        try:
+            total += float(item.get('total_harga') or 0)
+        except (TypeError, ValueError):
+            pass
+    return {
+        'items': len(items),
+        'total': round(total, 2),
+        'names': [str(item.get('nama_barang') or '') for item in items],
+    }
+
+
+def diff(baseline, candidate):
+    """
+    Bandingkan output per kunci (rekaman terakhir per kunci) antara dua cassette/log.
+
+    Returns:
+        dict: {'same': n, 'changed': [{key, baseline, candidate}], 'missing': [...], 'added': [...]}
+    """
+    base = {entry.get('key'): entry for entry in baseline}
+    cand = {entry.get('key'): entry for entry in candidate}
+    changed = []
+    same = 0
+    for key in base.keys() & cand.keys():
+        before = _result_signature(base[key].get('result'))
+        after = _result_signature(cand[key].get('result'))
+        if before == after:
+            same += 1
+        else:
+            changed.append({'key': key, 'baseline': before, 'candidate': after})
+    return {
+        'same': same,
+        'changed': changed,
+        'missing': sorted(base.keys() - cand.keys()),
+        'added': sorted(cand.keys() - base.keys()),
+    }
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ringkasan & perbandingan cassette OCR")
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary_parser = commands.add_parser("summary", help="Ringkasan satu cassette")
+    summary_parser.add_argument("path")
+    diff_parser = commands.add_parser("diff", help="Bandingkan latency & output dua cassette/log replay")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("candidate")
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        stats = summarize(load(args.path))
+        print(
+            f"{stats['requests']} request ({stats['images']} gambar, {stats['errors']} error) · "
+            f"latency p50 {_format_seconds(stats['latency_p50'])} · p95 {_format_seconds(stats['latency_p95'])} · "
+            f"total {_format_seconds(stats['latency_total'])} · "
+            f"token input {stats['tokens']['input']:,} / output {stats['tokens']['output']:,}"
+        )
+        return 0
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for label, entries in (("baseline", baseline), ("candidate", candidate)):
+        stats = summarize(entries)
+        print(
+            f"{label:>9}: {stats['requests']} request · p50 {_format_seconds(stats['latency_p50'])} · "
+            f"p95 {_format_seconds(stats['latency_p95'])} · total {_format_seconds(stats['latency_total'])}"
+        )
+    result = diff(baseline, candidate)
+    print(f"Output sama: {result['same']} · berubah: {len(result['changed'])} · "
+          f"hilang: {len(result['missing'])} · baru: {len(result['added'])}")
+    for change in result['changed']:
+        before, after = change['baseline'], change['candidate']
+        print(f"  {change['key'][-12:]}: {before['items']} item / {before['total']:,.0f} → "
+              f"{after['items']} item / {after['total']:,.0f}")
+    return 1 if result['changed'] or result['missing'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Timing per tahap pipeline ekstraksi + export metrik format Prometheus.
+
+Scan yang lambat bisa tertahan di banyak tempat: render PDF, re-encode JPEG,
+base64, request ke model, parse JSON, validasi, pembuatan DataFrame, atau
+append ke Google Sheets. Modul ini mencatat durasi setiap tahap sebagai
+histogram sehingga latency per tahap bisa digrafikkan untuk semua replica:
+
+- `span(tahap)` (context manager) / `timed(tahap)` (decorator) mengukur satu
+  tahap; exception dihitung di `nota_stage_errors_total` lalu dilempar lagi
+- `count(nama, nilai, **label)` untuk counter lain (token, cache hit/miss)
+- `render()` menghasilkan teks exposition format Prometheus
+- `MetricsExporter` menulis teks itu ke file secara berkala (textfile
+  collector node_exporter, atomic rename) dan/atau melayaninya di
+  `http://host:port/metrics`
+
+Metrik disimpan di memory proses (satu registry per proses, lihat METRICS),
+dipakai bersama semua session Streamlit dan worker ingestion API.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "nota"
+
+# Batas bucket histogram (detik): dari base64 (ms) sampai request model / append Sheets (puluhan detik)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+HELP = {
+    'stage_duration_seconds': "Durasi per tahap pipeline ekstraksi nota",
+    'stage_errors_total': "Jumlah tahap pipeline yang gagal (exception)",
+    'ocr_tokens_total': "Token request OCR yang dilaporkan endpoint",
+    'ocr_cache_total': "Lookup cache OCR (hit / miss)",
+    'saved_rows_total': "Baris hasil yang disimpan per sink",
+}
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Histogram & counter di memory, aman dipakai dari banyak thread"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}  # nama → {label key: [jumlah per bucket..., sum, count]}
+        self._counters = {}    # nama → {label key: nilai}
+
+    def observe(self, name, seconds, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    values[index] += 1
+            values[-2] += seconds
+            values[-1] += 1
+
+    def count(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Ukur durasi blok sebagai tahap `stage`; error tetap dilempar"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.count('stage_errors_total', stage=stage, error=type(e).__name__, **labels)
+            raise
+        finally:
+            self.observe('stage_duration_seconds', time.perf_counter() - started, stage=stage, **labels)
+
+    def timed(self, stage, **labels):
+        """Decorator versi `span` untuk satu fungsi utuh"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Ringkasan per tahap {stage: {'count', 'sum', 'mean'}} untuk ditampilkan di UI"""
+        with self._lock:
+            series = dict(self._histograms.get('stage_duration_seconds', {}))
+            series = {key: list(values) for key, values in series.items()}
+        stages = {}
+        for key, values in series.items():
+            stage = dict(key)['stage']
+            entry = stages.setdefault(stage, {'count': 0, 'sum': 0.0})
+            entry['count'] += values[-1]
+            entry['sum'] += values[-2]
+        for entry in stages.values():
+            entry['mean'] = entry['sum'] / entry['count'] if entry['count'] else 0.0
+        return stages
+
+    def render(self):
+        """Semua metrik dalam text exposition format Prometheus"""
+        with self._lock:
+            histograms = {name: {key: list(values) for key, values in series.items()}
+                          for name, series in self._histograms.items()}
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        lines = []
+        for name in sorted(histograms):
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full_name} histogram")
+            for key in sorted(histograms[name]):
+                values = histograms[name][key]
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), values[:-2] + [values[-1]]):
+                    bucket_labels = _format_labels(key + (('le', _format_value(float(bound))),))
+                    lines.append(f"{full_name}_bucket{bucket_labels} {bucket_count}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(values[-2])}")
+                lines.append(f"{full_name}_count{_format_labels(key)} {values[-1]}")
+        for name in sorted(counters):
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full_name} counter")
+            for key in sorted(counters[name]):
+                lines.append(f"{full_name}{_format_labels(key)} {_format_value(counters[name][key])}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+span = METRICS.span
+timed = METRICS.timed
+count = METRICS.count
+render = METRICS.render
+
+
+def write_textfile(path, registry=METRICS):
+    """Tulis metrik ke `path` secara atomic (file sementara + rename), aman dibaca kapan saja"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class MetricsExporter:
+    """
+    Export metrik proses ini: file teks (ditulis ulang setiap `interval` detik)
+    dan/atau endpoint HTTP lokal `GET /metrics`. Keduanya berjalan di daemon thread.
+    """
+
+    def __init__(self, path=None, port=0, host="0.0.0.0", interval=15.0, registry=METRICS):
+        self.path = path
+        self.port = int(port or 0)
+        self.host = host
+        self.interval = interval
+        self.registry = registry
+        self.server = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.path:
+            threading.Thread(target=self._write_loop, name="metrics-textfile", daemon=True).start()
+        if self.port:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/metrics', '/'):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', CONTENT_TYPE)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass  # Scrape setiap beberapa detik tidak perlu masuk log
+
+            try:
+                self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            except OSError as e:
+                # Port sudah dipakai (mis. beberapa proses di host yang sama): file tetap ditulis
+                logger.warning("Endpoint metrik tidak bisa dibuka di port %s: %s", self.port, e)
+            else:
+                threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_textfile(self.path, self.registry)
+            except OSError as e:
+                logger.warning("Metrik tidak bisa ditulis ke %s: %s", self.path, e)
@@ -0,0 +1,80 @@
+"""
+Prefetch OCR spekulatif: ekstraksi dimulai di latar belakang begitu file di-upload.
+
+Biasanya user melihat preview dulu beberapa detik sebelum menekan tombol
+scan. Dengan prefetch, waktu itu dipakai untuk menunggu API: saat tombol
+ditekan, hasil yang sudah selesai langsung dipakai, dan yang masih berjalan
+cukup ditunggu (tidak dikirim ulang).
+
+`Prefetcher` disimpan per session (session_state), executor-nya dipakai
+bersama semua session sehingga jumlah request latar belakang tetap terbatas.
+File yang dihapus dari uploader dibatalkan: task yang belum mulai tidak
+pernah dijalankan, task yang sedang berjalan dibiarkan selesai (request HTTP
+tidak bisa dihentikan di tengah jalan) dan hasilnya dibuang. Hasil OCR-nya
+tetap masuk cache OCR bersama.
+"""
+
+import threading
+from concurrent.futures import CancelledError
+
+
+def _run(cancelled, fn, args):
+    # Task yang dibatalkan setelah masuk antrean executor tidak perlu memanggil API
+    if cancelled.is_set():
+        raise CancelledError()
+    return fn(*args)
+
+
+class Prefetcher:
+    """Task prefetch milik satu session, dikunci per (file, model)"""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._tasks = {}  # key → (Future, threading.Event pembatalan)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def sync(self, jobs):
+        """
+        Samakan task dengan daftar file yang sedang di-upload.
+
+        Args:
+            jobs: dict key → (fungsi, tuple argumen); key yang belum ada dikirim
+                ke executor, task untuk key yang tidak ada lagi dibatalkan
+        """
+        for key in list(self._tasks):
+            if key not in jobs:
+                self.cancel(key)
+        for key, (fn, args) in jobs.items():
+            if key not in self._tasks:
+                cancelled = threading.Event()
+                self._tasks[key] = (self.executor.submit(_run, cancelled, fn, args), cancelled)
+
+    def cancel(self, key):
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            future, cancelled = task
+            cancelled.set()
+            future.cancel()
+
+    def cancel_all(self):
+        for key in list(self._tasks):
+            self.cancel(key)
+
+    def get(self, key):
+        """Future untuk key, atau None jika file tidak di-prefetch"""
+        task = self._tasks.get(key)
+        return task[0] if task else None
+
+    def summary(self):
+        """dict: done, failed, running (termasuk yang masih antre)"""
+        counts = {'done': 0, 'failed': 0, 'running': 0}
+        for future, _ in self._tasks.values():
+            if not future.done():
+                counts['running'] += 1
+            elif future.cancelled() or future.exception() is not None:
+                counts['failed'] += 1
+            else:
+                counts['done'] += 1
+        return counts
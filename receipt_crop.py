@@ -0,0 +1,204 @@
+"""
+Deteksi, crop & deskew nota di foto HP sebelum OCR.
+
+Foto nota biasanya ikut memuat meja, tangan dan latar belakang, sering
+dalam posisi miring. Semua pixel itu ikut di-encode & dikirim, dan menambah
+jumlah tile gambar. Sebelum request dikirim, gambar diproses secara lokal:
+
+- deteksi: gambar diperkecil, kertas (area terang) dipisahkan dari latar
+  dengan threshold Otsu, lalu diambil komponen terang terbesar
+- sudut kemiringan dari sumbu utama komponen (PCA), batas nota dari
+  sebaran pixel komponen setelah diputar tegak (persegi empat miring)
+- gambar resolusi penuh diputar tegak, di-crop ke nota, kontras dinaikkan
+
+Jika nota tidak terdeteksi dengan yakin (komponen terlalu kecil, atau
+justru seluruh gambar), gambar asli dikirim apa adanya.
+"""
+
+import math
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+DETECT_SIZE = 200         # sisi terpanjang gambar untuk deteksi
+MIN_AREA = 0.12           # komponen lebih kecil dari porsi gambar ini dianggap bukan nota
+MIN_ELONGATION = 1.15     # sumbu panjang / pendek minimal agar sudut PCA bisa dipercaya
+MIN_SKEW = 0.7            # derajat; kemiringan lebih kecil tidak dikoreksi
+INSET = 0.005             # crop sedikit ke dalam tepi kertas (porsi ukuran nota) supaya latar gelap
+                          # tidak ikut terbaca sebagai baris tinta di detail_planner
+CONTRAST_CUTOFF = 1       # persen histogram yang dipotong di kedua ujung (autocontrast)
+JPEG_QUALITY = 92
+
+
+def _otsu_threshold(pixels):
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    levels = np.arange(256)
+    weight_bg = np.cumsum(histogram)
+    weight_fg = total - weight_bg
+    sum_bg = np.cumsum(histogram * levels)
+    mean_bg = np.divide(sum_bg, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+    mean_fg = np.divide(sum_bg[-1] - sum_bg, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+    variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(variance))
+
+
+def _largest_component(mask):
+    """
+    Koordinat (ys, xs) komponen terhubung (4-neighbour) terbesar di mask boolean.
+
+    Dilabeli per run (deretan pixel terang dalam satu baris), bukan per pixel:
+    run yang bersinggungan dengan run di baris atasnya disambung, lalu label
+    disebarkan sampai stabil. Semua langkah memakai operasi array numpy.
+    """
+    height, width = mask.shape
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]  # eksklusif; urutan sama dengan run_starts (row-major)
+    if not len(run_rows):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    # Run di baris atas yang bersinggungan dengan suatu run selalu berurutan (run satu baris
+    # tidak tumpang tindih), jadi cukup dicari rentang [lo, hi] dengan searchsorted
+    stride = width + 1
+    start_keys = run_rows * stride + run_starts
+    end_keys = run_rows * stride + run_ends
+    above = (run_rows - 1) * stride
+    lo = np.searchsorted(end_keys, above + run_starts, side='right')
+    hi = np.searchsorted(start_keys, above + run_ends, side='left')
+    counts = np.where(run_rows > 0, np.maximum(hi - lo, 0), 0)
+    pair_a = np.repeat(np.arange(len(run_rows)), counts)
+    pair_b = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+
+    # Label = index run terkecil di komponennya (sama dengan urutan scan row-major)
+    labels = np.arange(len(run_rows))
+    while True:
+        merged = labels.copy()
+        np.minimum.at(merged, pair_a, labels[pair_b])
+        np.minimum.at(merged, pair_b, labels[pair_a])
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+
+    lengths = run_ends - run_starts
+    best = np.argmax(np.bincount(labels, weights=lengths))
+    keep = labels == best
+    rows, starts, lengths = run_rows[keep], run_starts[keep], lengths[keep]
+    offsets = np.cumsum(lengths) - lengths
+    ys = np.repeat(rows, lengths)
+    xs = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+    return ys, xs
+
+
+def _rotate_points(xs, ys, angle):
+    # Arah putar sama dengan Image.rotate (berlawanan jarum jam, sumbu y ke bawah)
+    theta = math.radians(angle)
+    cos, sin = math.cos(theta), math.sin(theta)
+    return xs * cos + ys * sin, -xs * sin + ys * cos
+
+
+def detect_receipt(image):
+    """
+    Cari nota di gambar (PIL, orientasi EXIF sudah diterapkan).
+
+    Returns:
+        dict: angle (derajat, untuk Image.rotate), box (kiri, atas, kanan, bawah)
+        relatif terhadap titik tengah gambar yang sudah diputar, dalam pixel
+        resolusi penuh; atau None jika nota tidak terdeteksi
+    """
+    width, height = image.size
+    small = image.convert('L')
+    small.thumbnail((DETECT_SIZE, DETECT_SIZE))
+    scale = width / small.width
+    # Blur menyamarkan huruf supaya kertas terbaca sebagai satu area terang
+    pixels = np.asarray(small.filter(ImageFilter.BoxBlur(2)), dtype=np.uint8)
+
+    mask = pixels > _otsu_threshold(pixels)
+    ys, xs = _largest_component(mask)
+    if len(xs) < MIN_AREA * mask.size:
+        return None
+
+    # Koordinat relatif titik tengah gambar, dalam pixel resolusi penuh
+    xs = (xs + 0.5) * scale - width / 2
+    ys = (ys + 0.5) * scale - height / 2
+
+    angle = 0.0
+    covariance = np.cov(np.vstack([xs, ys]))
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    if eigenvalues[0] > 0 and math.sqrt(eigenvalues[1] / eigenvalues[0]) >= MIN_ELONGATION:
+        vx, vy = eigenvectors[:, 1]
+        # Putar sehingga sumbu panjang tegak; sudut dinormalisasi ke (-45°, 45°]
+        angle = math.degrees(math.atan2(-vx, vy))
+        angle = (angle + 45) % 90 - 45
+        if abs(angle) < MIN_SKEW:
+            angle = 0.0
+
+    rx, ry = _rotate_points(xs, ys, angle)
+    left, right = np.percentile(rx, [0.5, 99.5])
+    top, bottom = np.percentile(ry, [0.5, 99.5])
+    if not angle and right - left >= 0.97 * width and bottom - top >= 0.97 * height:
+        return None  # Kertas memenuhi gambar (scan / foto close-up): tidak ada yang perlu di-crop
+    inset_x, inset_y = (right - left) * INSET + scale / 2, (bottom - top) * INSET + scale / 2
+    return {
+        'angle': angle,
+        'box': (left + inset_x, top + inset_y, right - inset_x, bottom - inset_y),
+    }
+
+
+def prepare_receipt(image_bytes):
+    """
+    Crop ke nota, luruskan dan naikkan kontrasnya.
+
+    Returns:
+        tuple: (bytes JPEG atau bytes asli, mime type atau None jika tidak diubah, stats)
+        stats: before / after (jumlah pixel), angle, cropped
+    """
+    image = ImageOps.exif_transpose(Image.open(BytesIO(image_bytes)))
+    before = image.width * image.height
+    detection = detect_receipt(image)
+    if detection is None:
+        return image_bytes, None, {'before': before, 'after': before, 'angle': 0.0, 'cropped': False}
+
+    image = image.convert('RGB')
+    angle = detection['angle']
+    left, top, right, bottom = detection['box']
+    if angle:
+        # Crop kasar dulu (kotak yang memuat nota miring), baru diputar: jauh lebih
+        # murah daripada memutar seluruh foto resolusi penuh
+        corners_x, corners_y = _rotate_points(
+            np.array([left, right, right, left]), np.array([top, top, bottom, bottom]), -angle
+        )
+        half_w, half_h = image.width / 2, image.height / 2
+        rough = (
+            max(0, int(half_w + corners_x.min())), max(0, int(half_h + corners_y.min())),
+            min(image.width, int(math.ceil(half_w + corners_x.max()))),
+            min(image.height, int(math.ceil(half_h + corners_y.max()))),
+        )
+        image = image.crop(rough)
+        # Pusat hasil crop kasar, dalam koordinat gambar yang sudah diputar
+        shift_x, shift_y = _rotate_points(
+            np.array([(rough[0] + rough[2]) / 2 - half_w]), np.array([(rough[1] + rough[3]) / 2 - half_h]), angle
+        )
+        left, right = left - shift_x[0], right - shift_x[0]
+        top, bottom = top - shift_y[0], bottom - shift_y[0]
+        image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+
+    center_x, center_y = image.width / 2, image.height / 2
+    box = (
+        max(0, int(center_x + left)), max(0, int(center_y + top)),
+        min(image.width, int(math.ceil(center_x + right))), min(image.height, int(math.ceil(center_y + bottom))),
+    )
+    image = image.crop(box)
+    image = ImageOps.autocontrast(image, cutoff=CONTRAST_CUTOFF, preserve_tone=True)
+
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    after = image.width * image.height
+    return buffer.getvalue(), "image/jpeg", {
+        'before': before,
+        'after': after,
+        'angle': angle,
+        'cropped': after < before,
+    }
@@ -0,0 +1,128 @@
+"""
+Tiling struk panjang (thermal receipt) sebelum OCR.
+
+Foto struk supermarket yang sangat tinggi & sempit diperkecil oleh model
+vision sampai baris item tidak terbaca, bahkan dengan `detail: high`.
+Gambar seperti itu dipotong menjadi beberapa tile horizontal yang saling
+tumpang tindih (overlap), setiap tile di-OCR paralel, lalu item digabung:
+
+- baris yang terpotong di batas tile tetap utuh di salah satu tile karena overlap
+- baris yang muncul dua kali (di band overlap) dibuang saat penggabungan
+- metadata (toko, tanggal, dll) diambil dari tile paling atas
+"""
+
+import math
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+from item_catalog import name_trigrams, normalize_name
+
+DEFAULT_MIN_ASPECT = 2.5     # tinggi / lebar minimal untuk dipotong
+DEFAULT_TILE_ASPECT = 1.4    # tinggi tile = lebar × nilai ini
+DEFAULT_OVERLAP = 0.15       # porsi tinggi tile yang tumpang tindih dengan tile berikutnya
+MAX_OVERLAP_ITEMS = 6        # baris item maksimal yang muat di satu band overlap
+NAME_SIMILARITY = 0.5        # kemiripan nama (Jaccard trigram); qty & total juga harus sama
+
+
+def _oriented_size(image):
+    """Ukuran (lebar, tinggi) setelah orientasi EXIF diterapkan"""
+    width, height = image.size
+    if image.getexif().get(0x0112) in (5, 6, 7, 8):  # foto HP yang disimpan terputar 90°
+        return height, width
+    return width, height
+
+
+def tile_count(width, height, tile_aspect=DEFAULT_TILE_ASPECT, overlap=DEFAULT_OVERLAP):
+    """Jumlah tile untuk gambar berukuran (lebar, tinggi)"""
+    tile_height = int(width * tile_aspect)
+    step = max(1, int(tile_height * (1 - overlap)))
+    return max(1, math.ceil((height - tile_height) / step) + 1)
+
+
+def split_tiles(image_bytes, min_aspect=DEFAULT_MIN_ASPECT, tile_aspect=DEFAULT_TILE_ASPECT, overlap=DEFAULT_OVERLAP):
+    """
+    Potong gambar yang sangat tinggi menjadi tile JPEG yang saling overlap.
+
+    Returns:
+        list of bytes (urut dari atas ke bawah), atau None jika gambar tidak perlu dipotong
+    """
+    image = Image.open(BytesIO(image_bytes))
+    width, height = _oriented_size(image)  # hanya membaca header, belum decode pixel
+    if width <= 0 or height / width < min_aspect:
+        return None
+
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    tile_height = int(width * tile_aspect)
+    step = max(1, int(tile_height * (1 - overlap)))
+
+    tiles = []
+    for index in range(tile_count(width, height, tile_aspect, overlap)):
+        # Tile terakhir disejajarkan ke bawah gambar supaya tingginya tetap penuh
+        top = min(index * step, height - tile_height)
+        buffer = BytesIO()
+        image.crop((0, top, width, top + tile_height)).save(buffer, format='JPEG', quality=90)
+        tiles.append(buffer.getvalue())
+    return tiles
+
+
+def _name_similarity(a, b):
+    key_a, key_b = normalize_name(a), normalize_name(b)
+    if not key_a or not key_b:
+        return 0.0
+    if key_a == key_b:
+        return 1.0
+    grams_a, grams_b = name_trigrams(key_a), name_trigrams(key_b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _same_amount(a, b):
+    # Baris yang terpotong di tepi tile kadang terbaca tanpa angka (0 / kosong)
+    if not a or not b:
+        return True
+    try:
+        return abs(float(a) - float(b)) < 0.5
+    except (TypeError, ValueError):
+        return str(a) == str(b)
+
+
+def same_line(a, b):
+    """Apakah dua item hasil OCR adalah baris struk yang sama"""
+    return (
+        _name_similarity(a.get('nama_barang'), b.get('nama_barang')) >= NAME_SIMILARITY
+        and _same_amount(a.get('qty'), b.get('qty'))
+        and _same_amount(a.get('total_harga'), b.get('total_harga'))
+    )
+
+
+def _confidence(item):
+    scores = list((item.get('confidence') or {}).values())
+    return sum(scores) / len(scores) if scores else 100
+
+
+def merge_tile_items(tile_items):
+    """
+    Gabungkan item dari tile berurutan (atas → bawah).
+
+    Baris di akhir tile sebelumnya yang sama dengan baris di awal tile
+    berikutnya (band overlap) hanya diambil sekali; dari dua versi, dipilih
+    yang confidence-nya lebih tinggi (biasanya tile yang menampilkan baris utuh).
+
+    Args:
+        tile_items: list of list item, satu list per tile
+    """
+    merged = []
+    for items in tile_items:
+        items = list(items or [])
+        # Cari overlap terpanjang: k item terakhir `merged` == k item pertama tile ini
+        overlap = 0
+        for k in range(min(len(merged), len(items), MAX_OVERLAP_ITEMS), 0, -1):
+            if all(same_line(merged[-k + j], items[j]) for j in range(k)):
+                overlap = k
+                break
+
+        for j in range(overlap):
+            if _confidence(items[j]) > _confidence(merged[-overlap + j]):
+                merged[-overlap + j] = items[j]
+        merged.extend(items[overlap:])
+    return merged
@@ -0,0 +1,300 @@
+"""
+Editor hasil scan untuk batch besar (ribuan baris).
+
+`st.data_editor` mengirim seluruh DataFrame ke browser dan setiap rerun
+men-serialisasi ulang semuanya. Dengan 3.000+ baris, mengedit satu cell
+terasa lambat karena tabel utuh di-copy, di-drop kolomnya, lalu dikirim lagi.
+
+Modul ini memisahkan:
+
+- master frame  : `st.session_state.ocr_result_df`, index = row key yang stabil
+- slice editor  : hanya baris yang tampil (per halaman / per file asal)
+
+Perubahan dari editor (edited_rows / added_rows / deleted_rows, posisi
+relatif terhadap slice) dipetakan kembali ke row key dan ditulis langsung
+ke master frame, tanpa membangun ulang tabel lengkap.
+
+Setelah setiap perubahan hanya baris yang tersentuh yang dihitung ulang:
+total_harga, indicator confidence dan peringatan validasi per baris.
+Ringkasan (Total Items, Total Quantity, Grand Total) diperbarui dengan
+selisih sebelum/sesudah baris tersebut, bukan dijumlah ulang dari nol.
+"""
+
+import math
+
+import pandas as pd
+
+from item_catalog import VALID_CATEGORIES
+from result_store import INDICATOR_PREFIXES
+
+PAGE_SIZES = [25, 50, 100, 200]
+DEFAULT_PAGE_SIZE = 50
+ALL_FILES = "(Semua file)"
+
+LOW_CONFIDENCE = 80
+
+# Kolom editor → kolom confidence (hidden). Cell yang diedit user dianggap sudah dicek (100).
+CONFIDENCE_FIELDS = {
+    'nama_barang': '_conf_nama',
+    'qty': '_conf_qty',
+    'unit': '_conf_unit',
+    'harga_satuan': '_conf_harga',
+    'total_harga': '_conf_total',
+    'kategori_transaksi': '_conf_kategori',
+}
+
+
+def visible_columns(df):
+    """Kolom yang ditampilkan di editor (kolom internal diawali underscore)"""
+    return [col for col in df.columns if not col.startswith('_')]
+
+
+def confidence_indicator(score):
+    """Emoji indicator berdasarkan confidence score"""
+    if score >= LOW_CONFIDENCE:
+        return ""  # Tidak perlu indicator jika confidence tinggi
+    elif score >= 70:
+        return "⚠️"  # Warning untuk confidence sedang
+    else:
+        return "❗"  # Alert untuk confidence rendah
+
+
+def name_indicators(nama_conf, qty_conf, harga_conf, total_conf):
+    """
+    Indicator untuk kolom nama_barang.
+
+    NumberColumn tidak bisa menampilkan emoji, jadi confidence rendah pada
+    qty / harga / total ikut ditandai di nama barang.
+    """
+    indicators = [confidence_indicator(nama_conf)]
+    if qty_conf < LOW_CONFIDENCE and qty_conf not in [nama_conf]:
+        indicators.append(confidence_indicator(qty_conf))
+    if harga_conf < LOW_CONFIDENCE and harga_conf not in [nama_conf, qty_conf]:
+        indicators.append(confidence_indicator(harga_conf))
+    if total_conf < LOW_CONFIDENCE and total_conf not in [nama_conf, qty_conf, harga_conf]:
+        indicators.append(confidence_indicator(total_conf))
+    return indicators
+
+
+def with_indicators(value, indicators):
+    """Tambahkan indicator unik (tanpa string kosong) di depan nilai"""
+    unique = [indicator for indicator in dict.fromkeys(indicators) if indicator]
+    if unique:
+        return f"{' '.join(unique)} {value}"
+    return value
+
+
+def strip_indicator(value):
+    """Hapus emoji indicator di depan nilai text"""
+    if not isinstance(value, str):
+        return value
+    for prefix in INDICATOR_PREFIXES:
+        value = value.replace(prefix, '')
+    return value
+
+
+def refresh_indicators(df, row_key, edited_columns=()):
+    """
+    Evaluasi ulang indicator confidence satu baris setelah diedit.
+
+    Field yang diedit dianggap sudah dicek user (confidence 100). Jika qty atau
+    harga berubah, total_harga ikut dihitung ulang sehingga confidence-nya
+    mengikuti nilai terendah dari keduanya.
+    """
+    def conf(col):
+        if col not in df.columns:
+            return 100
+        value = pd.to_numeric(df.at[row_key, col], errors='coerce')
+        return 100 if pd.isna(value) else int(value)
+
+    for col in edited_columns:
+        conf_col = CONFIDENCE_FIELDS.get(col)
+        if conf_col in df.columns:
+            set_cell(df, row_key, conf_col, 100)
+    if {'qty', 'harga_satuan'} & set(edited_columns) and '_conf_total' in df.columns:
+        set_cell(df, row_key, '_conf_total', min(conf('_conf_qty'), conf('_conf_harga')))
+
+    if 'nama_barang' in df.columns:
+        indicators = name_indicators(conf('_conf_nama'), conf('_conf_qty'), conf('_conf_harga'), conf('_conf_total'))
+        set_cell(df, row_key, 'nama_barang', with_indicators(strip_indicator(df.at[row_key, 'nama_barang']), indicators))
+    for col, conf_col in (('unit', '_conf_unit'), ('kategori_transaksi', '_conf_kategori')):
+        if col in df.columns:
+            indicator = confidence_indicator(conf(conf_col))
+            set_cell(df, row_key, col, with_indicators(strip_indicator(df.at[row_key, col]), [indicator]))
+
+
+def row_warnings(row):
+    """
+    Peringatan validasi untuk satu baris (dict kolom → nilai).
+
+    Returns:
+        list: Pesan peringatan (kosong jika baris valid)
+    """
+    warnings = []
+    nama = strip_indicator(row.get('nama_barang'))
+    if nama is None or pd.isna(nama) or not str(nama).strip():
+        warnings.append("Nama barang kosong")
+
+    qty = pd.to_numeric(row.get('qty'), errors='coerce')
+    if pd.isna(qty) or qty <= 0:
+        warnings.append("Qty harus lebih dari 0")
+
+    harga = pd.to_numeric(row.get('harga_satuan'), errors='coerce')
+    if pd.isna(harga) or harga <= 0:
+        warnings.append("Harga satuan kosong / 0")
+
+    if 'kategori_transaksi' in row and strip_indicator(row.get('kategori_transaksi')) not in VALID_CATEGORIES:
+        warnings.append("Kategori harus Bama / Non Bama")
+
+    low_fields = [
+        field for field, conf_col in CONFIDENCE_FIELDS.items()
+        if pd.to_numeric(row.get(conf_col, 100), errors='coerce') < LOW_CONFIDENCE
+    ]
+    if low_fields:
+        warnings.append(f"Confidence rendah: {', '.join(low_fields)}")
+    return warnings
+
+
+def compute_warnings(df, row_keys=None):
+    """Peringatan validasi per row key (hanya baris yang punya peringatan)"""
+    subset = df if row_keys is None else df.loc[row_keys]
+    warnings = {}
+    for row_key, row in zip(subset.index, subset.to_dict('records')):
+        messages = row_warnings(row)
+        if messages:
+            warnings[row_key] = messages
+    return warnings
+
+
+def _sums(df, row_keys):
+    """(jumlah qty, jumlah total_harga) untuk sebagian baris"""
+    if not row_keys:
+        return 0, 0
+    qty = pd.to_numeric(df.loc[row_keys, 'qty'], errors='coerce').sum() if 'qty' in df.columns else 0
+    total = pd.to_numeric(df.loc[row_keys, 'total_harga'], errors='coerce').sum() if 'total_harga' in df.columns else 0
+    return qty, total
+
+
+def compute_totals(df):
+    """Ringkasan awal: Total Items, Total Quantity, Grand Total"""
+    qty, total = _sums(df, df.index.tolist())
+    return {'items': len(df), 'qty': qty, 'grand_total': total}
+
+
+def recalculate_totals(df, row_keys=None):
+    """total_harga = qty × harga_satuan, untuk row_keys tertentu atau seluruh frame"""
+    if not {'qty', 'harga_satuan', 'total_harga'} <= set(df.columns):
+        return
+    if row_keys is None:
+        df['total_harga'] = (df['qty'] * df['harga_satuan']).fillna(0).astype(int)
+        return
+    for row_key in row_keys:
+        qty = pd.to_numeric(df.at[row_key, 'qty'], errors='coerce')
+        harga = pd.to_numeric(df.at[row_key, 'harga_satuan'], errors='coerce')
+        total = 0 if pd.isna(qty) or pd.isna(harga) else int(qty * harga)
+        set_cell(df, row_key, 'total_harga', total)
+
+
+def set_cell(df, row_key, col, value):
+    """Tulis satu cell; dtype kolom dinaikkan (int → float → object) jika nilai tidak muat"""
+    try:
+        df.at[row_key, col] = value
+    except (TypeError, ValueError):
+        target = float if isinstance(value, float) and pd.api.types.is_integer_dtype(df[col]) else object
+        df[col] = df[col].astype(target)
+        df.at[row_key, col] = value
+
+
+def source_files(df):
+    """Daftar file asal (urutan kemunculan) untuk tampilan per file"""
+    if 'source_file' not in df.columns:
+        return []
+    return [name for name in df['source_file'].dropna().unique().tolist() if name != '']
+
+
+def group_keys(df, source_file=None):
+    """Row key milik satu file asal (atau semua baris untuk ALL_FILES)"""
+    if source_file in (None, ALL_FILES) or 'source_file' not in df.columns:
+        return df.index
+    return df.index[(df['source_file'] == source_file).to_numpy()]
+
+
+def page_count(row_count, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, math.ceil(row_count / page_size))
+
+
+def page_keys(keys, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """Row key pada halaman tertentu, urut sesuai posisi di editor"""
+    page = min(max(1, page), page_count(len(keys), page_size))
+    start = (page - 1) * page_size
+    return keys[start:start + page_size].tolist()
+
+
+def apply_changes(df, row_keys, changes, defaults=None, totals=None, warnings=None):
+    """
+    Terapkan state `st.data_editor` (posisi relatif slice) ke master frame.
+
+    Hanya baris yang tersentuh yang dihitung ulang (total_harga, indicator,
+    peringatan). `totals` dan `warnings` (hasil compute_totals/compute_warnings)
+    diperbarui in-place berdasarkan selisih baris tersebut.
+
+    Args:
+        df: Master frame (diubah in-place untuk edit cell)
+        row_keys: Row key dari slice yang ditampilkan, urut sesuai posisi
+        changes: dict edited_rows / added_rows / deleted_rows dari session_state editor
+        defaults: Nilai default untuk baris baru (mis. source_file dari tampilan per file)
+        totals: dict ringkasan berjalan (opsional)
+        warnings: dict row key → list peringatan (opsional)
+
+    Returns:
+        DataFrame: Master frame (objek baru jika ada baris ditambah/dihapus)
+        dict: Row key yang berubah: {'edited': [...], 'added': [...], 'deleted': [...]}
+    """
+    changed = {'edited': [], 'added': [], 'deleted': []}
+    columns = set(df.columns)
+
+    edited_rows = {row_keys[int(position)]: values for position, values in (changes.get('edited_rows') or {}).items()}
+    deleted = [row_keys[int(position)] for position in (changes.get('deleted_rows') or [])]
+    before_qty, before_total = _sums(df, list(dict.fromkeys(list(edited_rows) + deleted)))
+
+    for row_key, values in edited_rows.items():
+        edited_columns = [col for col in values if col in columns]
+        for col in edited_columns:
+            set_cell(df, row_key, col, values[col])
+        refresh_indicators(df, row_key, edited_columns)
+        changed['edited'].append(row_key)
+
+    added_rows = changes.get('added_rows') or []
+
+    if added_rows:
+        next_key = int(df.index.max()) + 1 if len(df) else 0
+        new_rows = []
+        for values in added_rows:
+            row = {col: 100 for col in columns if col.startswith('_conf_')}
+            row.update(defaults or {})
+            row.update({col: value for col, value in values.items() if col in columns and not col.startswith('_')})
+            new_rows.append(row)
+        new_keys = list(range(next_key, next_key + len(new_rows)))
+        df = pd.concat([df, pd.DataFrame(new_rows, index=new_keys)])
+        changed['added'] = new_keys
+
+    if deleted:
+        df = df.drop(index=deleted)
+        changed['edited'] = [key for key in changed['edited'] if key not in set(deleted)]
+        changed['deleted'] = deleted
+
+    touched = changed['edited'] + changed['added']
+    recalculate_totals(df, touched)
+
+    if totals is not None:
+        after_qty, after_total = _sums(df, touched)
+        totals['items'] += len(changed['added']) - len(changed['deleted'])
+        totals['qty'] += after_qty - before_qty
+        totals['grand_total'] += after_total - before_total
+
+    if warnings is not None:
+        for row_key in changed['deleted'] + touched:
+            warnings.pop(row_key, None)
+        warnings.update(compute_warnings(df, touched))
+
+    return df, changed
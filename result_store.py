@@ -0,0 +1,470 @@
+"""
+Penyimpanan hasil scan (result sinks).
+
+Google Sheets hanya salah satu tujuan penyimpanan. Modul ini menyediakan
+abstraksi sink sehingga tombol simpan bisa menulis ke beberapa backend
+sekaligus:
+
+- SQLiteSink      : database lokal, bulk insert + index untuk rekap bulanan
+- ParquetSink     : file Parquet (kolumnar) terpartisi per bulan
+- GoogleSheetSink : append ke Google Sheets (opsional), bisa dipartisi per
+                    bulan / toko dengan rollover ke worksheet baru
+
+Semua sink menerima DataFrame yang sudah dibersihkan lewat
+`prepare_save_frame()`, sehingga kolom confidence dan source_file ikut
+tersimpan di backend lokal.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+# Kolom tabel lokal (urutan = urutan kolom di SQLite/Parquet)
+STORE_COLUMNS = [
+    'saved_at',
+    'bulan',
+    'tanggal',
+    'nama_toko',
+    'nomor_rekening',
+    'nama_bank',
+    'pemilik_rekening',
+    'jenis_pembayaran',
+    'kategori_transaksi',
+    'qty',
+    'unit',
+    'nama_barang',
+    'harga_satuan',
+    'total_harga',
+    'conf_nama',
+    'conf_qty',
+    'conf_unit',
+    'conf_harga',
+    'conf_total',
+    'conf_kategori',
+    'source_file',
+    'halaman',
+]
+
+CONFIDENCE_COLUMNS = [col for col in STORE_COLUMNS if col.startswith('conf_')]
+
+INTEGER_COLUMNS = ['harga_satuan', 'total_harga'] + CONFIDENCE_COLUMNS
+
+# Kolom tambahan yang TIDAK dikirim ke Google Sheets (layout sheet tetap seperti sebelumnya)
+LOCAL_ONLY_COLUMNS = ['saved_at', 'bulan', 'halaman'] + CONFIDENCE_COLUMNS
+
+INDICATOR_PREFIXES = ['⚠️ ', '❗ ']
+
+
+def strip_indicators(df, columns=('nama_barang', 'unit', 'kategori_transaksi')):
+    """Hapus emoji indicator (⚠️ / ❗) dari kolom text"""
+    df = df.copy()
+    for col in columns:
+        if col in df.columns:
+            for prefix in INDICATOR_PREFIXES:
+                df[col] = df[col].astype(str).str.replace(prefix, '', regex=False)
+    return df
+
+
+def derive_bulan(tanggal, fallback):
+    """
+    Tentukan partisi bulan (YYYY-MM) dari kolom tanggal.
+
+    Tanggal di nota bisa berformat YYYY-MM-DD, DD/MM/YYYY atau DD-MM-YYYY.
+    Jika kosong/tidak bisa dibaca, gunakan bulan dari `fallback` (waktu simpan).
+    """
+    if tanggal is not None and not pd.isna(tanggal):
+        text = str(tanggal).strip()
+        match = re.match(r'^(\d{4})[-/](\d{1,2})[-/]\d{1,2}', text)
+        if match:
+            return f"{match.group(1)}-{int(match.group(2)):02d}"
+        match = re.match(r'^\d{1,2}[-/](\d{1,2})[-/](\d{4})', text)
+        if match:
+            return f"{match.group(2)}-{int(match.group(1)):02d}"
+    return fallback.strftime('%Y-%m')
+
+
+def prepare_save_frame(edited_df, confidence_df=None, saved_at=None):
+    """
+    Siapkan DataFrame untuk disimpan ke semua sink.
+
+    Args:
+        edited_df: DataFrame hasil st.data_editor (kolom yang tampil di tabel)
+        confidence_df: DataFrame berisi kolom `_conf_*` dengan index yang sama
+            seperti hasil scan. Baris yang ditambah manual oleh user tidak punya
+            confidence dari AI, sehingga dianggap 100 (sudah dicek manusia).
+        saved_at: Waktu simpan (default: sekarang)
+
+    Returns:
+        DataFrame: kolom tampilan (tanpa emoji) + saved_at, bulan, conf_*
+    """
+    saved_at = saved_at or datetime.now()
+    save_df = strip_indicators(edited_df)
+
+    if confidence_df is not None and not confidence_df.empty:
+        renamed = confidence_df.rename(columns=lambda col: col.lstrip('_'))
+        renamed = renamed[[col for col in renamed.columns if col in CONFIDENCE_COLUMNS]]
+        save_df = save_df.join(renamed, how='left')
+
+    for col in CONFIDENCE_COLUMNS:
+        if col not in save_df.columns:
+            save_df[col] = 100
+        save_df[col] = save_df[col].fillna(100).astype(int)
+
+    tanggal = save_df['tanggal'] if 'tanggal' in save_df.columns else pd.Series(None, index=save_df.index)
+    save_df['saved_at'] = saved_at.strftime('%Y-%m-%d %H:%M:%S')
+    save_df['bulan'] = [derive_bulan(value, saved_at) for value in tanggal]
+    return save_df
+
+
+def to_store_frame(save_df):
+    """Ambil kolom STORE_COLUMNS dengan tipe data yang konsisten untuk backend lokal"""
+    store_df = save_df.reindex(columns=STORE_COLUMNS)
+    store_df['qty'] = pd.to_numeric(store_df['qty'], errors='coerce').fillna(0).astype(float)
+    for col in INTEGER_COLUMNS:
+        store_df[col] = pd.to_numeric(store_df[col], errors='coerce').fillna(0).astype('int64')
+    # Nomor halaman hanya ada untuk PDF; kosong (NaN → NULL) untuk gambar biasa
+    store_df['halaman'] = pd.to_numeric(store_df['halaman'], errors='coerce').astype(float)
+    text_columns = [col for col in STORE_COLUMNS if col not in ['qty', 'halaman'] + INTEGER_COLUMNS]
+    for col in text_columns:
+        store_df[col] = store_df[col].astype(object).where(store_df[col].notna(), None)
+        store_df[col] = [None if value is None else str(value) for value in store_df[col]]
+    return store_df
+
+
+class ResultSink:
+    """Base class untuk semua tujuan penyimpanan"""
+
+    name = "base"
+    label = "Base"
+
+    def write(self, save_df):
+        """Simpan baris, return jumlah baris yang tersimpan"""
+        raise NotImplementedError
+
+
+class SQLiteSink(ResultSink):
+    """
+    Backend SQLite lokal.
+
+    Insert dilakukan sekaligus (executemany dalam satu transaksi) dan tabel
+    punya covering index pada (bulan, nama_toko, kategori_transaksi, qty,
+    total_harga), sehingga rekap bulanan atas ratusan ribu item cukup
+    membaca index tanpa menyentuh tabel.
+    """
+
+    name = "sqlite"
+    label = "SQLite (lokal)"
+    table = "nota_items"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn):
+        numeric = {'qty': 'REAL', 'halaman': 'INTEGER'}
+        numeric.update({col: 'INTEGER' for col in INTEGER_COLUMNS})
+        column_defs = ", ".join(f"{col} {numeric.get(col, 'TEXT')}" for col in STORE_COLUMNS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, {column_defs})")
+
+        # Database lama: tambahkan kolom yang belum ada
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+        for col in STORE_COLUMNS:
+            if col not in existing:
+                conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {col} {numeric.get(col, 'TEXT')}")
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.table}_rekap "
+            f"ON {self.table}(bulan, nama_toko, kategori_transaksi, qty, total_harga)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_source ON {self.table}(source_file)")
+
+    def write(self, save_df):
+        store_df = to_store_frame(save_df)
+        placeholders = ", ".join("?" for _ in STORE_COLUMNS)
+        sql = f"INSERT INTO {self.table} ({', '.join(STORE_COLUMNS)}) VALUES ({placeholders})"
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(sql, store_df.itertuples(index=False, name=None))
+        finally:
+            conn.close()
+        return len(store_df)
+
+    def monthly_summary(self, bulan):
+        """Rekap per toko & kategori untuk satu bulan (format YYYY-MM)"""
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(
+                f"""
+                SELECT nama_toko, kategori_transaksi,
+                       COUNT(*) AS jumlah_item,
+                       SUM(qty) AS total_qty,
+                       SUM(total_harga) AS grand_total
+                FROM {self.table}
+                WHERE bulan = ?
+                GROUP BY nama_toko, kategori_transaksi
+                ORDER BY grand_total DESC
+                """,
+                conn,
+                params=(bulan,),
+            )
+        finally:
+            conn.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    Backend Parquet lokal, terpartisi per bulan (`<root>/bulan=YYYY-MM/*.parquet`).
+
+    Setiap simpan menulis satu file per partisi secara kolumnar (pyarrow),
+    dan rekap bulanan hanya membaca partisi bulan yang diminta.
+    """
+
+    name = "parquet"
+    label = "Parquet (lokal)"
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def write(self, save_df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        store_df = to_store_frame(save_df)
+        os.makedirs(self.root_dir, exist_ok=True)
+
+        # Schema eksplisit supaya semua file dalam satu partisi konsisten
+        # (misal kolom halaman yang seluruhnya kosong tetap bertipe int64)
+        types = {'qty': pa.float64(), 'halaman': pa.int64()}
+        types.update({col: pa.int64() for col in INTEGER_COLUMNS})
+        schema = pa.schema([(col, types.get(col, pa.string())) for col in STORE_COLUMNS])
+        table = pa.Table.from_pandas(store_df, schema=schema, preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=self.root_dir,
+            partition_cols=['bulan'],
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        )
+        return len(store_df)
+
+    def monthly_summary(self, bulan):
+        """Rekap per toko & kategori untuk satu bulan (format YYYY-MM)"""
+        partition = os.path.join(self.root_dir, f"bulan={bulan}")
+        if not os.path.isdir(partition):
+            return pd.DataFrame(columns=['nama_toko', 'kategori_transaksi', 'jumlah_item', 'total_qty', 'grand_total'])
+
+        df = pd.read_parquet(partition, columns=['nama_toko', 'kategori_transaksi', 'qty', 'total_harga'])
+        summary = df.groupby(['nama_toko', 'kategori_transaksi'], dropna=False).agg(
+            jumlah_item=('qty', 'size'),
+            total_qty=('qty', 'sum'),
+            grand_total=('total_harga', 'sum'),
+        )
+        return summary.reset_index().sort_values('grand_total', ascending=False, ignore_index=True)
+
+
+SHEET_PARTITION_MODES = ('none', 'month', 'store')
+
+# Karakter yang tidak bisa dipakai di judul worksheet
+_SHEET_TITLE_INVALID = re.compile(r"[\[\]\*\?/\\:']")
+_UPDATED_RANGE_END = re.compile(r"[A-Z]+(\d+)$")
+
+
+def sheet_partition(save_df, mode):
+    """Nama partisi per baris: bulan (YYYY-MM dari tanggal), nama toko, atau '' (satu worksheet)"""
+    if mode == 'month':
+        return list(save_df['bulan'])
+    if mode == 'store':
+        stores = save_df['nama_toko'] if 'nama_toko' in save_df.columns else [None] * len(save_df)
+        return [
+            ' '.join(str(store).split()) if store is not None and not pd.isna(store) and str(store).strip()
+            else 'Tanpa Toko'
+            for store in stores
+        ]
+    return [''] * len(save_df)
+
+
+def sheet_title(base_name, partition, part=1):
+    """Judul worksheet untuk partisi & nomor rollover: "Sheet1 2025-11", "Sheet1 2025-11 (2)", ..."""
+    title = f"{base_name} {partition}" if partition else base_name
+    # Judul worksheet maksimal 100 karakter, sisakan ruang untuk nomor rollover
+    title = ' '.join(_SHEET_TITLE_INVALID.sub(' ', title).split())[:90]
+    return title if part == 1 else f"{title} ({part})"
+
+
+class WorksheetPartitions:
+    """
+    Worksheet tujuan append, dipartisi per bulan / toko dengan rollover.
+
+    Worksheet dibuat saat pertama kali dibutuhkan (dengan baris header), dan
+    handle-nya di-cache bersama jumlah baris terpakai sehingga append
+    berikutnya tidak perlu membuka / menghitung ulang worksheet. Jika
+    `rollover_rows` diset, worksheet yang penuh dilanjutkan ke worksheet baru
+    "<judul> (2)", "<judul> (3)", ...
+
+    Dipakai bersama semua session dalam satu proses (append diserialkan).
+    Jumlah baris dihitung dari respons append, sehingga penulis lain di luar
+    proses ini (replica lain, input manual) baru terhitung setelah handle
+    dibuat ulang; rollover bisa sedikit melewati batas.
+    """
+
+    def __init__(self, spreadsheet, base_name, mode='none', rollover_rows=0):
+        if mode not in SHEET_PARTITION_MODES:
+            raise ValueError(f"Mode partisi tidak dikenal: {mode}")
+        self.spreadsheet = spreadsheet
+        self.base_name = base_name
+        self.mode = mode
+        self.rollover_rows = max(0, int(rollover_rows or 0))
+        self._lock = threading.Lock()
+        self._titles = None   # judul worksheet yang sudah ada, dibaca sekali
+        self._current = {}    # partisi → {'part', 'worksheet', 'rows'}
+
+    def append(self, save_df, sheet_df):
+        """
+        Append baris `sheet_df` ke worksheet partisinya.
+
+        Args:
+            save_df: DataFrame hasil `prepare_save_frame` (sumber bulan / nama toko)
+            sheet_df: baris yang dikirim ke sheet (index sama dengan save_df)
+
+        Returns:
+            dict: judul worksheet → jumlah baris yang ditambahkan
+        """
+        header = list(sheet_df.columns)
+        grouped = {}
+        for partition, row in zip(sheet_partition(save_df, self.mode), sheet_df.values.tolist()):
+            grouped.setdefault(partition, []).append(row)
+
+        written = {}
+        with self._lock:
+            for partition, rows in grouped.items():
+                try:
+                    self._append_partition(partition, rows, header, written)
+                except Exception:
+                    # Worksheet mungkin dihapus / diubah dari luar: handle dibaca ulang di append berikutnya
+                    self._current.pop(partition, None)
+                    self._titles = None
+                    raise
+        return written
+
+    def _append_partition(self, partition, rows, header, written):
+        state = self._current.get(partition) or self._open(partition, header)
+        while rows:
+            if self.rollover_rows and state['rows'] >= self.rollover_rows:
+                state = self._create(partition, state['part'] + 1, header)
+            room = self.rollover_rows - state['rows'] if self.rollover_rows else len(rows)
+            chunk, rows = rows[:room], rows[room:]
+            response = state['worksheet'].append_rows(chunk)
+            state['rows'] = self._last_row(response, state['rows'] + len(chunk))
+            written[state['worksheet'].title] = written.get(state['worksheet'].title, 0) + len(chunk)
+
+    def _known_titles(self):
+        # Dibaca ulang setelah append gagal (lihat `append`), juga saat rollover partisi lain
+        if self._titles is None:
+            self._titles = {worksheet.title for worksheet in self.spreadsheet.worksheets()}
+        return self._titles
+
+    def _open(self, partition, header):
+        titles = self._known_titles()
+        part = 1
+        while sheet_title(self.base_name, partition, part + 1) in titles:
+            part += 1
+        title = sheet_title(self.base_name, partition, part)
+        if title not in titles:
+            return self._create(partition, part, header)
+
+        worksheet = self.spreadsheet.worksheet(title)
+        rows = 0
+        if self.rollover_rows:
+            # Satu kolom yang selalu terisi cukup untuk menghitung baris terpakai
+            column = header.index('nama_barang') + 1 if 'nama_barang' in header else 1
+            rows = len(worksheet.col_values(column))
+        state = {'part': part, 'worksheet': worksheet, 'rows': rows}
+        self._current[partition] = state
+        return state
+
+    def _create(self, partition, part, header):
+        title = sheet_title(self.base_name, partition, part)
+        worksheet = self.spreadsheet.add_worksheet(title=title, rows=1, cols=len(header))
+        worksheet.append_row(header)
+        self._known_titles().add(title)
+        state = {'part': part, 'worksheet': worksheet, 'rows': 1}
+        self._current[partition] = state
+        return state
+
+    @staticmethod
+    def _last_row(response, fallback):
+        # Respons append berisi range yang ditulis, mis. "'Sheet1 2025-11'!A120:L135"
+        updated = ((response or {}).get('updates') or {}).get('updatedRange') or ''
+        match = _UPDATED_RANGE_END.search(updated)
+        return int(match.group(1)) if match else fallback
+
+
+class GoogleSheetSink(ResultSink):
+    """
+    Append ke Google Sheets.
+
+    Layout kolom sheet tetap sama seperti sebelumnya (kolom yang tampil di
+    tabel), kolom lokal seperti confidence tidak dikirim. Worksheet tujuan
+    ditentukan oleh `WorksheetPartitions` (partisi & rollover).
+    """
+
+    name = "gsheet"
+    label = "Google Sheets"
+
+    def __init__(self, connect_fn):
+        # connect_fn: fungsi tanpa argumen yang mengembalikan WorksheetPartitions (atau None)
+        self.connect_fn = connect_fn
+        self.written = {}  # judul worksheet → jumlah baris pada write terakhir
+
+    def write(self, save_df):
+        partitions = self.connect_fn()
+        if partitions is None:
+            raise RuntimeError("Tidak bisa terhubung ke Google Sheet")
+
+        sheet_df = save_df.drop(columns=[col for col in LOCAL_ONLY_COLUMNS if col in save_df.columns])
+        self.written = partitions.append(save_df, sheet_df)
+        return len(sheet_df)
+
+
+SINK_LABELS = {
+    GoogleSheetSink.name: GoogleSheetSink.label,
+    SQLiteSink.name: SQLiteSink.label,
+    ParquetSink.name: ParquetSink.label,
+}
+
+
+def parse_sink_names(value):
+    """Parse konfigurasi RESULT_SINKS ("gsheet,sqlite") menjadi list nama sink yang valid"""
+    if isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = str(value or '').split(',')
+    names = [name.strip().lower() for name in names]
+    return [name for name in dict.fromkeys(names) if name in SINK_LABELS]
+
+
+def build_sinks(names, connect_gsheet_fn, db_path, parquet_dir):
+    """Buat instance sink sesuai nama yang dipilih"""
+    sinks = []
+    for name in names:
+        if name == GoogleSheetSink.name:
+            sinks.append(GoogleSheetSink(connect_gsheet_fn))
+        elif name == SQLiteSink.name:
+            sinks.append(SQLiteSink(db_path))
+        elif name == ParquetSink.name:
+            sinks.append(ParquetSink(parquet_dir))
+    return sinks
@@ -0,0 +1,239 @@
+"""
+Scheduler prioritas bersama untuk request OCR & pekerjaan CPU dalam satu proses.
+
+Tanpa scheduler, "Scan Semua" 100 file dan kasir yang men-scan satu nota di
+replica yang sama berebut kuota API dan CPU yang sama, dan scan kasir ikut
+mengantre di belakang batch. `PriorityScheduler` membatasi jumlah pekerjaan
+yang berjalan dan memilih siapa yang jalan berikutnya:
+
+- Kelas prioritas: INTERACTIVE (scan satu file) > BATCH (Scan Semua, scan
+  ulang, ingestion API) > BACKFILL (prefetch spekulatif, persiapan job bulk)
+- Batas in-flight per kelas bersifat kumulatif: BACKFILL ≤ batasnya sendiri,
+  BATCH + BACKFILL ≤ batas BATCH, semua kelas ≤ kapasitas. Sisa kapasitas di
+  atas batas BATCH selalu tersedia untuk INTERACTIVE walau batch sedang penuh
+- Fair sharing: di antara yang menunggu di kelas yang sama, session dengan
+  pekerjaan berjalan paling sedikit (lalu yang paling lama tidak dilayani)
+  didahulukan, jadi dua batch besar bergantian, bukan satu menghabiskan slot
+- `Ticket` (kelas + session) dibawa lewat contextvar, sehingga worker thread
+  halaman PDF / tile yang dijalankan dengan `copy_context` ikut kelasnya.
+  Ticket bisa dinaikkan kelasnya (`promote`) saat user menunggu hasilnya,
+  mis. prefetch yang ternyata dipakai tombol Scan
+"""
+
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BATCH = 1
+BACKFILL = 2
+PRIORITIES = {'interactive': INTERACTIVE, 'batch': BATCH, 'backfill': BACKFILL}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+# Porsi kapasitas default untuk kelas non-interaktif (kumulatif, lihat docstring modul)
+DEFAULT_BATCH_SHARE = 0.75
+DEFAULT_BACKFILL_SHARE = 0.25
+MAX_TRACKED_SESSIONS = 1024
+
+
+def parse_priority(value, default=BATCH):
+    """'interactive' / 'batch' / 'backfill' → konstanta kelas (nilai lain → default)"""
+    return PRIORITIES.get(str(value or '').strip().lower(), default)
+
+
+class Ticket:
+    """Kelas prioritas + pemilik (session) sebuah pekerjaan"""
+
+    def __init__(self, priority=INTERACTIVE, session=None):
+        self.priority = priority
+        self.session = session
+        self._lock = threading.Lock()
+        self._schedulers = set()  # scheduler tempat ticket ini sedang menunggu
+
+    def promote(self, priority):
+        """Naikkan kelas (tidak pernah turun); antrean yang sedang ditunggu diurutkan ulang"""
+        with self._lock:
+            if priority >= self.priority:
+                return
+            self.priority = priority
+            schedulers = list(self._schedulers)
+        for scheduler in schedulers:
+            scheduler.wake()
+
+
+_current = contextvars.ContextVar('scheduler_ticket', default=None)
+_DEFAULT_TICKET = Ticket(INTERACTIVE)
+
+
+def current():
+    """Ticket pekerjaan yang sedang berjalan (tanpa ticket: INTERACTIVE tanpa session)"""
+    return _current.get() or _DEFAULT_TICKET
+
+
+@contextmanager
+def use(ticket):
+    """Jalankan blok dengan `ticket` sebagai kelas semua request OCR / tugas CPU di dalamnya"""
+    token = _current.set(ticket)
+    try:
+        yield ticket
+    finally:
+        _current.reset(token)
+
+
+def bind(ticket, fn):
+    """`fn` yang selalu dijalankan dengan `ticket` (untuk executor yang tidak membawa context)"""
+    def run(*args, **kwargs):
+        with use(ticket):
+            return fn(*args, **kwargs)
+    return run
+
+
+class _Waiter:
+    __slots__ = ('ticket', 'seq', 'priority')
+
+    def __init__(self, ticket, seq):
+        self.ticket = ticket
+        self.seq = seq
+        self.priority = None  # kelas saat slot diberikan, None = masih menunggu
+
+
+class PriorityScheduler:
+    """Slot in-flight berprioritas, dipakai bersama semua session & thread"""
+
+    def __init__(self, capacity, batch_limit=None, backfill_limit=None, name=None):
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        if batch_limit is None:
+            batch_limit = int(self.capacity * DEFAULT_BATCH_SHARE)
+        if backfill_limit is None:
+            backfill_limit = int(self.capacity * DEFAULT_BACKFILL_SHARE)
+        # Kapasitas kecil: kelas non-interaktif tetap dapat minimal satu slot
+        self.limits = {
+            INTERACTIVE: self.capacity,
+            BATCH: max(1, min(self.capacity, int(batch_limit))),
+            BACKFILL: max(1, min(self.capacity, int(backfill_limit), int(batch_limit))),
+        }
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = {priority: 0 for priority in PRIORITY_NAMES}  # per kelas saat slot diberikan
+        self._session_in_flight = {}
+        self._last_grant = {}
+        self.granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    # ---------- Pemilihan ----------
+
+    def _room(self, priority):
+        # Batas kumulatif: kelas ini + semua kelas yang lebih rendah
+        used = sum(count for level, count in self._in_flight.items() if level >= priority)
+        total = sum(self._in_flight.values())
+        return total < self.capacity and used < self.limits[priority]
+
+    def _dispatch(self):
+        granted = False
+        while self._waiting:
+            candidates = [waiter for waiter in self._waiting if self._room(waiter.ticket.priority)]
+            if not candidates:
+                break
+            chosen = min(candidates, key=lambda waiter: (
+                waiter.ticket.priority,
+                self._session_in_flight.get(waiter.ticket.session, 0),
+                self._last_grant.get(waiter.ticket.session, 0.0),
+                waiter.seq,
+            ))
+            self._waiting.remove(chosen)
+            chosen.priority = chosen.ticket.priority
+            self._take(chosen.priority, chosen.ticket.session)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _take(self, priority, session):
+        self._in_flight[priority] += 1
+        self._session_in_flight[session] = self._session_in_flight.get(session, 0) + 1
+        if len(self._last_grant) > MAX_TRACKED_SESSIONS:
+            # Session yang sudah tidak punya pekerjaan tidak perlu diingat lagi
+            self._last_grant = {key: value for key, value in self._last_grant.items() if key in self._session_in_flight}
+        self._last_grant[session] = time.monotonic()
+        self.granted[priority] += 1
+
+    def wake(self):
+        """Urutkan ulang antrean (dipanggil setelah kelas sebuah ticket dinaikkan)"""
+        with self._cond:
+            self._dispatch()
+
+    # ---------- Slot ----------
+
+    def acquire(self, ticket=None):
+        """
+        Tunggu sampai mendapat slot untuk `ticket` (default: ticket di context).
+
+        Returns:
+            kelas prioritas yang dipakai saat slot diberikan (untuk `release`)
+        """
+        ticket = ticket or current()
+        started = time.monotonic()
+        with self._cond:
+            waiter = _Waiter(ticket, next(self._seq))
+            self._waiting.append(waiter)
+            with ticket._lock:
+                ticket._schedulers.add(self)
+            try:
+                self._dispatch()
+                while waiter.priority is None:
+                    self._cond.wait()
+            except BaseException:
+                if waiter.priority is not None:
+                    self._release(waiter.priority, ticket.session)
+                else:
+                    self._waiting.remove(waiter)
+                raise
+            finally:
+                with ticket._lock:
+                    ticket._schedulers.discard(self)
+            # Kelas bisa dinaikkan selama menunggu: slot dihitung di kelas saat diberikan
+            self.wait_seconds[waiter.priority] += time.monotonic() - started
+        return waiter.priority
+
+    def release(self, priority, ticket=None):
+        ticket = ticket or current()
+        with self._cond:
+            self._release(priority, ticket.session)
+
+    def _release(self, priority, session):
+        self._in_flight[priority] -= 1
+        remaining = self._session_in_flight.get(session, 1) - 1
+        if remaining > 0:
+            self._session_in_flight[session] = remaining
+        else:
+            self._session_in_flight.pop(session, None)
+        self._dispatch()
+
+    @contextmanager
+    def slot(self, ticket=None):
+        """Context manager: satu slot selama blok berjalan"""
+        ticket = ticket or current()
+        priority = self.acquire(ticket)
+        try:
+            yield
+        finally:
+            self.release(priority, ticket)
+
+    def stats(self):
+        with self._cond:
+            waiting = {priority: 0 for priority in PRIORITY_NAMES}
+            for waiter in self._waiting:
+                waiting[waiter.ticket.priority] += 1
+            return {
+                PRIORITY_NAMES[priority]: {
+                    'in_flight': self._in_flight[priority],
+                    'waiting': waiting[priority],
+                    'limit': self.limits[priority],
+                    'granted': self.granted[priority],
+                    'mean_wait': self.wait_seconds[priority] / self.granted[priority] if self.granted[priority] else 0.0,
+                }
+                for priority in PRIORITY_NAMES
+            }
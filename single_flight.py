@@ -0,0 +1,109 @@
+"""
+Single-flight: gabungkan request OCR identik yang sedang berjalan.
+
+Jika dua session meng-upload gambar yang sama pada saat bersamaan (atau user
+klik "Scan" dua kali), cache bersama belum berisi hasilnya, sehingga kedua
+request tetap memanggil API. `SingleFlight` memastikan hanya ada SATU
+panggilan per kunci yang berjalan di proses ini; pemanggil lain untuk kunci
+yang sama menunggu panggilan tersebut dan menerima hasil yang sama.
+
+- Error dari panggilan dilempar ke SEMUA pemanggil yang menunggu, dan kunci
+  langsung dilepas sehingga request berikutnya mencoba lagi.
+- Panggilan dijalankan di thread sendiri, sehingga pemanggil yang batal
+  menunggu (timeout / cancel event) tidak membatalkan hasil untuk pemanggil
+  lain. Hasilnya tetap selesai (dan tetap masuk cache jika fungsi menyimpannya).
+  Thread tersebut membawa contextvars pemanggil pertama (mis. kelas prioritas
+  scheduler).
+"""
+
+import contextvars
+import threading
+from concurrent.futures import CancelledError, Future, TimeoutError as FutureTimeoutError
+
+
+class FlightCancelled(CancelledError):
+    """Pemanggil berhenti menunggu karena cancel event di-set"""
+
+
+class SingleFlight:
+    """Registry panggilan yang sedang berjalan, dipakai bersama semua session dalam satu proses"""
+
+    poll_interval = 0.1  # detik, seberapa sering cancel event dicek saat menunggu
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0       # panggilan yang benar-benar dijalankan
+        self.coalesced = 0   # pemanggil yang menumpang panggilan yang sudah berjalan
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key, fn, *args, timeout=None, cancel=None, **kwargs):
+        """
+        Jalankan `fn(*args, **kwargs)` sekali per `key` yang sedang berjalan.
+
+        Args:
+            key: Kunci request (mis. hash gambar + model + versi prompt)
+            timeout: Batas waktu menunggu (detik), None = tunggu sampai selesai
+            cancel: threading.Event opsional; jika di-set, pemanggil ini berhenti menunggu
+
+        Returns:
+            Hasil `fn` — objek yang SAMA untuk semua pemanggil dengan kunci yang sama,
+            copy dulu sebelum diubah
+
+        Raises:
+            Exception dari `fn`, FlightCancelled, atau TimeoutError
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            context = contextvars.copy_context()
+            thread = threading.Thread(
+                target=context.run, args=(self._run, key, future, fn, args, kwargs),
+                name="single-flight", daemon=True
+            )
+            thread.start()
+
+        return self._wait(future, timeout, cancel)
+
+    def _run(self, key, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            # Hasil/error tidak disimpan di sini: request berikutnya membaca cache
+            # bersama, atau memanggil ulang jika panggilan sebelumnya gagal
+            with self._lock:
+                if self._flights.get(key) is future:
+                    del self._flights[key]
+
+    def _wait(self, future, timeout, cancel):
+        if cancel is None:
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise TimeoutError("Menunggu hasil OCR melebihi batas waktu") from None
+
+        remaining = timeout
+        while True:
+            if cancel.is_set():
+                raise FlightCancelled("Request OCR dibatalkan")
+            step = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            try:
+                return future.result(timeout=step)
+            except FutureTimeoutError:
+                if remaining is not None:
+                    remaining -= step
+                    if remaining <= 0:
+                        raise TimeoutError("Menunggu hasil OCR melebihi batas waktu") from None
@@ -0,0 +1,124 @@
+"""
+Penyimpanan sementara di disk (spill-to-disk) untuk batch besar.
+
+Batch biasa menyimpan semua bytes file, halaman PDF, item dan DataFrame per
+item di memory sampai batch selesai. Untuk upload ratusan file, container
+kecil bisa kehabisan memory (OOM).
+
+`SpillStore` menulis bytes file dan hasil per file ke folder sementara:
+
+- bytes file & halaman PDF  : satu file per upload/halaman, dibaca saat diproses
+- baris hasil (rows)         : JSON Lines, ditulis per file yang selesai
+- log koreksi                : JSON Lines
+
+DataFrame akhir dibangun dari disk per chunk, jadi memory puncak hanya
+sebesar satu window file + DataFrame hasil, berapapun ukuran batch-nya.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+
+class SpillStore:
+    """Folder sementara untuk bytes & hasil batch. Dipakai sebagai context manager."""
+
+    def __init__(self, base_dir=None):
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix="nota-batch-", dir=base_dir)
+        self.rows_path = os.path.join(self.dir, "rows.jsonl")
+        self.logs_path = os.path.join(self.dir, "logs.jsonl")
+        self.row_count = 0
+        self.log_count = 0
+        self._file_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    # ---------- Bytes ----------
+
+    def put_file(self, fileobj):
+        """Salin file upload (file-like) ke disk secara bertahap, return path-nya"""
+        self._file_count += 1
+        path = os.path.join(self.dir, f"upload-{self._file_count:05d}.bin")
+        fileobj.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, length=1024 * 1024)
+        fileobj.seek(0)
+        return path
+
+    @staticmethod
+    def read_bytes(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def discard(path):
+        """Hapus bytes yang sudah selesai diproses"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # ---------- Hasil ----------
+
+    def append_rows(self, rows):
+        """Tambahkan baris hasil (list of dict) ke disk"""
+        if not rows:
+            return
+        with open(self.rows_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str))
+                f.write("\n")
+        self.row_count += len(rows)
+
+    def append_logs(self, logs):
+        if not logs:
+            return
+        with open(self.logs_path, "a", encoding="utf-8") as f:
+            for log in logs:
+                f.write(json.dumps(log, ensure_ascii=False))
+                f.write("\n")
+        self.log_count += len(logs)
+
+    def _iter_jsonl(self, path, limit=None):
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for idx, line in enumerate(f):
+                if limit is not None and idx >= limit:
+                    return
+                yield json.loads(line)
+
+    def read_logs(self, limit=None):
+        return list(self._iter_jsonl(self.logs_path, limit))
+
+    def iter_row_chunks(self, chunk_size=5000):
+        """Baca baris hasil per chunk (list of dict)"""
+        chunk = []
+        for row in self._iter_jsonl(self.rows_path):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def to_dataframe(self, chunk_size=5000):
+        """Bangun DataFrame hasil akhir dari disk, chunk demi chunk"""
+        frames = [pd.DataFrame.from_records(chunk) for chunk in self.iter_row_chunks(chunk_size)]
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
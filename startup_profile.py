@@ -0,0 +1,108 @@
+"""
+Profil cold start: durasi import & render pertama per proses.
+
+Streamlit menjalankan ulang `app.py` setiap interaksi, tetapi modul yang
+sudah di-import tetap tersimpan di proses, sehingga biaya import hanya
+dibayar sekali: saat container baru jalan / bangun dari sleep. Profil hanya
+dicatat untuk run pertama itu:
+
+- `mark(nama)` di beberapa titik app.py mencatat durasi sejak mark sebelumnya
+- `finish()` di akhir script menutup profil lalu menjalankan warm-up: modul
+  berat yang sengaja ditunda (Google Sheets, PDF, OpenAI) di-import di thread
+  latar belakang, setelah halaman pertama terkirim
+- Setelah warm-up selesai, profil ditulis sebagai satu baris JSON ke file log
+  sehingga perkembangannya bisa dipantau antar deploy
+"""
+
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age():
+    """Detik sejak proses dimulai (boot server + import Streamlit), None jika tidak bisa dibaca (non-Linux)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field ke-22 (starttime) dalam clock tick sejak boot; nama proses bisa berisi spasi
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Timing run pertama di proses ini (satu instance per proses, lihat PROFILE)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.process_age = _process_age()
+        self.stages = {}      # nama tahap → ms, urut sesuai mark
+        self.warm = {}        # modul → ms import di latar belakang
+        self.result = None    # dict profil setelah finish()
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Tutup tahap `name` (durasi sejak mark sebelumnya); diabaikan setelah run pertama"""
+        with self._lock:
+            if self.result is not None:
+                return
+            now = time.perf_counter()
+            self.stages[name] = round((now - self._last) * 1000, 1)
+            self._last = now
+
+    def finish(self, log_path=None, warm_modules=()):
+        """
+        Tutup profil run pertama, lalu warm-up `warm_modules` di thread latar belakang.
+
+        Returns:
+            bool: True jika ini run pertama (profil baru saja ditutup)
+        """
+        with self._lock:
+            if self.result is not None:
+                return False
+            total = (time.perf_counter() - self.started) * 1000
+            self.result = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'process_age_s': round(self.process_age, 2) if self.process_age is not None else None,
+                'first_run_ms': round(total, 1),
+                'stages_ms': dict(self.stages),
+            }
+        logger.info("Cold start: run pertama %.0f ms %s", total, self.stages)
+        threading.Thread(
+            target=self._warm_up, args=(list(warm_modules), log_path), name="startup-warm-up", daemon=True
+        ).start()
+        return True
+
+    def _warm_up(self, modules, log_path):
+        for name in modules:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                logger.warning("Warm-up import %s gagal: %s", name, e)
+                continue
+            self.warm[name] = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            self.result['warm_ms'] = dict(self.warm)
+            record = dict(self.result)
+        if log_path:
+            try:
+                directory = os.path.dirname(log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(log_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning("Profil startup tidak bisa ditulis ke %s: %s", log_path, e)
+
+
+PROFILE = StartupProfile()
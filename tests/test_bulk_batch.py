@@ -0,0 +1,57 @@
+"""`bulk_batch.OpenAIBatchBackend` lawan stand-in Batch API dari load_test (client OpenAI sungguhan)"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_batch  # noqa: E402
+from load_test import FakeBatchServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    server = FakeBatchServer(latency=0.2, items=2, error_every=3)
+    yield server
+    server.close()
+
+
+def test_submit_poll_download(server, tmp_path):
+    from openai import OpenAI
+
+    backend = bulk_batch.OpenAIBatchBackend(OpenAI(api_key="sk-test", base_url=server.base_url))
+    items = [{'custom_id': f"job-{index}"} for index in range(4)]
+    batches = [
+        (backend.submit(path, metadata={'job_id': "job"}), custom_ids)
+        for path, custom_ids in bulk_batch.write_batches(items, lambda item: {'model': "gpt-4o"}, tmp_dir=tmp_path)
+    ]
+    assert len(batches) == 1
+    batch_id, custom_ids = batches[0]
+    assert backend.retrieve(batch_id)['status'] == "in_progress"
+
+    time.sleep(0.3)
+    info = backend.retrieve(batch_id)
+    assert info['status'] in bulk_batch.BATCH_FINISHED
+    results = {}
+    for file_id in (info['output_file_id'], info['error_file_id']):
+        for line in backend.download(file_id).splitlines():
+            custom_id, body, error = bulk_batch.parse_output_line(line)
+            results[custom_id] = (body, error)
+
+    assert sorted(results) == sorted(custom_ids)
+    assert results["job-2"] == (None, "Stand-in: request gagal")
+    assert results["job-0"][0]['choices'][0]['finish_reason'] == "stop"
+
+
+def test_cancel(server, tmp_path):
+    from openai import OpenAI
+
+    backend = bulk_batch.OpenAIBatchBackend(OpenAI(api_key="sk-test", base_url=server.base_url))
+    for path, _ in bulk_batch.write_batches([{'custom_id': "a"}], lambda item: {}, tmp_dir=tmp_path):
+        batch_id = backend.submit(path)
+    backend.cancel(batch_id)
+    time.sleep(0.3)
+    assert backend.retrieve(batch_id)['status'] in bulk_batch.BATCH_RETRYABLE
@@ -0,0 +1,149 @@
+"""`endpoint_pool.EndpointPool`: failover, circuit breaker open → half-open → closed"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import endpoint_pool  # noqa: E402
+from endpoint_pool import (  # noqa: E402
+    BASE_COOLDOWN, CLOSED, FAILURE_THRESHOLD, HALF_OPEN, OPEN, Endpoint, EndpointPool, NoHealthyEndpoint,
+    parse_endpoints,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class EndpointDown(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(endpoint_pool, 'time', clock)
+    return clock
+
+
+def make_pool(*names):
+    endpoints = [Endpoint(name, f"http://{name}/v1", client=object()) for name in names]
+    pool = EndpointPool(endpoints, lambda e: isinstance(e, EndpointDown), rng=random.Random(0))
+    return pool, {endpoint.name: endpoint for endpoint in endpoints}
+
+
+def failing_on(*down):
+    calls = []
+
+    def fn(endpoint):
+        calls.append(endpoint.name)
+        if endpoint.name in down:
+            raise EndpointDown(endpoint.name)
+        return endpoint.name
+
+    return fn, calls
+
+
+def trip(pool, endpoint):
+    for _ in range(FAILURE_THRESHOLD):
+        pool._acquire({other for other in pool.endpoints if other is not endpoint})
+        pool._record_failure(endpoint, EndpointDown(endpoint.name))
+
+
+def test_failover_to_healthy_endpoint(clock):
+    pool, endpoints = make_pool("a", "b")
+    fn, calls = failing_on("a")
+    # Skor "a" turun setiap kali gagal, jadi makin jarang terpilih sampai circuit-nya dibuka
+    for _ in range(500):
+        assert pool.call(fn) == "b"
+        if endpoints['a'].state == OPEN:
+            break
+    assert endpoints['a'].state == OPEN
+    assert calls.count("a") == FAILURE_THRESHOLD
+
+    # Selama cooldown, endpoint "a" tidak dicoba lagi
+    for _ in range(20):
+        assert pool.call(fn) == "b"
+    assert calls.count("a") == FAILURE_THRESHOLD
+
+
+def test_request_error_is_not_endpoint_failure(clock):
+    pool, endpoints = make_pool("a")
+
+    def bad_request(endpoint):
+        raise ValueError("400 bad request")
+
+    for _ in range(FAILURE_THRESHOLD + 1):
+        with pytest.raises(ValueError):
+            pool.call(bad_request)
+    assert endpoints['a'].state == CLOSED
+    assert endpoints['a'].failures == 0
+    assert endpoints['a'].in_flight == 0
+
+
+def test_open_then_half_open_probe_recovers(clock):
+    pool, endpoints = make_pool("a")
+    trip(pool, endpoints['a'])
+    assert endpoints['a'].state == OPEN
+    with pytest.raises(NoHealthyEndpoint):
+        pool.call(lambda endpoint: "ok")
+
+    clock.now += BASE_COOLDOWN
+    probe = pool._acquire(set())
+    assert (probe.state, probe.probing) == (HALF_OPEN, True)
+    # Selama probe berjalan, request lain tidak ikut dikirim ke endpoint itu
+    with pytest.raises(NoHealthyEndpoint):
+        pool._acquire(set())
+
+    pool._record_success(probe, 0.5)
+    assert endpoints['a'].state == CLOSED
+    assert endpoints['a'].trips == 0
+    assert pool.call(lambda endpoint: "ok") == "ok"
+
+
+def test_failed_probe_reopens_with_longer_cooldown(clock):
+    pool, endpoints = make_pool("a")
+    trip(pool, endpoints['a'])
+    first_until = endpoints['a'].open_until
+
+    clock.now = first_until
+    fn, _ = failing_on("a")
+    with pytest.raises(EndpointDown):
+        pool.call(fn)
+    assert endpoints['a'].state == OPEN
+    assert endpoints['a'].open_until - clock.now == 2 * BASE_COOLDOWN
+
+    clock.now += BASE_COOLDOWN
+    with pytest.raises(NoHealthyEndpoint):
+        pool.call(fn)
+
+
+def test_all_endpoints_failing_raises_last_error(clock):
+    pool, _ = make_pool("a", "b")
+    fn, calls = failing_on("a", "b")
+    with pytest.raises(EndpointDown):
+        pool.call(fn)
+    assert sorted(calls[:2]) == ["a", "b"]
+    assert all(snapshot['in_flight'] == 0 for snapshot in pool.health())
+
+
+def test_parse_endpoints():
+    parsed = parse_endpoints('[{"base_url": "http://a/v1", "weight": 2}, {"name": "b", "base_url": "http://b/v1"}]',
+                             default_api_key="sk-default")
+    assert parsed == [
+        {'name': "endpoint-1", 'base_url': "http://a/v1", 'api_key': "sk-default", 'weight': 2.0},
+        {'name': "b", 'base_url': "http://b/v1", 'api_key': "sk-default", 'weight': 1.0},
+    ]
+    with pytest.raises(ValueError):
+        parse_endpoints([{'name': "tanpa url"}])
@@ -0,0 +1,90 @@
+"""Batas ukuran upload `ingest_api` juga berlaku untuk body chunked (tanpa Content-Length)"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest_api  # noqa: E402
+
+BOUNDARY = "nota-test-boundary"
+
+
+def multipart_chunks(file_size, content_type, chunk_size=64 * 1024):
+    """Body multipart satu field `file`, dipecah per chunk seperti transfer chunked"""
+    yield (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="nota.bin"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    remaining = file_size
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield b"x" * size
+        remaining -= size
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def post_chunked(chunks):
+    """Kirim POST /v1/nota langsung ke aplikasi ASGI; returns (status, body JSON, jumlah chunk dibaca)"""
+    chunks = list(chunks)
+    sent = {'chunks': 0}
+    response = {}
+
+    async def receive():
+        index = sent['chunks']
+        sent['chunks'] += 1
+        if index >= len(chunks):
+            return {'type': 'http.disconnect'}
+        return {'type': 'http.request', 'body': chunks[index], 'more_body': index < len(chunks) - 1}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] = response.get('body', b'') + message.get('body', b'')
+
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': '/v1/nota',
+        'raw_path': b'/v1/nota',
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'content-type', f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b'transfer-encoding', b'chunked'),
+        ],
+        'client': ('127.0.0.1', 5000),
+        'server': ('testserver', 80),
+    }
+    asyncio.run(ingest_api.app(scope, receive, send))
+    return response['status'], json.loads(response['body']), sent['chunks']
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(ingest_api, 'INGEST_API_TOKEN', None)
+    monkeypatch.setattr(ingest_api, 'INGEST_MAX_UPLOAD_MB', 0.5)
+
+
+def test_chunked_oversize_body_is_rejected(small_limit):
+    chunks = list(multipart_chunks(5 * 1024 * 1024, "image/jpeg"))
+    status, body, read = post_chunked(chunks)
+    assert status == 413
+    assert "maksimal" in body['error']
+    # Berhenti membaca begitu batas terlewati, tidak menampung seluruh body
+    assert read < len(chunks) // 2
+
+
+def test_chunked_body_within_limit_is_parsed(small_limit):
+    # Tipe file ditolak setelah form selesai di-parse: artinya body kecil lolos batas ukuran
+    status, body, _ = post_chunked(multipart_chunks(100 * 1024, "text/plain"))
+    assert status == 415
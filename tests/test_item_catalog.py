@@ -0,0 +1,82 @@
+"""`item_catalog.ItemCatalog`: normalisasi nama, lookup trigram & persistensi SQLite"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from item_catalog import ItemCatalog, name_trigrams, normalize_name  # noqa: E402
+
+
+def catalog(rows, **kwargs):
+    items = ItemCatalog(**kwargs)
+    items.add_many(rows)
+    return items
+
+
+def test_normalize_name_strips_indicators_and_punctuation():
+    assert normalize_name("⚠️ Minyak  Goreng, 1L!") == "minyak goreng 1l"
+    assert normalize_name(None) == ""
+    assert name_trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_lookup_exact_key_scores_one():
+    items = catalog([("Minyak Goreng", "Bama")])
+    entry, score = items.lookup("MINYAK goreng.")
+    assert entry['nama_barang'] == "Minyak Goreng"
+    assert score == 1.0
+
+
+def test_lookup_corrects_ocr_typo():
+    items = catalog([("Minyak Goreng", "Bama"), ("Sabun Mandi", "Non Bama")])
+    entry, score = items.lookup("Mlnyak Goreng")
+    assert entry['nama_barang'] == "Minyak Goreng"
+    assert items.threshold <= score < 1.0
+
+
+def test_lookup_rejects_dissimilar_and_different_numbers():
+    items = catalog([("Gula Pasir 1kg", "Bama")])
+    assert items.lookup("Kopi Bubuk") is None
+    # Ukuran berbeda bukan barang yang sama walau trigramnya hampir identik
+    assert items.lookup("Gula Pasir 2kg") is None
+
+
+def test_lookup_prefers_most_confirmed_on_tie():
+    items = catalog([("Teh Celup A", "Bama"), ("Teh Celup B", "Bama")])
+    items.add_many([("Teh Celup B", "Bama")])
+    entry, _ = items.lookup("Teh Celup")
+    assert entry['nama_barang'] == "Teh Celup B"
+
+
+def test_add_many_skips_invalid_rows():
+    items = ItemCatalog()
+    assert items.add_many([("", "Bama"), ("Beras", "Lainnya"), ("!!!", "Bama"), ("Beras", "Bama")]) == 1
+    assert items.add_many([("beras", "Bama")]) == 0
+    assert len(items) == 1
+
+
+def test_apply_normalizes_name_and_category():
+    items = catalog([("Minyak Goreng", "Bama")])
+    rows = [
+        {'nama_barang': "Mlnyak Goreng", 'kategori_transaksi': "Non Bama", 'confidence': {'nama_barang': 60}},
+        {'nama_barang': "Barang Baru", 'kategori_transaksi': "Non Bama"},
+    ]
+    rows, logs = items.apply(rows)
+    assert rows[0]['nama_barang'] == "Minyak Goreng"
+    assert rows[0]['kategori_transaksi'] == "Bama"
+    assert rows[0]['confidence']['kategori_transaksi'] == 100
+    assert rows[0]['confidence']['nama_barang'] > 60
+    assert rows[1] == {'nama_barang': "Barang Baru", 'kategori_transaksi': "Non Bama"}
+    assert len(logs) == 2
+
+
+def test_catalog_persists_to_sqlite(tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    catalog([("Minyak Goreng", "Bama")], db_path=db_path)
+    catalog([("minyak goreng", "Bama")], db_path=db_path)
+
+    reloaded = ItemCatalog(db_path=db_path)
+    assert len(reloaded) == 1
+    entry, _ = reloaded.lookup("Minyak Goreng")
+    assert entry['nama_barang'] == "minyak goreng"
+    assert entry['hits'] == 2
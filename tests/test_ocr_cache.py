@@ -0,0 +1,62 @@
+"""`ocr_cache.SQLiteCache`: cache hit hanya menulis accessed_at jika sudah lebih lama dari touch_interval"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_cache import SQLiteCache  # noqa: E402
+
+
+def accessed_at(cache, key):
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        return conn.execute(f"SELECT accessed_at FROM {cache.table} WHERE key = ?", (key,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def set_accessed_at(cache, key, value):
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        with conn:
+            conn.execute(f"UPDATE {cache.table} SET accessed_at = ? WHERE key = ?", (value, key))
+    finally:
+        conn.close()
+
+
+def test_recent_hit_does_not_write(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl_seconds=3600, max_bytes=1024 * 1024)
+    cache.set("a", b"value")
+    written = accessed_at(cache, "a")
+
+    assert cache.get("a") == b"value"
+    assert accessed_at(cache, "a") == written
+
+
+def test_stale_hit_is_touched(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl_seconds=3600, max_bytes=1024 * 1024)
+    cache.set("a", b"value")
+    old = accessed_at(cache, "a") - cache.touch_interval - 1
+    set_accessed_at(cache, "a", old)
+
+    assert cache.get("a") == b"value"
+    assert accessed_at(cache, "a") > old + cache.touch_interval
+
+
+def test_touched_entry_survives_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl_seconds=3600, max_bytes=250, max_entry_bytes=100)
+    cache.set("old", b"x" * 100)
+    cache.set("used", b"x" * 100)
+    base = accessed_at(cache, "used")
+    set_accessed_at(cache, "old", base - 2 * cache.touch_interval)
+    set_accessed_at(cache, "used", base - 3 * cache.touch_interval)
+
+    # "used" dibaca: accessed_at-nya diperbarui, jadi "old" yang dibuang saat batas terlewati
+    assert cache.get("used") is not None
+    cache.set("new", b"x" * 100)
+    cache.evict()
+    assert cache.get("old") is None
+    assert cache.get("used") is not None
+    assert cache.get("new") is not None
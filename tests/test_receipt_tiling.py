@@ -0,0 +1,66 @@
+"""`receipt_tiling`: potong struk panjang & gabungkan item dari band overlap tanpa duplikat"""
+
+import os
+import sys
+from io import BytesIO
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from receipt_tiling import merge_tile_items, same_line, split_tiles, tile_count  # noqa: E402
+
+
+def item(name, qty=1, total=10000, confidence=90):
+    return {'nama_barang': name, 'qty': qty, 'total_harga': total, 'confidence': {'nama_barang': confidence}}
+
+
+def names(items):
+    return [row['nama_barang'] for row in items]
+
+
+def test_overlap_band_is_taken_once():
+    tiles = [
+        [item("Gula"), item("Kopi"), item("Teh")],
+        [item("Kopi"), item("Teh"), item("Susu"), item("Roti")],
+        [item("Roti"), item("Beras")],
+    ]
+    assert names(merge_tile_items(tiles)) == ["Gula", "Kopi", "Teh", "Susu", "Roti", "Beras"]
+
+
+def test_overlap_keeps_higher_confidence_version():
+    tiles = [
+        [item("Gula"), item("Kop", total=0, confidence=40)],  # baris terpotong di tepi bawah tile
+        [item("Kopi Bubuk", confidence=95), item("Teh")],
+    ]
+    merged = merge_tile_items(tiles)
+    # "Kop" vs "Kopi Bubuk" kurang mirip: bukan baris yang sama
+    assert names(merged) == ["Gula", "Kop", "Kopi Bubuk", "Teh"]
+
+    tiles = [
+        [item("Gula"), item("Kopi Bubk", total=0, confidence=40)],
+        [item("Kopi Bubuk", confidence=95), item("Teh")],
+    ]
+    assert names(merge_tile_items(tiles)) == ["Gula", "Kopi Bubuk", "Teh"]
+
+
+def test_same_name_with_different_amount_is_not_merged():
+    tiles = [[item("Air Mineral", qty=1)], [item("Air Mineral", qty=2)]]
+    assert len(merge_tile_items(tiles)) == 2
+    assert not same_line(item("Air Mineral", total=3000), item("Air Mineral", total=6000))
+
+
+def test_empty_tiles_are_skipped():
+    assert names(merge_tile_items([[], None, [item("Gula")], []])) == ["Gula"]
+
+
+def test_split_tiles_only_for_tall_images():
+    def jpeg(width, height):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'white').save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    assert split_tiles(jpeg(400, 600)) is None
+    tiles = split_tiles(jpeg(400, 2000))
+    assert len(tiles) == tile_count(400, 2000)
+    assert all(Image.open(BytesIO(tile)).size == (400, 560) for tile in tiles)
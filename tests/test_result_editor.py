@@ -0,0 +1,95 @@
+"""`result_editor.apply_changes`: edit/tambah/hapus per row key, ringkasan berjalan = hitung ulang penuh"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_editor  # noqa: E402
+from load_test import fake_ocr_content  # noqa: E402
+from nota_pipeline import prepare_dataframe_with_confidence  # noqa: E402
+
+
+@pytest.fixture
+def result():
+    content = fake_ocr_content(12, seed=3)
+    df = prepare_dataframe_with_confidence(content['items'], content['metadata'])
+    result_editor.recalculate_totals(df)
+    return df, result_editor.compute_totals(df), result_editor.compute_warnings(df)
+
+
+def assert_matches_full_recompute(df, totals, warnings):
+    full = df.copy()
+    result_editor.recalculate_totals(full)
+    expected = result_editor.compute_totals(full)
+    assert totals['items'] == expected['items']
+    assert totals['qty'] == pytest.approx(expected['qty'])
+    assert totals['grand_total'] == pytest.approx(expected['grand_total'])
+    assert warnings == result_editor.compute_warnings(full)
+    assert (df['total_harga'] == full['total_harga']).all()
+
+
+def test_edit_maps_slice_position_to_row_key(result):
+    df, totals, warnings = result
+    row_keys = result_editor.page_keys(df.index, page=2, page_size=5)  # key 5..9
+    changes = {'edited_rows': {1: {'qty': 4, 'harga_satuan': 2500}}}
+
+    df, changed = result_editor.apply_changes(df, row_keys, changes, totals=totals, warnings=warnings)
+
+    assert changed == {'edited': [6], 'added': [], 'deleted': []}
+    assert df.at[6, 'total_harga'] == 10000
+    assert df.at[6, '_conf_qty'] == 100
+    assert_matches_full_recompute(df, totals, warnings)
+
+
+def test_edit_clears_and_adds_warnings(result):
+    df, totals, warnings = result
+    row_keys = df.index.tolist()
+
+    df, _ = result_editor.apply_changes(df, row_keys, {'edited_rows': {0: {'qty': 0}}}, totals=totals, warnings=warnings)
+    assert "Qty harus lebih dari 0" in warnings[0]
+
+    df, _ = result_editor.apply_changes(df, row_keys, {'edited_rows': {0: {'qty': 2}}}, totals=totals, warnings=warnings)
+    assert "Qty harus lebih dari 0" not in warnings.get(0, [])
+    assert_matches_full_recompute(df, totals, warnings)
+
+
+def test_add_rows_gets_new_keys_and_defaults(result):
+    df, totals, warnings = result
+    changes = {'added_rows': [{'nama_barang': "Barang Baru", 'qty': 2, 'harga_satuan': 3000, '_conf_qty': 10}]}
+
+    df, changed = result_editor.apply_changes(
+        df, df.index.tolist(), changes, defaults={'source_file': "nota.jpg"}, totals=totals, warnings=warnings
+    )
+
+    assert changed['added'] == [12]
+    assert df.at[12, 'total_harga'] == 6000
+    assert df.at[12, 'source_file'] == "nota.jpg"
+    assert df.at[12, '_conf_qty'] == 100  # kolom internal tidak bisa diisi dari editor
+    assert_matches_full_recompute(df, totals, warnings)
+
+
+def test_delete_rows_keeps_other_keys(result):
+    df, totals, warnings = result
+    row_keys = result_editor.page_keys(df.index, page=1, page_size=5)
+    changes = {'edited_rows': {2: {'qty': 9}}, 'deleted_rows': [0, 2]}
+
+    df, changed = result_editor.apply_changes(df, row_keys, changes, totals=totals, warnings=warnings)
+
+    assert changed == {'edited': [], 'added': [], 'deleted': [0, 2]}
+    assert 0 not in df.index and 2 not in df.index
+    assert df.index.tolist()[:3] == [1, 3, 4]
+    assert_matches_full_recompute(df, totals, warnings)
+
+
+def test_mixed_changes_sequence(result):
+    df, totals, warnings = result
+    for changes in (
+        {'edited_rows': {3: {'harga_satuan': 0}}},
+        {'added_rows': [{'nama_barang': "", 'qty': 1, 'harga_satuan': 500}]},
+        {'deleted_rows': [5], 'edited_rows': {1: {'qty': 0.5}}},
+    ):
+        df, _ = result_editor.apply_changes(df, df.index.tolist(), changes, totals=totals, warnings=warnings)
+    assert_matches_full_recompute(df, totals, warnings)
@@ -0,0 +1,51 @@
+"""Regresi `result_store.WorksheetPartitions` dengan spreadsheet di memory dari load_test"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import FakeSpreadsheet  # noqa: E402
+from result_store import WorksheetPartitions  # noqa: E402
+
+
+def frames(stores):
+    save_df = pd.DataFrame({'nama_toko': stores, 'nama_barang': [f"Barang {i}" for i in range(len(stores))]})
+    return save_df, save_df[['nama_toko', 'nama_barang']]
+
+
+def broken_append(rows):
+    raise RuntimeError("quota exceeded")
+
+
+def test_rollover_after_failed_append_of_other_partition():
+    spreadsheet = FakeSpreadsheet(latency=0)
+    partitions = WorksheetPartitions(spreadsheet, "Sheet1", mode='store', rollover_rows=3)
+    partitions.append(*frames(["A", "B"]))
+
+    spreadsheet.worksheet("Sheet1 B").append_rows = broken_append
+    with pytest.raises(RuntimeError):
+        partitions.append(*frames(["B"]))
+
+    # Partisi A masih memakai handle cache-nya dan harus bisa rollover ke worksheet baru
+    written = partitions.append(*frames(["A"] * 4))
+    assert written == {"Sheet1 A": 1, "Sheet1 A (2)": 2, "Sheet1 A (3)": 1}
+    assert [row[1] for row in spreadsheet.worksheet("Sheet1 A (2)").rows] == ['nama_barang', 'Barang 1', 'Barang 2']
+
+
+def test_failed_partition_reopens_existing_worksheet():
+    spreadsheet = FakeSpreadsheet(latency=0)
+    partitions = WorksheetPartitions(spreadsheet, "Sheet1", mode='store', rollover_rows=3)
+    partitions.append(*frames(["B"]))
+    worksheet = spreadsheet.worksheet("Sheet1 B")
+    original = worksheet.append_rows
+    worksheet.append_rows = broken_append
+    with pytest.raises(RuntimeError):
+        partitions.append(*frames(["B"]))
+
+    worksheet.append_rows = original
+    assert partitions.append(*frames(["B"])) == {"Sheet1 B": 1}
+    assert len(worksheet.rows) == 3
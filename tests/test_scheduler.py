@@ -0,0 +1,153 @@
+"""`scheduler.PriorityScheduler`: urutan kelas, batas kumulatif, fair sharing & promote"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler  # noqa: E402
+from scheduler import BACKFILL, BATCH, INTERACTIVE, PriorityScheduler, Ticket  # noqa: E402
+
+
+class Worker:
+    """Thread yang mengambil satu slot, mencatat urutan dapat slot, lalu menahan slot sampai `done` di-set"""
+
+    def __init__(self, pool, ticket, name, order):
+        self.done = threading.Event()
+        self.granted = threading.Event()
+
+        def run():
+            with pool.slot(ticket):
+                order.append(name)
+                self.granted.set()
+                assert self.done.wait(5)
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def finish(self):
+        self.done.set()
+        self.thread.join(5)
+
+
+def wait_waiting(pool, count):
+    deadline = time.monotonic() + 5
+    while sum(entry['waiting'] for entry in pool.stats().values()) < count:
+        assert time.monotonic() < deadline, "worker tidak masuk antrean"
+        time.sleep(0.005)
+
+
+def drain(workers):
+    """Selesaikan worker satu per satu sesuai urutan dapat slot"""
+    pending = list(workers)
+    deadline = time.monotonic() + 5
+    while pending:
+        running = [worker for worker in pending if worker.granted.is_set()]
+        if not running:
+            assert time.monotonic() < deadline, "worker tidak pernah dapat slot"
+            time.sleep(0.005)
+            continue
+        running[0].finish()
+        pending.remove(running[0])
+
+
+def test_higher_class_runs_first():
+    pool = PriorityScheduler(1)
+    order = []
+    holder = Worker(pool, Ticket(BATCH, "a"), "holder", order)
+    assert holder.granted.wait(5)
+
+    workers = []
+    for priority, name in ((BACKFILL, "backfill"), (BATCH, "batch"), (INTERACTIVE, "interactive")):
+        workers.append(Worker(pool, Ticket(priority, name), name, order))
+        wait_waiting(pool, len(workers))
+
+    holder.finish()
+    drain(workers)
+    assert order == ["holder", "interactive", "batch", "backfill"]
+
+
+def test_batch_limit_leaves_room_for_interactive():
+    pool = PriorityScheduler(4, batch_limit=3, backfill_limit=1)
+    order = []
+    batch = [Worker(pool, Ticket(BATCH, "scan-semua"), f"batch-{i}", order) for i in range(4)]
+    wait_waiting(pool, 1)
+    assert pool.stats()['batch']['in_flight'] == 3
+
+    interactive = Worker(pool, Ticket(INTERACTIVE, "kasir"), "interactive", order)
+    assert interactive.granted.wait(5)
+    interactive.finish()
+    assert "interactive" in order and len(order) == 4
+    drain(batch)
+
+
+def test_batch_limit_includes_backfill():
+    pool = PriorityScheduler(4, batch_limit=2, backfill_limit=2)
+    order = []
+    backfill = [Worker(pool, Ticket(BACKFILL, "prefetch"), f"backfill-{i}", order) for i in range(2)]
+    for worker in backfill:
+        assert worker.granted.wait(5)
+
+    # BATCH + BACKFILL ≤ batas BATCH: batch menunggu, interactive tetap jalan
+    batch = Worker(pool, Ticket(BATCH, "scan-semua"), "batch", order)
+    wait_waiting(pool, 1)
+    interactive = Worker(pool, Ticket(INTERACTIVE, "kasir"), "interactive", order)
+    assert interactive.granted.wait(5)
+    assert not batch.granted.is_set()
+
+    drain(backfill[:1])
+    assert batch.granted.wait(5)
+    drain(backfill[1:] + [batch, interactive])
+
+
+def test_fair_sharing_alternates_sessions():
+    pool = PriorityScheduler(1)
+    order = []
+    holder = Worker(pool, Ticket(BATCH, "a"), "holder", order)
+    assert holder.granted.wait(5)
+
+    workers = []
+    for name in ("a1", "a2", "b1", "b2"):
+        workers.append(Worker(pool, Ticket(BATCH, name[0]), name, order))
+        wait_waiting(pool, len(workers))
+
+    holder.finish()
+    drain(workers)
+    # Session "a" baru saja dilayani (holder), jadi "b" didahulukan lalu bergantian
+    assert order[1:] == ["b1", "a1", "b2", "a2"]
+
+
+def test_promote_reorders_waiting_ticket():
+    pool = PriorityScheduler(1)
+    order = []
+    holder = Worker(pool, Ticket(INTERACTIVE, "x"), "holder", order)
+    assert holder.granted.wait(5)
+
+    prefetch_ticket = Ticket(BACKFILL, "kasir")
+    prefetch = Worker(pool, prefetch_ticket, "prefetch", order)
+    wait_waiting(pool, 1)
+    batch = Worker(pool, Ticket(BATCH, "scan-semua"), "batch", order)
+    wait_waiting(pool, 2)
+
+    prefetch_ticket.promote(INTERACTIVE)
+    prefetch_ticket.promote(BACKFILL)  # tidak pernah turun
+    assert prefetch_ticket.priority == INTERACTIVE
+    assert pool.stats()['interactive']['waiting'] == 1
+
+    holder.finish()
+    drain([prefetch, batch])
+    assert order == ["holder", "prefetch", "batch"]
+    assert pool.stats()['interactive']['granted'] == 2
+
+
+def test_ticket_follows_context():
+    ticket = Ticket(BACKFILL, "s")
+    assert scheduler.current().priority == INTERACTIVE
+    with scheduler.use(ticket):
+        assert scheduler.current() is ticket
+        assert scheduler.bind(Ticket(BATCH), scheduler.current)().priority == BATCH
+    assert scheduler.current().priority == INTERACTIVE
+    assert scheduler.parse_priority("Backfill") == BACKFILL
+    assert scheduler.parse_priority("lainnya") == BATCH
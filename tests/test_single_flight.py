@@ -0,0 +1,112 @@
+"""`single_flight.SingleFlight`: request identik digabung, error diteruskan ke semua pemanggil"""
+
+import contextvars
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from single_flight import FlightCancelled, SingleFlight  # noqa: E402
+
+
+class BlockingCall:
+    """Fungsi yang menahan panggilan sampai `release` di-set, mencatat jumlah panggilan"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result if self.result is not None else (args, kwargs)
+
+
+def wait_for_followers(flight, count):
+    for _ in range(500):
+        if flight.coalesced >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("pemanggil tidak bergabung ke flight")
+
+
+def test_identical_calls_share_one_result():
+    flight = SingleFlight()
+    call = BlockingCall(result={'items': [1, 2]})
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "nota-a", call) for _ in range(4)]
+        assert call.started.wait(5)
+        wait_for_followers(flight, 3)
+        call.release.set()
+        results = [future.result(5) for future in futures]
+
+    assert call.calls == 1
+    assert all(result is results[0] for result in results)
+    assert (flight.calls, flight.coalesced, flight.in_flight()) == (1, 3, 0)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda value: value * 2, 2) == 4
+    assert flight.do("b", lambda value: value * 3, 2) == 6
+    assert (flight.calls, flight.coalesced) == (2, 0)
+
+
+def test_error_reaches_every_caller_and_key_is_released():
+    flight = SingleFlight()
+    call = BlockingCall(error=ValueError("rate limited"))
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, "nota-a", call) for _ in range(3)]
+        assert call.started.wait(5)
+        wait_for_followers(flight, 2)
+        call.release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="rate limited"):
+                future.result(5)
+
+    # Request berikutnya mencoba lagi, bukan menerima error lama
+    assert flight.in_flight() == 0
+    assert flight.do("nota-a", lambda: "ok") == "ok"
+    assert flight.calls == 2
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight()
+    flight.poll_interval = 0.01
+    call = BlockingCall(result="hasil")
+    cancel = threading.Event()
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "nota-a", call)
+        assert call.started.wait(5)
+        follower = pool.submit(flight.do, "nota-a", call, cancel=cancel)
+        wait_for_followers(flight, 1)
+        cancel.set()
+        with pytest.raises(FlightCancelled):
+            follower.result(5)
+        call.release.set()
+        assert leader.result(5) == "hasil"
+
+
+def test_timeout_while_waiting():
+    flight = SingleFlight()
+    call = BlockingCall()
+    with pytest.raises(TimeoutError):
+        flight.do("nota-a", call, timeout=0.05)
+    call.release.set()
+
+
+def test_call_runs_with_leader_context():
+    priority = contextvars.ContextVar('priority', default=None)
+    flight = SingleFlight()
+    priority.set("interactive")
+    assert flight.do("nota-a", priority.get) == "interactive"
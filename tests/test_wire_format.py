@@ -0,0 +1,94 @@
+"""`wire_format.expand`: respons compact kembali ke bentuk standar, termasuk baris yang tidak rapi"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import fake_ocr_content  # noqa: E402
+from wire_format import (  # noqa: E402
+    CATEGORY_CODES, COMPACT, ITEM_FIELDS, MAX_OUTPUT_TOKENS, METADATA_FIELDS, MIN_OUTPUT_TOKENS, VERBOSE,
+    expand, max_tokens, unpack_confidence,
+)
+
+CODES = {name: code for code, name in CATEGORY_CODES.items()}
+
+
+def pack_confidence(confidence, fields):
+    return ''.join(f"{min(confidence[field], 99):02d}" for field in fields)
+
+
+def to_compact(result):
+    """Encoder referensi: bentuk standar → format compact seperti yang ditulis model"""
+    metadata = result['metadata']
+    rows = []
+    for item in result['items']:
+        row = [item[field] for field in ITEM_FIELDS]
+        row[ITEM_FIELDS.index('kategori_transaksi')] = CODES[item['kategori_transaksi']]
+        rows.append(row + [pack_confidence(item['confidence'], ITEM_FIELDS)])
+    return {
+        'm': [metadata[field] for field in METADATA_FIELDS],
+        'mc': pack_confidence(metadata['confidence'], ['tanggal', 'nama_toko', 'jenis_pembayaran']),
+        'i': rows,
+    }
+
+
+def test_round_trip():
+    verbose = fake_ocr_content(8, seed=5)
+    for item in verbose['items']:
+        item['confidence'] = {field: min(score, 99) for field, score in item['confidence'].items()}
+
+    expanded = expand(to_compact(verbose))
+
+    for field in METADATA_FIELDS:
+        assert expanded['metadata'].get(field) == verbose['metadata'][field]
+    for original, item in zip(verbose['items'], expanded['items']):
+        for field in ITEM_FIELDS:
+            assert item[field] == original[field]
+        assert item['confidence'] == original['confidence']
+    assert len(expanded['items']) == len(verbose['items'])
+
+
+def test_standard_response_is_returned_as_is():
+    verbose = fake_ocr_content(2, seed=1)
+    assert expand(verbose) is verbose
+    assert expand(None) is None
+    assert expand({'error': "x"}) == {'error': "x"}
+
+
+def test_malformed_rows():
+    expanded = expand({
+        'm': ["2025-01-02", "Toko"],                              # metadata kurang
+        'mc': "9x9",                                              # confidence rusak/ganjil
+        'i': [
+            ["Gula", 1],                                          # baris pendek
+            ["Kopi", 2, None, 5000, 10000, " n ", "9990"],        # kategori huruf kecil + spasi
+            ["Teh", 1, "pcs", 3000, 3000, "Lainnya", [95, "x", 200]],
+            {'nama_barang': "Susu", 'qty': 1},                    # model menulis object
+            None,
+        ],
+    })
+
+    assert expanded['metadata'] == {'tanggal': "2025-01-02", 'nama_toko': "Toko", 'confidence': {'tanggal': 99}}
+    gula, kopi, teh, susu, empty = expanded['items']
+    assert gula == {'nama_barang': "Gula", 'qty': 1}
+    assert 'unit' not in kopi
+    assert kopi['kategori_transaksi'] == "Non Bama"
+    assert kopi['confidence'] == {'nama_barang': 99, 'qty': 90}
+    assert teh['kategori_transaksi'] == "Lainnya"
+    assert teh['confidence'] == {'nama_barang': 95, 'unit': 100}
+    assert susu == {'nama_barang': "Susu", 'qty': 1}
+    assert empty == {}
+
+
+def test_unpack_confidence_clamps_and_skips():
+    assert unpack_confidence("95-99 9", ['a', 'b', 'c']) == {'a': 95, 'b': 99}
+    assert unpack_confidence([120, -5], ['a', 'b']) == {'a': 100, 'b': 0}
+    assert unpack_confidence(None, ['a']) == {}
+
+
+def test_max_tokens_scales_with_items():
+    assert max_tokens(COMPACT) == MAX_OUTPUT_TOKENS
+    assert max_tokens(COMPACT, 3) == MIN_OUTPUT_TOKENS
+    assert max_tokens(COMPACT, 40) < max_tokens(VERBOSE, 40) <= MAX_OUTPUT_TOKENS
+    assert max_tokens(VERBOSE, 500) == MAX_OUTPUT_TOKENS
@@ -0,0 +1,161 @@
+"""
+Format output ringkas (compact) untuk respons OCR.
+
+Format JSON standar mengulang nama key panjang (`nama_barang`,
+`harga_satuan`, `kategori_transaksi`) dan object `confidence` lengkap untuk
+SETIAP item, sehingga token output (bagian paling lambat dari generation)
+membengkak seiring jumlah item. Format compact:
+
+    {
+      "m": ["2024-01-15", "Toko Sumber Rezeki", "1234567890", "BCA", "Budi Santoso", "Transfer"],
+      "mc": "959990958580",
+      "i": [
+        ["Beras Premium", 5, "kg", 15000, 75000, "B", "959990909099"],
+        ["Sabun Mandi", 2, "pcs", 4500, 9000, "N", "999999999999"]
+      ]
+    }
+
+- `m`  : metadata posisional, urutan `METADATA_FIELDS`
+- `mc` : confidence metadata, 2 digit per field (00-99, 99 = sangat yakin)
+- `i`  : satu baris per item, urutan `ITEM_FIELDS` + confidence 2 digit per field
+- kategori ditulis `B` (Bama) / `N` (Non Bama)
+
+`expand` mengubahnya kembali ke bentuk dict yang dipakai seluruh aplikasi
+(`{"metadata": {...}, "items": [...]}`) sebelum `validate_and_correct_items`.
+"""
+
+import math
+
+VERBOSE = 'verbose'
+COMPACT = 'compact'
+FORMATS = (VERBOSE, COMPACT)
+
+METADATA_FIELDS = ['tanggal', 'nama_toko', 'nomor_rekening', 'nama_bank', 'pemilik_rekening', 'jenis_pembayaran']
+ITEM_FIELDS = ['nama_barang', 'qty', 'unit', 'harga_satuan', 'total_harga', 'kategori_transaksi']
+CATEGORY_CODES = {'B': 'Bama', 'N': 'Non Bama'}
+
+# Perkiraan token output per item (dipakai estimasi biaya & batas max_tokens)
+TOKENS_PER_ITEM = {VERBOSE: 80, COMPACT: 30}
+BASE_TOKENS = {VERBOSE: 120, COMPACT: 60}
+MAX_OUTPUT_TOKENS = 4096
+MIN_OUTPUT_TOKENS = 512
+ITEM_HEADROOM = 1.5  # jumlah item hasil analisis gambar hanya perkiraan
+
+COMPACT_SCHEMA_TEXT = """
+    Output WAJIB format JSON Object RINGKAS (posisional, tanpa nama field per item):
+
+    {
+      "m": [tanggal, nama_toko, nomor_rekening, nama_bank, pemilik_rekening, jenis_pembayaran],
+      "mc": "confidence metadata: 2 digit per field sesuai urutan m (00-99)",
+      "i": [
+        [nama_barang, qty, unit, harga_satuan, total_harga, kategori, "confidence 2 digit per field"]
+      ]
+    }
+
+    - Setiap item adalah ARRAY dengan urutan tepat seperti di atas (7 elemen)
+    - kategori: "B" = Bama, "N" = Non Bama
+    - Confidence ditulis sebagai SATU string angka, 2 digit per field (00-99, 99 = sangat yakin).
+      Contoh: nama 95, qty 99, unit 90, harga_satuan 90, total_harga 90, kategori 99 → "959990909099"
+    - Field yang tidak ada diisi null
+"""
+
+COMPACT_EXAMPLE_TEXT = """
+    Contoh output:
+    {
+      "m": ["2024-01-15", "Toko Sumber Rezeki", "1234567890", "BCA", "Budi Santoso", "Transfer"],
+      "mc": "959990958580",
+      "i": [
+        ["Beras Premium", 5, "kg", 15000, 75000, "B", "959990909099"],
+        ["Minyak Goreng", 2, "liter", 25000, 50000, "B", "999995959599"]
+      ]
+    }
+
+    Jika tidak ada item: {"m": [...], "mc": "...", "i": []}
+"""
+
+_VALUE = {'anyOf': [{'type': 'string'}, {'type': 'number'}, {'type': 'null'}]}
+
+COMPACT_JSON_SCHEMA = {
+    'name': 'nota_compact',
+    'strict': True,
+    'schema': {
+        'type': 'object',
+        'additionalProperties': False,
+        'required': ['m', 'mc', 'i'],
+        'properties': {
+            'm': {'type': 'array', 'items': {'type': ['string', 'null']}},
+            'mc': {'type': 'string'},
+            'i': {'type': 'array', 'items': {'type': 'array', 'items': _VALUE}},
+        },
+    },
+}
+
+
+def response_format(output_format, structured=True):
+    """Parameter `response_format` untuk chat completions"""
+    if output_format == COMPACT and structured:
+        return {'type': 'json_schema', 'json_schema': COMPACT_JSON_SCHEMA}
+    return {'type': 'json_object'}
+
+
+def max_tokens(output_format, expected_items=None):
+    """
+    Batas token output dari perkiraan jumlah item (bukan angka tetap 4096).
+
+    Tanpa perkiraan (PDF, gambar yang tidak bisa dianalisis) dipakai batas maksimal.
+    """
+    if not expected_items:
+        return MAX_OUTPUT_TOKENS
+    items = math.ceil(expected_items * ITEM_HEADROOM) + 5
+    tokens = BASE_TOKENS[output_format] + TOKENS_PER_ITEM[output_format] * items
+    return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, tokens))
+
+
+def unpack_confidence(packed, fields):
+    """'959990' → {'field1': 95, 'field2': 99, 'field3': 90}; field yang tidak ada dilewati"""
+    if isinstance(packed, (list, tuple)):
+        scores = packed
+    else:
+        digits = ''.join(ch for ch in str(packed or '') if ch.isdigit())
+        scores = [int(digits[i:i + 2]) for i in range(0, len(digits) - 1, 2)]
+
+    confidence = {}
+    for field, score in zip(fields, scores):
+        try:
+            confidence[field] = max(0, min(100, int(score)))
+        except (TypeError, ValueError):
+            continue
+    return confidence
+
+
+def _expand_item(row):
+    if isinstance(row, dict):
+        return row  # Model sesekali tetap menulis item sebagai object
+    row = list(row or [])
+    values = row[:len(ITEM_FIELDS)]
+    item = {field: value for field, value in zip(ITEM_FIELDS, values) if value is not None}
+    kategori = item.get('kategori_transaksi')
+    if isinstance(kategori, str):
+        item['kategori_transaksi'] = CATEGORY_CODES.get(kategori.strip().upper(), kategori)
+    if len(row) > len(ITEM_FIELDS):
+        item['confidence'] = unpack_confidence(row[len(ITEM_FIELDS)], ITEM_FIELDS)
+    return item
+
+
+def expand(result):
+    """
+    Ubah respons compact ke bentuk standar `{"metadata": {...}, "items": [...]}`.
+
+    Respons yang sudah berbentuk standar (model mengabaikan format compact)
+    dikembalikan apa adanya.
+    """
+    if not isinstance(result, dict) or 'items' in result or 'i' not in result:
+        return result
+
+    values = list(result.get('m') or [])
+    metadata = {field: value for field, value in zip(METADATA_FIELDS, values)}
+    metadata['confidence'] = unpack_confidence(result.get('mc'), METADATA_FIELDS)
+    return {
+        'metadata': metadata,
+        'items': [_expand_item(row) for row in result.get('i') or []],
+    }